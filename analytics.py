@@ -0,0 +1,240 @@
+"""
+玩家群体统计分析模块
+基于exporter导出的列式数据，用NumPy向量化运算计算全量玩家的统计指标
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+from datetime import datetime
+
+import numpy as np
+
+from exporter import load_columns, export_results, MISSING
+
+PERCENTILES = [10, 25, 50, 75, 90, 95, 99]
+
+# 最近活跃距今天数的分段边界
+RECENCY_BINS = [0, 1, 7, 30, 90, 180, 365, 730]
+
+
+def group_median(groups, values):
+    """按组计算中位数（groups和values等长），返回 (组编号数组, 中位数数组)"""
+    if len(values) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=values.dtype)
+    order = np.lexsort((values, groups))
+    sorted_groups = groups[order]
+    sorted_values = values[order]
+    starts = np.flatnonzero(np.concatenate(([True], sorted_groups[1:] != sorted_groups[:-1])))
+    counts = np.diff(np.concatenate((starts, [len(sorted_groups)])))
+    return sorted_groups[starts], sorted_values[starts + (counts - 1) // 2]
+
+
+def density_by_range(uid, exists, bucket_size):
+    """每个UID区间内的存活用户密度"""
+    buckets = (uid - uid.min()) // bucket_size if len(uid) else uid
+    total = np.bincount(buckets)
+    live = np.bincount(buckets, weights=exists, minlength=len(total)).astype(np.int64)
+    present = np.flatnonzero(total)
+    base = int(uid.min()) if len(uid) else 0
+    return [
+        {
+            'uid_start': base + int(bucket) * bucket_size,
+            'uid_end': base + (int(bucket) + 1) * bucket_size - 1,
+            'crawled': int(total[bucket]),
+            'live': int(live[bucket]),
+            'density': round(float(live[bucket] / total[bucket]), 4),
+        }
+        for bucket in present
+    ]
+
+
+def creation_cohorts(uid, create_time, bucket_size):
+    """按UID区间统计创角时间中位数，反映UID分配与注册时间的关系"""
+    valid = create_time != MISSING
+    buckets = (uid[valid] // bucket_size) * bucket_size
+    groups, medians = group_median(buckets, create_time[valid])
+    counts = np.bincount(np.searchsorted(groups, buckets), minlength=len(groups))
+    return [
+        {
+            'uid_start': int(group),
+            'players': int(count),
+            'median_create_date': datetime.fromtimestamp(int(median)).strftime('%Y-%m-%d'),
+        }
+        for group, median, count in zip(groups, medians, counts)
+    ]
+
+
+def playtime_distribution(playtime_minutes):
+    """游戏时长分布（小时）"""
+    hours = playtime_minutes[playtime_minutes != MISSING] / 60.0
+    if len(hours) == 0:
+        return {'players': 0}
+    edges = np.array([0, 10, 100, 500, 1000, 2000, 5000, 10000, np.inf])
+    histogram, _ = np.histogram(hours, bins=edges)
+    return {
+        'players': int(len(hours)),
+        'mean_hours': round(float(hours.mean()), 1),
+        'percentiles_hours': {str(p): round(float(v), 1) for p, v in zip(PERCENTILES, np.percentile(hours, PERCENTILES))},
+        'histogram_hours': {
+            f"{int(low)}-{'' if np.isinf(high) else int(high)}": int(count)
+            for low, high, count in zip(edges[:-1], edges[1:], histogram)
+        },
+    }
+
+
+def race_gender_mix(race, gender, metadata):
+    """种族性别组合分布"""
+    genders = len(metadata['genders'])
+    counts = np.bincount(race.astype(np.int64) * genders + gender, minlength=len(metadata['races']) * genders)
+    total = int(counts.sum())
+    mix = {}
+    for code in np.flatnonzero(counts):
+        label = f"{metadata['races'][code // genders]}/{metadata['genders'][code % genders]}"
+        mix[label] = {'players': int(counts[code]), 'share': round(float(counts[code] / total), 4)}
+    return dict(sorted(mix.items(), key=lambda item: -item[1]['players']))
+
+
+def fc_sizes(fc, metadata, top=10):
+    """部队人数分布"""
+    fc = fc[fc != MISSING]
+    if len(fc) == 0:
+        return {'fcs': 0, 'players_in_fc': 0}
+    members = np.bincount(fc)
+    sizes = members[members > 0]
+    top_codes = np.argsort(-members)[:min(top, len(sizes))]
+    return {
+        'fcs': int(len(sizes)),
+        'players_in_fc': int(len(fc)),
+        'percentiles_size': {str(p): float(v) for p, v in zip(PERCENTILES, np.percentile(sizes, PERCENTILES))},
+        'largest': [{'fc_name': metadata['fc_names'][code], 'members': int(members[code])} for code in top_codes],
+    }
+
+
+def activity_recency(last_login, last_login_hidden, recent_activity_time, now):
+    """最近活跃距今天数分布，取最近登录和游戏近况中较新的时间"""
+    latest = np.maximum(last_login, recent_activity_time)
+    known = latest != MISSING
+    days = (now - latest[known]) / 86400.0
+    edges = np.array(RECENCY_BINS + [np.inf])
+    histogram, _ = np.histogram(np.clip(days, 0, None), bins=edges)
+    return {
+        'known': int(np.count_nonzero(known)),
+        'hidden': int(np.count_nonzero(last_login_hidden)),
+        'median_days': round(float(np.median(days)), 1) if len(days) else None,
+        'histogram_days': {
+            f"{int(low)}-{'' if np.isinf(high) else int(high)}": int(count)
+            for low, high, count in zip(edges[:-1], edges[1:], histogram)
+        },
+    }
+
+
+def analyze(arrays, metadata, bucket_size=10000, now=None):
+    """计算全量统计报告
+
+    Args:
+        arrays (dict): load_columns返回的列
+        metadata (dict): 导出元数据
+        bucket_size (int): UID区间大小
+        now (float): 计算活跃度使用的当前时间，默认使用系统时间
+    """
+    now = now if now is not None else time.time()
+    uid = np.asarray(arrays['uid'])
+    exists = np.asarray(arrays['user_exists']).astype(bool)
+
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'crawled_uids': int(len(uid)),
+        'live_users': int(np.count_nonzero(exists)),
+        'uid_range': [int(uid.min()), int(uid.max())] if len(uid) else None,
+        'density_by_range': density_by_range(uid, exists, bucket_size),
+        'creation_cohorts': creation_cohorts(uid[exists], np.asarray(arrays['create_time'])[exists], bucket_size),
+        'playtime': playtime_distribution(np.asarray(arrays['playtime_minutes'])[exists]),
+        'race_gender': race_gender_mix(np.asarray(arrays['race'])[exists], np.asarray(arrays['gender'])[exists], metadata),
+        'fc_sizes': fc_sizes(np.asarray(arrays['fc'])[exists], metadata),
+        'recency': activity_recency(
+            np.asarray(arrays['last_login'])[exists],
+            np.asarray(arrays['last_login_hidden'])[exists],
+            np.asarray(arrays['recent_activity_time'])[exists],
+            now,
+        ),
+    }
+
+
+def print_report(report):
+    """打印统计报告摘要"""
+    print(f"\n{'='*60}")
+    print("玩家群体统计报告")
+    print(f"{'='*60}")
+    print(f"爬取UID数: {report['crawled_uids']}")
+    print(f"存活用户数: {report['live_users']}")
+    if report['uid_range']:
+        print(f"UID范围: {report['uid_range'][0]} - {report['uid_range'][1]}")
+
+    print("\n存活密度（按UID区间）:")
+    for row in report['density_by_range'][:20]:
+        print(f"  {row['uid_start']}-{row['uid_end']}: {row['live']}/{row['crawled']} ({row['density']*100:.1f}%)")
+    if len(report['density_by_range']) > 20:
+        print(f"  ... 共 {len(report['density_by_range'])} 个区间")
+
+    playtime = report['playtime']
+    if playtime['players']:
+        print("\n游戏时长分位数（小时）:")
+        print("  " + "  ".join(f"P{p}={v}" for p, v in playtime['percentiles_hours'].items()))
+
+    print("\n种族性别分布:")
+    for label, row in list(report['race_gender'].items())[:10]:
+        print(f"  {label}: {row['players']} ({row['share']*100:.1f}%)")
+
+    fc = report['fc_sizes']
+    print(f"\n部队: {fc['fcs']} 个，部队成员 {fc['players_in_fc']} 人")
+
+    recency = report['recency']
+    print(f"\n最近活跃距今中位数: {recency['median_days']} 天（登录时间已屏蔽 {recency['hidden']} 人）")
+    for label, count in recency['histogram_days'].items():
+        print(f"  {label}天: {count}")
+    print(f"{'='*60}")
+
+
+def run_analytics(path, bucket_size=10000):
+    """对导出数据或结果文件生成统计报告并保存到output/
+
+    Args:
+        path (str|list): exporter导出的路径，或需要先导出的结果文件列表
+    """
+    if isinstance(path, (list, tuple)):
+        path = export_results(list(path))
+
+    start = time.time()
+    arrays, metadata = load_columns(path)
+    report = analyze(arrays, metadata, bucket_size=bucket_size)
+    elapsed = time.time() - start
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"output/analytics_{timestamp}.json"
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print_report(report)
+    print(f"\n✓ 统计报告已保存到: {filename}（计算耗时 {elapsed:.2f} 秒）")
+    return report
+
+
+def main():
+    """主函数：python analytics.py [导出路径 | 结果文件...]"""
+    args = sys.argv[1:]
+    if len(args) == 1 and (os.path.isdir(args[0]) or args[0].endswith('.parquet')):
+        run_analytics(args[0])
+        return
+
+    paths = args or sorted(glob.glob('output/spider_results_*.json') + glob.glob('output/batch_results_*.json'))
+    if not paths:
+        print("没有找到需要分析的数据")
+        return
+    run_analytics(paths)
+
+
+if __name__ == "__main__":
+    main()
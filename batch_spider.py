@@ -1,171 +1,609 @@
 """
 批量爬取用户信息脚本 - 正式版本
-从指定UID开始递增爬取用户信息，连续遇到10个不存在的用户后停止
+从指定UID开始递增爬取用户信息，默认连续遇到10个不存在的用户后停止
+停止条件由可组合的策略决定（最大数量、UID区间、连续不存在、时间预算、请求预算、目标存在用户数），
+带时间预算时按估计的剩余工作量分配并发浏览器数，使爬取在预算内结束
 支持临时HTML文件清理和分批保存结果
 """
 
 import time
-import json
-import os
+import threading
+from collections import deque
 from datetime import datetime
 from ff14_spider import FF14RisingStonesSpider
+from io_worker import BackgroundWriter
+from scheduler import DensityScheduler
+from records import PlayerRecord, ResultStore, PROFILE_URL_TEMPLATE
+from progress import tracker_from_config
+from policies import ConsecutiveMisses, TimeBudget, workers_needed
+from sources import Deduplicator, to_uids
 
 class BatchSpiderProduction:
-    def __init__(self, start_uid=10001009):
+    def __init__(self, start_uid=10001009, window_size=1000, policies=None, batch_size=50,
+                 label='production', title='正式版本', max_workers=1, delay=1):
         """初始化批量爬虫
         
         Args:
             start_uid (int): 起始UID
+            window_size (int): 内存中保留的结果记录数，超出部分溢出到磁盘
+            policies (list): 停止策略（policies模块），默认连续10个不存在用户时停止
+            batch_size (int): 每爬取多少个UID保存一个批次
+            label (str): 结果文件名中的标签
+            title (str): 输出中显示的版本名称
+            max_workers (int): 并发浏览器数上限，只有设置了时间预算时才会超过1
+            delay (float): 每个worker两次请求之间的间隔（秒）
         """
         self.start_uid = start_uid
+        self.policies = policies if policies is not None else [ConsecutiveMisses(10)]
+        self.batch_size = batch_size
+        self.label = label
+        self.title = title
+        self.max_workers = max_workers
+        self.delay = delay
         self.spider = FF14RisingStonesSpider()
-        self.results = []
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.results = ResultStore(f"output/batch_results_{label}_{timestamp}.spill.jsonl", window_size)
+        self.batch_results = []
+        # 摘要只保留前10个成功用户，不再回扫全部结果
+        self.sample_users = []
         self.successful_count = 0
         self.nonexistent_count = 0
         self.failed_count = 0
         self.consecutive_nonexistent = 0
-        self.max_consecutive_nonexistent = 10
         self.html_files_to_delete = []
+        # 批次保存和临时文件清理在后台线程执行，不阻塞爬取循环
+        self.writer = BackgroundWriter()
+        # 超时的UID不阻塞爬取，在批次边界和结束时重试
+        self.retry_uids = deque()
+        self.ready_retries = deque()
+        self.retry_attempts = {}
+        # 等待重试的UID -> 派发序号：重试完成前该序号不计入连续不存在计数，之后的结果暂存
+        self.retry_slots = {}
+        # 等待重试的UID挡住的后续结果达到该数量时不等批次边界，立即重试
+        self.retry_backlog = 10
+        self.max_retries = 1
+        self.timeout_count = 0
+        # 预检判定不存在后又做完整爬取核对的UID数
+        self.probe_verified = 0
+        # 实时进度：定期重写状态文件，配置了端口时可以通过HTTP查询
+        self.progress = tracker_from_config(self.spider.config.get('progress', {}))
+        
+        # 调度状态，多个worker线程共享，修改时持有lock
+        self.lock = threading.RLock()
+        self.scheduler = None
+        # 流式输入的UID（crawl_uids），None表示从start_uid顺序递增
+        self.source = None
+        # 发现模式的待爬取集合（crawl_frontier）
+        self.frontier = None
+        self.deduplicator = None
+        self.active_policies = self.policies
+        self.next_sequential_uid = start_uid
+        self.dispatched = 0
+        self.completed = 0
+        # 实际爬取过的UID范围：流式输入、发现模式和密度调度的UID不连续，不能由start_uid和数量推算
+        self.min_uid = None
+        self.max_uid = None
+        self.requests = 0
+        self.uid_seconds = 0.0
+        self.batch_count = 0
+        self.plan_printed = False
+        self.stop_reason = None
+        self.stop_hard = False
+        # 连续不存在计数按派发顺序累计：并发时先完成的结果暂存，等前面的UID完成后再计入
+        self.finished = {}
+        self.applied = 0
         
+        # 并发分配：先用一个worker校准单UID耗时，之后定期按剩余工作量和剩余时间调整worker数
+        self.threads = {}
+        self.target_workers = 1
+        self.peak_workers = 1
+        self.calibration = 5
+        self.allocation_interval = 30
+        self.last_allocation = 0.0
+        self.budget_warned = False
+    
     def generate_url(self, uid):
         """生成用户URL"""
-        return f"https://ff14risingstones.web.sdo.com/pc/index.html#/me/info?uuid={uid}"
+        return PROFILE_URL_TEMPLATE.format(uid=uid)
     
     def cleanup_html_files(self):
-        """删除临时HTML文件"""
-        for html_file in self.html_files_to_delete:
-            try:
-                if os.path.exists(html_file):
-                    os.remove(html_file)
-                    print(f"✓ 已删除临时文件: {html_file}")
-            except Exception as e:
-                print(f"✗ 删除临时文件失败 {html_file}: {e}")
+        """删除临时HTML文件（提交给后台线程执行）"""
+        if self.html_files_to_delete:
+            self.writer.remove_files(list(self.html_files_to_delete))
         self.html_files_to_delete.clear()
     
     def save_batch_results(self, batch_num):
-        """保存批次结果"""
-        if not self.results:
+        """保存批次结果（只包含本批次新增的记录）"""
+        if not self.batch_results:
             return
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"output/batch_results_production_batch{batch_num}_{timestamp}.json"
+        filename = f"output/batch_results_{self.label}_batch{batch_num}_{timestamp}{self.spider.serializer.extension}"
         
-        # 创建汇总信息
-        summary = {
-            "crawl_info": {
-                "batch_number": batch_num,
-                "start_uid": self.start_uid,
-                "current_end_uid": self.start_uid + len(self.results) - 1,
-                "total_crawled": len(self.results),
-                "successful_users": self.successful_count,
-                "nonexistent_users": self.nonexistent_count,
-                "consecutive_nonexistent": self.consecutive_nonexistent,
-                "failed_requests": self.failed_count,
-                "crawl_time": timestamp
-            },
-            "results": self.results
+        # 创建汇总信息（计数在提交时取快照，记录转换和序列化写出在后台线程完成）
+        crawl_info = {
+            "batch_number": batch_num,
+            "start_uid": self.min_uid,
+            "current_end_uid": self.max_uid,
+            "total_crawled": len(self.results),
+            "batch_size": len(self.batch_results),
+            "successful_users": self.successful_count,
+            "nonexistent_users": self.nonexistent_count,
+            "consecutive_nonexistent": self.consecutive_nonexistent,
+            "failed_requests": self.failed_count,
+            "timeout_retries": self.timeout_count,
+            "probe": self.probe_summary(),
+            "crawl_time": timestamp
         }
+        records = list(self.batch_results)
+        self.batch_results.clear()
         
-        try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(summary, f, ensure_ascii=False, indent=2)
+        self.writer.write_results(
+            self.spider.serializer,
+            filename,
+            crawl_info,
+            lambda: [record.to_player_info() for record in records],
+            f"✓ 批次{batch_num}结果已保存到: {filename}"
+        )
+    
+    def crawl_uid(self, uid, spider=None):
+        """爬取单个UID并更新计数和结果（连续不存在计数由complete按派发顺序更新）
+        
+        Args:
+            uid (int): UID
+            spider: 执行爬取的worker爬虫，默认主爬虫
+        
+        Returns:
+            bool: 用户存在返回True，不存在返回False，爬取失败返回None
+        """
+        spider = spider or self.spider
+        url = self.generate_url(uid)
+        self.progress.start_uid(uid)
+        start = time.time()
+        # 预检判定不存在的UID跳过完整渲染；第一个以及之后每隔verify_interval个仍完整爬取核对，
+        # 核对发现用户存在时停用预检，避免接口变化使连续不存在计数误判而提前停止；
+        # 可能达到连续不存在上限的UID总是完整爬取，只凭预检结果不会触发停止
+        probed = spider.probe is not None and not spider.probe.disabled
+        exists = spider.probe_uid(uid)
+        if exists is False and not spider.probe.needs_verification() and not self.near_miss_limit():
+            print("✓ 预检: 用户不存在，跳过页面渲染")
+            result = spider.missing_result(uid)
+            timings = {'probe': time.time() - start, 'total': time.time() - start}
+            page_requests = 0
+        else:
+            probe_time = time.time() - start
+            result = spider.scrape_url(url)
+            timings = dict(spider.last_timings, total=time.time() - start)
+            page_requests = 1
+            if exists is not None:
+                timings['probe'] = probe_time
+            if exists is False:
+                self.probe_verified += 1
+                if result and result.get('player_data', {}).get('user_exists', True):
+                    spider.probe.disable(f"UID {uid} 预检为不存在，但页面显示用户存在")
+        
+        # 存在的用户接着采集帖子和动态，每个分页请求计入请求数
+        if result and spider.feeds:
+            feed_start = time.time()
+            feed_summary = spider.collect_feeds(result)
+            if feed_summary is not None:
+                page_requests += feed_summary['pages']
+                timings['feeds'] = time.time() - feed_start
+                timings['total'] = time.time() - start
+        
+        # 发现模式：报告结果，所在部队到期时展开成员列表（在批量锁之外，等待新UID的派发线程不会阻塞这里）
+        if self.frontier is not None:
+            expand_start = time.time()
+            member_pages = self.frontier.report(uid, result, spider.driver, spider.site_url)
+            if member_pages:
+                page_requests += member_pages
+                timings['expand'] = time.time() - expand_start
+                timings['total'] = time.time() - start
+        
+        with self.lock:
+            self.requests += page_requests + (1 if probed else 0)
+            self.uid_seconds += timings['total']
+            
+            if not result:
+                self.progress.record(uid, spider.last_failure or 'error', timings)
+                attempts = self.retry_attempts.get(uid, 0)
+                if spider.last_failure == 'timeout' and attempts < self.max_retries:
+                    self.retry_attempts[uid] = attempts + 1
+                    self.retry_uids.append(uid)
+                    self.timeout_count += 1
+                    print(f"✗ 爬取超时，UID {uid} 加入重试队列")
+                    return None
+                print(f"✗ 爬取失败")
+                self.failed_count += 1
+                return None
+            
+            player_data = result.get('player_data', {})
+            user_exists = player_data.get('user_exists', True)
+            
+            # 记录HTML文件用于后续删除
+            html_file = result.get('html_file')
+            if html_file:
+                self.html_files_to_delete.append(f"output/{html_file}")
+            
+            if user_exists:
+                print(f"✓ 用户存在: {player_data.get('player_id', 'Unknown')}")
+                self.successful_count += 1
+                if len(self.sample_users) < 10:
+                    self.sample_users.append((player_data.get('uid'), player_data.get('player_id')))
+            else:
+                print(f"✗ 用户不存在: {player_data.get('error_message', 'Unknown error')}")
+                self.nonexistent_count += 1
+            
+            self.progress.record(uid, 'live' if user_exists else 'missing', timings)
             
-            print(f"✓ 批次{batch_num}结果已保存到: {filename}")
+            # 只保留紧凑记录，完整字典随本次循环释放
+            record = PlayerRecord.from_player_info(result)
+            self.results.append(record)
+            self.batch_results.append(record)
             
+            return user_exists
+    
+    def near_miss_limit(self):
+        """当前UID是否可能使连续不存在计数达到停止上限
+        
+        已派发但尚未计入的UID都按不存在估计，因此并发时同样不会漏掉。
+        """
+        limit = next((policy.limit for policy in self.active_policies if isinstance(policy, ConsecutiveMisses)), None)
+        if not limit:
+            return False
+        with self.lock:
+            return self.consecutive_nonexistent + (self.dispatched - self.applied) >= limit
+    
+    def apply_outcome(self, exists):
+        """按派发顺序更新连续不存在计数"""
+        if exists:
+            self.consecutive_nonexistent = 0  # 重置连续不存在计数
+        elif exists is False:
+            self.consecutive_nonexistent += 1
+            print(f"   连续不存在用户数: {self.consecutive_nonexistent}")
+    
+    def complete(self, seq, uid, exists):
+        """记录一个UID完成：更新连续不存在计数、反馈调度器，到达批次边界时保存批次
+        
+        Args:
+            seq (int): 派发序号，重试的UID沿用第一次派发的序号；None时结果直接计入
+            uid (int): UID
+            exists (bool): crawl_uid的返回值
+        """
+        with self.lock:
+            if seq is None:
+                self.apply_outcome(exists)
+            elif exists is None and (uid in self.retry_uids or uid in self.ready_retries):
+                # 超时等待重试：保留该序号，重试的结果按原来的派发顺序计入
+                self.retry_slots[uid] = seq
+            else:
+                self.finished[seq] = exists
+                while self.applied + 1 in self.finished:
+                    self.applied += 1
+                    self.apply_outcome(self.finished.pop(self.applied))
+                if len(self.finished) >= self.retry_backlog:
+                    self.promote_blocking_retry()
+            if self.scheduler is not None:
+                self.scheduler.report(uid, exists)
+            
+            self.completed += 1
+            self.min_uid = uid if self.min_uid is None else min(self.min_uid, uid)
+            self.max_uid = uid if self.max_uid is None else max(self.max_uid, uid)
+            if self.completed % 10 == 0:
+                print(self.progress.summary_line())
+            
+            if self.completed % self.batch_size == 0:
+                self.batch_count += 1
+                print(f"\n--- 已爬取 {self.completed} 个用户，保存批次 {self.batch_count} ---")
+                # 之前超时的UID在下一次派发时优先重试
+                self.ready_retries.extend(self.retry_uids)
+                self.retry_uids.clear()
+                self.save_batch_results(self.batch_count)
+                # 清理HTML文件
+                self.cleanup_html_files()
+    
+    def promote_blocking_retry(self):
+        """挡住连续不存在计数的超时UID提前进入重试（调用方持有lock）"""
+        for uid, slot in self.retry_slots.items():
+            if slot == self.applied + 1 and uid in self.retry_uids:
+                self.retry_uids.remove(uid)
+                self.ready_retries.append(uid)
+                print(f"UID {uid} 的重试结果决定连续不存在计数，提前重试")
+                return
+    
+    def check_policies(self):
+        """检查停止策略，触发时记录停止原因"""
+        for policy in self.active_policies:
+            reason = policy.check(self)
+            if reason:
+                self.stop_reason = reason
+                self.stop_hard = policy.hard
+                print(f"\n{reason}，停止派发新的UID")
+                return
+    
+    def take_new_uid(self, worker_id):
+        """从调度器、流式输入或顺序UID中取下一个新UID，全部调度完时返回None"""
+        if self.source is not None:
+            return next(self.source, None)
+        
+        if self.scheduler is None:
+            uid = self.next_sequential_uid
+            self.next_sequential_uid += 1
+            return uid
+        
+        uid = self.scheduler.next_uid(worker_id)
+        # 抽样阶段结束后打印分片计划
+        if self.scheduler.shards is not None and not self.plan_printed:
+            self.plan_printed = True
+            print("\n--- 抽样完成，分片计划（前10个）---")
+            for shard in self.scheduler.allocation()[:10]:
+                print(f"  {shard['start']}-{shard['end']}: 密度 {shard['density']} ({shard['mode']})")
+        return uid
+    
+    def next_item(self, worker_id):
+        """为worker派发下一个UID
+        
+        Returns:
+            tuple: (派发序号, UID)，重试的UID沿用第一次派发的序号；没有可派发的UID时返回None
+        """
+        with self.lock:
+            if self.stop_reason is None:
+                self.check_policies()
+            if self.stop_hard:
+                return None
+            
+            if self.ready_retries:
+                uid = self.ready_retries.popleft()
+                print(f"\n[重试] 正在爬取 UID: {uid}")
+                return self.retry_slots.pop(uid, None), uid
+            
+            if self.stop_reason is None:
+                uid = self.take_new_uid(worker_id)
+                if uid is not None:
+                    self.dispatched += 1
+                    print(f"\n[{self.dispatched}] 正在爬取 UID: {uid}")
+                    return self.dispatched, uid
+                self.stop_reason = "计划中的UID已全部调度"
+            
+            # 不再派发新UID后，处理剩余的超时重试
+            if self.retry_uids:
+                uid = self.retry_uids.popleft()
+                print(f"\n[重试] 正在爬取 UID: {uid}")
+                return self.retry_slots.pop(uid, None), uid
+            return None
+    
+    def spawn_spider(self):
+        """为新的worker创建爬虫，沿用主爬虫的运行设置（登录态通过cookies文件共享）"""
+        spider = FF14RisingStonesSpider()
+        spider.interactive = self.spider.interactive
+        spider.cassette_config = self.spider.cassette_config
+        # 预检共用一个实例，一个worker核对发现不一致时所有worker一起停用
+        spider.probe = self.spider.probe
+        # 动态采集共用一个实例（游标数据库和写出流只有一份），由主爬虫关闭
+        spider.feeds = self.spider.feeds
+        # 解析缓存共用一个实例，一个worker解析过的模板页面其他worker直接命中
+        spider.parse_cache = self.spider.parse_cache
+        spider.fc_id_pattern = self.spider.fc_id_pattern
+        return spider
+    
+    def worker(self, worker_id, spider):
+        """worker线程：循环领取UID并爬取，直到没有可派发的UID或并发数被调低"""
+        try:
+            if spider is not self.spider and not spider.setup_driver():
+                print(f"✗ worker {worker_id} 浏览器启动失败")
+                return
+            
+            while worker_id < self.target_workers:
+                item = self.next_item(worker_id)
+                if item is None:
+                    break
+                seq, uid = item
+                self.complete(seq, uid, self.crawl_uid(uid, spider))
+                
+                # 添加延时避免过于频繁的请求
+                if self.delay:
+                    print(f"等待{self.delay}秒...")
+                    time.sleep(self.delay)
         except Exception as e:
-            print(f"✗ 保存批次{batch_num}失败: {e}")
+            print(f"\n爬取过程中出现错误: {e}")
+            self.progress.state = 'failed'
+            with self.lock:
+                self.stop_reason = f"worker {worker_id} 出错"
+                self.stop_hard = True
+        finally:
+            if spider is not self.spider:
+                spider.feeds = None
+                spider.parse_cache = None
+                spider.close()
     
-    def crawl_until_nonexistent(self):
-        """爬取直到连续遇到10个不存在的用户"""
-        print(f"开始批量爬取用户信息 - 正式版本")
-        print(f"起始UID: {self.start_uid}")
-        print(f"连续{self.max_consecutive_nonexistent}个不存在用户时停止")
+    def start_worker(self, worker_id):
+        """启动worker线程，0号worker使用主爬虫"""
+        spider = self.spider if worker_id == 0 else self.spawn_spider()
+        thread = threading.Thread(target=self.worker, args=(worker_id, spider), daemon=True)
+        self.threads[worker_id] = thread
+        thread.start()
+    
+    def average_uid_seconds(self):
+        """单个worker处理一个UID的平均耗时（不含请求间隔）"""
+        return self.uid_seconds / self.completed if self.completed else 0.0
+    
+    def estimate_remaining(self):
+        """按调度器和各停止策略估计剩余UID数，取最小值；都无法估计时返回None"""
+        estimates = [policy.remaining(self) for policy in self.active_policies]
+        if self.scheduler is not None:
+            estimates.append(self.scheduler.remaining())
+        estimates = [estimate for estimate in estimates if estimate is not None]
+        return min(estimates) if estimates else None
+    
+    def allocate_workers(self):
+        """按剩余工作量和时间预算调整worker数"""
+        budget = next((policy for policy in self.active_policies if isinstance(policy, TimeBudget)), None)
+        if budget is None or self.max_workers <= 1 or self.stop_reason:
+            return
+        
+        now = time.time()
+        if self.completed < self.calibration or now - self.last_allocation < self.allocation_interval:
+            return
+        self.last_allocation = now
+        
+        remaining = self.estimate_remaining()
+        seconds_per_uid = self.average_uid_seconds() + self.delay
+        # 留出10%的余量用于收尾（最后的批次保存和关闭浏览器）
+        time_left = budget.time_left() * 0.9
+        if remaining is None:
+            # 剩余工作量未知（流式输入、只按连续不存在停止）时用满并发上限，在预算内尽量多爬
+            needed = self.max_workers
+        else:
+            needed = workers_needed(remaining, seconds_per_uid, time_left, self.max_workers)
+        
+        if needed == self.max_workers and remaining is not None and not self.budget_warned \
+                and remaining * seconds_per_uid / self.max_workers > time_left:
+            self.budget_warned = True
+            print(f"预计剩余约 {remaining} 个UID无法在时间预算内全部完成，时间到时停止")
+        
+        if needed != self.target_workers:
+            print(f"\n--- 剩余约 {remaining if remaining is not None else '未知'} 个UID，单UID {seconds_per_uid:.1f} 秒，"
+                  f"剩余 {time_left:.0f} 秒：worker数 {self.target_workers} -> {needed} ---")
+            self.target_workers = needed
+            self.peak_workers = max(self.peak_workers, needed)
+            for worker_id in range(needed):
+                thread = self.threads.get(worker_id)
+                if thread is None or not thread.is_alive():
+                    self.start_worker(worker_id)
+    
+    def crawl(self, scheduler=None, uids=None):
+        """按停止策略爬取，直到策略触发或UID全部调度完
+        
+        scheduler和uids都为None时从start_uid顺序递增。
+        
+        Args:
+            scheduler (DensityScheduler): 按密度调度时的调度器
+            uids (iterable): 流式输入的UID或URL，逐条读取并实时去重
+        """
+        if scheduler is None and uids is None:
+            self.active_policies = self.policies
+        else:
+            # 连续不存在、UID区间只对顺序爬取有意义
+            self.active_policies = [policy for policy in self.policies if not policy.sequential_only]
+        self.progress.remaining_fn = scheduler.remaining if scheduler is not None else self.estimate_remaining
+        self.scheduler = scheduler
+        if uids is not None:
+            self.deduplicator = Deduplicator()
+            self.source = self.deduplicator.filter(to_uids(uids))
+        
+        for policy in self.active_policies:
+            print(policy.describe())
+        if self.max_workers > 1:
+            print(f"并发浏览器上限: {self.max_workers}（按时间预算分配）")
         print("="*50)
         
+        if self.max_workers > 1 and self.spider.cassette_config.get('mode') == 'record':
+            print("录制模式只支持单个浏览器，并发上限设为1")
+            self.max_workers = 1
+        
         # 启动浏览器
         if not self.spider.setup_driver():
             print("浏览器启动失败")
             return False
         
-        current_uid = self.start_uid
-        crawled_count = 0
-        batch_count = 0
+        for policy in self.active_policies:
+            if isinstance(policy, TimeBudget):
+                policy.start()
         
         try:
-            while self.consecutive_nonexistent < self.max_consecutive_nonexistent:
-                crawled_count += 1
-                print(f"\n[{crawled_count}] 正在爬取 UID: {current_uid}")
-                
-                url = self.generate_url(current_uid)
-                result = self.spider.scrape_url(url)
-                
-                if result:
-                    player_data = result.get('player_data', {})
-                    user_exists = player_data.get('user_exists', True)
-                    
-                    # 记录HTML文件用于后续删除
-                    html_file = result.get('html_file')
-                    if html_file:
-                        self.html_files_to_delete.append(f"output/{html_file}")
-                    
-                    if user_exists:
-                        print(f"✓ 用户存在: {player_data.get('player_id', 'Unknown')}")
-                        self.successful_count += 1
-                        self.consecutive_nonexistent = 0  # 重置连续不存在计数
-                    else:
-                        print(f"✗ 用户不存在: {player_data.get('error_message', 'Unknown error')}")
-                        self.nonexistent_count += 1
-                        self.consecutive_nonexistent += 1
-                        print(f"   连续不存在用户数: {self.consecutive_nonexistent}")
-                    
-                    self.results.append(result)
-                else:
-                    print(f"✗ 爬取失败")
-                    self.failed_count += 1
-                
-                current_uid += 1
-                
-                # 每50个用户保存一次结果（正式版本处理更多数据）
-                if crawled_count % 50 == 0:
-                    batch_count += 1
-                    print(f"\n--- 已爬取 {crawled_count} 个用户，保存批次 {batch_count} ---")
-                    self.save_batch_results(batch_count)
-                    # 清理HTML文件
-                    self.cleanup_html_files()
-                
-                # 检查是否达到连续不存在用户的限制
-                if self.consecutive_nonexistent >= self.max_consecutive_nonexistent:
-                    print(f"\n已连续遇到 {self.max_consecutive_nonexistent} 个不存在的用户，停止爬取")
-                    break
-                
-                # 添加延时避免过于频繁的请求
-                print("等待1秒...")
+            self.start_worker(0)
+            while any(thread.is_alive() for thread in list(self.threads.values())):
                 time.sleep(1)
+                self.allocate_workers()
+            
+            # 预算用完时未重试的超时UID计为失败
+            leftover = len(self.retry_uids) + len(self.ready_retries)
+            if leftover:
+                print(f"未重试的超时UID {leftover} 个，计为失败")
+                self.failed_count += leftover
             
             # 保存最后一批未保存的结果
-            if crawled_count % 50 != 0:
-                batch_count += 1
-                print(f"\n--- 保存最后批次 {batch_count} ---")
-                self.save_batch_results(batch_count)
+            if self.batch_results:
+                self.batch_count += 1
+                print(f"\n--- 保存最后批次 {self.batch_count} ---")
+                self.save_batch_results(self.batch_count)
             
             # 最终清理
             self.cleanup_html_files()
             
-            print(f"\n正式版本爬取完成！")
-            
+            print(f"\n{self.title}爬取完成！共爬取 {self.dispatched} 个UID（{self.stop_reason}）")
+            if self.deduplicator:
+                print(f"输入{self.deduplicator.summary()}")
+        
         except KeyboardInterrupt:
-            print(f"\n用户中断爬取")
+            print(f"\n用户中断爬取，等待进行中的UID完成...")
+            self.progress.state = 'interrupted'
+            with self.lock:
+                self.stop_reason = "用户中断"
+                self.stop_hard = True
+            for thread in list(self.threads.values()):
+                thread.join()
             # 中断时也要清理文件
             self.cleanup_html_files()
-        except Exception as e:
-            print(f"\n爬取过程中出现错误: {e}")
-            # 出错时也要清理文件
-            self.cleanup_html_files()
         finally:
             self.spider.close()
+            # 等待后台的保存和清理任务完成（包括中断时）
+            self.writer.flush()
+            self.progress.close()
         
         return True
     
+    def crawl_until_nonexistent(self):
+        """从start_uid顺序爬取直到停止策略触发（默认连续10个不存在的用户）"""
+        print(f"开始批量爬取用户信息 - {self.title}")
+        print(f"起始UID: {self.start_uid}")
+        return self.crawl()
+    
+    def crawl_uids(self, uids):
+        """爬取流式输入的UID（UID文件、以前的爬取结果等），不使用连续不存在用户的停止规则"""
+        print(f"开始批量爬取输入的UID - {self.title}")
+        return self.crawl(uids=uids)
+    
+    def crawl_frontier(self, frontier, seeds=None):
+        """发现模式：从种子出发，沿部队成员列表扩展待爬取集合，按陈旧程度爬取
+        
+        Args:
+            frontier (Frontier): 持久化的待爬取集合
+            seeds (iterable): 种子UID或URL，加入集合后与之前发现的UID一起排队
+        """
+        print(f"开始发现模式批量爬取 - {self.title}")
+        if seeds is not None:
+            print(f"新加入种子 {frontier.add_uids(to_uids(seeds))} 个")
+        stats = frontier.stats()
+        print(f"已知UID {stats['players']} 个（待爬取 {stats['due']}），已知部队 {stats['fcs']} 个")
+        if frontier.needs_fc_id:
+            # 页面文本中没有部队ID：从接口捕获（capture.field_map的fc_id）或页面中的部队链接读取
+            if self.spider.capture is None and frontier.fc_id_pattern is None:
+                print("✗ 成员列表接口需要部队ID，但既没有开启capture，也没有配置frontier.fc_id_pattern，无法展开任何部队")
+                return False
+            self.spider.fc_id_pattern = frontier.fc_id_pattern
+        self.frontier = frontier
+        return self.crawl(uids=frontier.iter_uids())
+    
+    def crawl_scheduled(self, end_uid, block_size=1000, samples_per_block=5):
+        """按存活密度调度爬取 [start_uid, end_uid] 区间
+        
+        先抽样估计每个区块的密度，密集区块优先完整爬取，稀疏区块粗探测、发现存活用户后再细化。
+        爬完计划区间为止，不使用连续不存在用户的停止规则。
+        """
+        print(f"开始按密度调度批量爬取用户信息")
+        print(f"UID区间: {self.start_uid} - {end_uid}")
+        
+        scheduler = DensityScheduler(self.start_uid, end_uid, block_size=block_size,
+                                     samples_per_block=samples_per_block, workers=self.max_workers)
+        return self.crawl(scheduler)
+    
+    def probe_summary(self):
+        """预检统计，未启用预检时返回None"""
+        if not self.spider.probe:
+            return None
+        return dict(self.spider.probe.summary(), verified=self.probe_verified)
+    
     def save_results(self):
         """保存爬取结果"""
         if not self.results:
@@ -173,44 +611,56 @@ class BatchSpiderProduction:
             return
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"output/batch_results_production_{timestamp}.json"
+        filename = f"output/batch_results_{self.label}_{timestamp}{self.spider.serializer.extension}"
         
         # 创建汇总信息
-        summary = {
-            "crawl_info": {
-                "start_uid": self.start_uid,
-                "end_uid": self.start_uid + len(self.results) - 1,
-                "total_crawled": len(self.results),
-                "successful_users": self.successful_count,
-                "nonexistent_users": self.nonexistent_count,
-                "consecutive_nonexistent": self.consecutive_nonexistent,
-                "failed_requests": self.failed_count,
-                "crawl_time": timestamp
-            },
-            "results": self.results
+        crawl_info = {
+            "start_uid": self.min_uid,
+            "end_uid": self.max_uid,
+            "total_crawled": len(self.results),
+            "successful_users": self.successful_count,
+            "nonexistent_users": self.nonexistent_count,
+            "consecutive_nonexistent": self.consecutive_nonexistent,
+            "failed_requests": self.failed_count,
+            "timeout_retries": self.timeout_count,
+            "probe": self.probe_summary(),
+            "feeds": self.spider.feeds.summary() if self.spider.feeds else None,
+            "frontier": self.frontier.summary() if self.frontier else None,
+            "requests": self.requests,
+            "peak_workers": self.peak_workers,
+            "stop_reason": self.stop_reason,
+            "crawl_time": timestamp
         }
         
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(summary, f, ensure_ascii=False, indent=2)
+            self.spider.serializer.dump(filename, self.results.iter_player_infos(), crawl_info)
             
             print(f"\n✓ 结果已保存到: {filename}")
             self.print_summary()
-            
+            self.results.close()
+            self.writer.close()
+        
         except Exception as e:
             print(f"✗ 保存失败: {e}")
     
     def print_summary(self):
-        """打印爬取摘要"""
+        """打印爬取摘要（由运行计数器计算，不回扫结果）"""
         print(f"\n{'='*60}")
-        print(f"批量爬取摘要 (正式版本)")
+        print(f"批量爬取摘要 ({self.title})")
         print(f"{'='*60}")
-        print(f"起始UID: {self.start_uid}")
-        print(f"结束UID: {self.start_uid + len(self.results) - 1}")
+        print(f"最小UID: {self.min_uid}")
+        print(f"最大UID: {self.max_uid}")
         print(f"总爬取数量: {len(self.results)}")
         print(f"成功用户: {self.successful_count}")
         print(f"不存在用户: {self.nonexistent_count}")
         print(f"失败请求: {self.failed_count}")
+        print(f"超时重试: {self.timeout_count}")
+        probe = self.probe_summary()
+        if probe:
+            print(f"预检: {probe['checked']} 次，判定不存在 {probe['missing']}，无法判断 {probe['inconclusive']}，"
+                  f"完整爬取核对 {probe['verified']}{'（已停用）' if probe['disabled'] else ''}")
+        print(f"请求数: {self.requests}，最多并发: {self.peak_workers}")
+        print(f"停止原因: {self.stop_reason}")
         print(f"最终连续不存在用户数: {self.consecutive_nonexistent}")
         print(f"成功率: {(self.successful_count/len(self.results)*100) if self.results else 0:.1f}%")
         print(f"{'='*60}")
@@ -218,18 +668,10 @@ class BatchSpiderProduction:
         # 显示成功的用户列表（只显示前10个，避免输出过长）
         if self.successful_count > 0:
             print(f"\n成功爬取的用户 (显示前10个):")
-            count = 0
-            for result in self.results:
-                player_data = result.get('player_data', {})
-                if player_data.get('user_exists', True):
-                    uid = player_data.get('uid')
-                    player_id = player_data.get('player_id')
-                    print(f"  UID {uid}: {player_id}")
-                    count += 1
-                    if count >= 10:
-                        if self.successful_count > 10:
-                            print(f"  ... 还有 {self.successful_count - 10} 个成功用户")
-                        break
+            for uid, player_id in self.sample_users:
+                print(f"  UID {uid}: {player_id}")
+            if self.successful_count > len(self.sample_users):
+                print(f"  ... 还有 {self.successful_count - len(self.sample_users)} 个成功用户")
 
 def main():
     """主函数"""
@@ -255,4 +697,4 @@ def main():
         print("批量爬取失败")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
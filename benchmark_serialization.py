@@ -0,0 +1,199 @@
+"""
+结果序列化基准测试
+用真实结构的player_info记录（随机生成，或读取以前的结果文件）比较各种结果文件格式的
+写出速度、读取速度和文件大小
+
+用法:
+    python benchmark_serialization.py --count 100000
+    python benchmark_serialization.py --from-results output/batch_results_*.json
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+from records import PROFILE_URL_TEMPLATE, dump_summary, iter_player_infos
+from serializers import JsonSerializer, BinarySerializer, msgpack
+
+NAME_CHARS = '光之战士艾欧泽亚利姆萨罗敏萨格里达尼亚乌尔达哈伊修加德黄金狼雪风月星'
+SERVERS = ['红玉海', '神意之地', '幻影群岛', '萌芽池', '宇宙和音', '沃仙曦染', '晨曦王座', '拉诺西亚']
+RACES = ['人族', '精灵族', '拉拉菲尔族', '猫魅族', '鲁加族', '敖龙族', '硌狮族', '维埃拉族']
+JOBS = ['骑士', '战士', '暗黑骑士', '白魔法师', '学者', '占星术士', '武僧', '龙骑士', '忍者', '黑魔法师', '召唤师', '吟游诗人']
+ACTIVITIES = ['发布了新的动态', '完成了副本', '加入了部队', '更新了个人简介', '获得了成就']
+
+
+def random_player_info(uid, rng):
+    """生成一条结构与爬取结果一致的player_info"""
+    url = PROFILE_URL_TEMPLATE.format(uid=uid)
+    timestamp = datetime(2025, 1, 1) + timedelta(seconds=rng.randint(0, 86400 * 300))
+    if rng.random() < 0.3:
+        return {
+            'url': url,
+            'title': '石之家',
+            'timestamp': timestamp.isoformat(),
+            'player_data': {'uid': str(uid), 'user_exists': False, 'error_message': '用户不存在'},
+            'source': 'probe'
+        }
+
+    create_time = datetime(2014, 1, 1) + timedelta(days=rng.randint(0, 4000))
+    last_login = create_time + timedelta(days=rng.randint(0, 4000))
+    name = ''.join(rng.choice(NAME_CHARS) for _ in range(rng.randint(2, 6)))
+    player_data = {
+        'uid': str(uid),
+        'user_exists': True,
+        'player_id': f"{name}@{rng.choice(SERVERS)}",
+        'create_time': create_time.strftime('%Y-%m-%d'),
+        'last_login': last_login.strftime('%Y-%m-%d %H:%M'),
+        'total_playtime': f"{rng.randint(0, 9000)}小时{rng.randint(0, 59)}分钟",
+        'recent_activity': rng.choice(ACTIVITIES),
+        'recent_activity_time': last_login.strftime('%Y-%m-%d %H:%M'),
+        'race_gender': f"{rng.choice(RACES)} {rng.choice(['男', '女'])}",
+        'fc_name': ''.join(rng.choice(NAME_CHARS) for _ in range(rng.randint(0, 5))),
+        # 与profile_parser一致：level_info是页面中同时含"冒险者"和"LV"的文本行
+        'level_info': [f"冒险者 LV{rng.randint(1, 100)}"] + [
+            f"{job} LV{rng.randint(1, 100)} 冒险者" for job in rng.sample(JOBS, rng.randint(0, 7))
+        ],
+        'selector_fields': {'player_name': name, 'server': rng.choice(SERVERS)}
+    }
+    return {
+        'url': url,
+        'title': f"{name}的个人主页 - 石之家",
+        'timestamp': timestamp.isoformat(),
+        'player_data': player_data,
+        'source': 'dom'
+    }
+
+
+def load_records(args):
+    """读取或生成基准测试记录"""
+    if args.from_results:
+        paths = [path for pattern in args.from_results for path in sorted(glob.glob(pattern)) or [pattern]]
+        records = []
+        for path in paths:
+            records.extend(iter_player_infos(path))
+            if len(records) >= args.count:
+                break
+        return records[:args.count]
+    rng = random.Random(args.seed)
+    return [random_player_info(10001009 + i, rng) for i in range(args.count)]
+
+
+class IndentedJson:
+    """当前的结果格式：格式化JSON汇总文件"""
+
+    name = 'json indent=2（当前）'
+
+    def dump(self, filename, records):
+        dump_summary(filename, {'benchmark': True}, records)
+
+    def load(self, filename):
+        with open(filename, 'r', encoding='utf-8') as f:
+            return json.load(f)['results']
+
+
+class JsonLines:
+    """紧凑JSON Lines（流水线的流式格式）"""
+
+    name = 'jsonl'
+
+    def dump(self, filename, records):
+        stream = JsonSerializer().open_stream(filename)
+        for player_info in records:
+            stream.write(player_info)
+        stream.close()
+
+    def load(self, filename):
+        return list(iter_player_infos(filename))
+
+
+class Binary:
+    """二进制格式"""
+
+    def __init__(self, codec, compression):
+        self.serializer = BinarySerializer(codec=codec, compression=compression)
+        self.name = f"binary {codec}" + (f"+{compression}" if compression else '')
+
+    def dump(self, filename, records):
+        self.serializer.dump(filename, records, {'benchmark': True})
+
+    def load(self, filename):
+        return list(iter_player_infos(filename))
+
+
+def candidates():
+    """参与比较的格式"""
+    formats = [IndentedJson(), JsonLines(), Binary('json', None), Binary('json', 'zlib')]
+    if msgpack is not None:
+        formats += [Binary('msgpack', None), Binary('msgpack', 'zlib')]
+    return formats
+
+
+def run_benchmark(records, repeat=3):
+    """逐个格式写出、读取并校验，返回每个格式的最佳耗时和文件大小"""
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for index, fmt in enumerate(candidates()):
+            extension = '.jsonl' if isinstance(fmt, JsonLines) else ('.ffr' if isinstance(fmt, Binary) else '.json')
+            filename = os.path.join(tmp, f"bench_{index}{extension}")
+            encode_times, decode_times = [], []
+            for _ in range(repeat):
+                if os.path.exists(filename):
+                    os.remove(filename)
+                start = time.perf_counter()
+                fmt.dump(filename, records)
+                encode_times.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                loaded = fmt.load(filename)
+                decode_times.append(time.perf_counter() - start)
+            if loaded != records:
+                print(f"✗ {fmt.name} 读回的记录与原始记录不一致")
+            rows.append({
+                'format': fmt.name,
+                'size': os.path.getsize(filename),
+                'encode': min(encode_times),
+                'decode': min(decode_times)
+            })
+    return rows
+
+
+def print_report(rows, count):
+    """打印比较结果，倍数相对于当前的JSON格式"""
+    baseline = rows[0]
+    print(f"\n{'格式':<24}{'大小(KB)':>12}{'字节/条':>10}{'写出(条/秒)':>14}{'读取(条/秒)':>14}{'大小比':>8}{'写出倍数':>10}{'读取倍数':>10}")
+    for row in rows:
+        print(
+            f"{row['format']:<24}{row['size'] / 1024:>12.0f}{row['size'] / count:>10.0f}"
+            f"{count / row['encode']:>14.0f}{count / row['decode']:>14.0f}"
+            f"{row['size'] / baseline['size']:>8.2f}{baseline['encode'] / row['encode']:>10.1f}"
+            f"{baseline['decode'] / row['decode']:>10.1f}"
+        )
+    if msgpack is None:
+        print("\n未安装msgpack，只比较了紧凑JSON编码（pip install msgpack 后可比较msgpack编码）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比较结果文件格式的写出、读取速度和文件大小')
+    parser.add_argument('--count', type=int, default=20000, help='记录数')
+    parser.add_argument('--from-results', nargs='+', help='从以前的结果文件读取记录（可用通配符），默认随机生成')
+    parser.add_argument('--repeat', type=int, default=3, help='每个格式重复次数，取最快的一次')
+    parser.add_argument('--seed', type=int, default=0, help='随机生成记录的种子')
+    args = parser.parse_args()
+
+    records = load_records(args)
+    if not records:
+        print("没有可用的记录")
+        return 1
+    print(f"基准测试记录数: {len(records)}")
+    print_report(run_benchmark(records, args.repeat), len(records))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
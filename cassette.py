@@ -0,0 +1,417 @@
+"""
+流量录制与回放模块
+录制：通过CDP性能日志记录真实爬取过程中的全部HTTP交互（SPA静态资源、接口请求、登录跳转），
+写入带索引的cassette文件；
+回放：本地HTTP服务器按cassette返回录制的响应（包括原始耗时），
+爬虫和分析器指向本地服务器即可在完全相同的输入上离线运行、对比性能改动
+"""
+
+import re
+import json
+import mmap
+import zlib
+import time
+import base64
+import struct
+import threading
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from network_capture import NetworkCapture
+
+SITE_ORIGIN = "https://ff14risingstones.web.sdo.com"
+
+# 文件头和文件尾的标记；文件尾之前的8字节是索引的偏移量
+MAGIC = b'RSCASSETTE1\n'
+TRAILER = struct.Struct('<Q')
+
+# 回放时不原样返回的响应头：响应体已解码、长度会因改写变化，Cookie的域名不再匹配
+SKIPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'set-cookie',
+                   'strict-transport-security', 'content-security-policy', 'alt-svc'}
+
+# 需要改写其中绝对URL的响应类型
+TEXT_TYPES = ('html', 'javascript', 'css', 'json', 'text', 'xml')
+
+# 回放时其他域名的请求路径前缀
+ORIGIN_PREFIX = '/__origin__/'
+
+# 只用于绕过缓存的查询参数，每次请求取值不同，回放时匹配请求忽略这些参数；
+# uuid等决定响应内容的参数必须完全一致
+CACHE_BUSTER_PARAMS = {'_', '_t', 't', 'ts', 'timestamp', 'rand', 'random', 'nocache'}
+
+
+def request_key(method, url):
+    """请求的索引键：方法 + 主机 + 路径和查询参数（不区分协议）"""
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    return f"{method.upper()} {parts.netloc}{path}"
+
+
+def loose_key(key):
+    """去掉绕过缓存的查询参数后的索引键，其余参数按名称排序"""
+    base, _, query = key.partition('?')
+    if not query:
+        return base
+    params = sorted((name, value) for name, value in parse_qsl(query, keep_blank_values=True)
+                    if name not in CACHE_BUSTER_PARAMS)
+    return base + ('?' + urlencode(params) if params else '')
+
+
+class Cassette:
+    """cassette文件：压缩的响应体依次排列，文件末尾是所有交互的索引
+
+    索引的每一项记录请求方法、URL、状态码、响应头、耗时以及响应体在文件中的位置。
+    """
+
+    def __init__(self, path, mode='r'):
+        """打开cassette文件
+
+        Args:
+            path (str): 文件路径
+            mode (str): r 读取；w 写入（覆盖已有文件）
+        """
+        self.path = path
+        self.mode = mode
+        self.entries = []
+        self.lock = threading.Lock()
+
+        if mode == 'w':
+            self.file = open(path, 'wb')
+            self.file.write(MAGIC)
+            self.data = None
+        else:
+            self.file = open(path, 'rb')
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.load_index()
+
+    def load_index(self):
+        """读取文件末尾的索引"""
+        tail = len(self.data) - len(MAGIC)
+        if self.data[:len(MAGIC)] != MAGIC or self.data[tail:] != MAGIC:
+            raise ValueError(f"不是有效的cassette文件（可能录制未正常结束）: {self.path}")
+        index_offset = TRAILER.unpack(self.data[tail - TRAILER.size:tail])[0]
+        self.entries = json.loads(zlib.decompress(self.data[index_offset:tail - TRAILER.size]))
+
+    def add(self, entry, body):
+        """追加一次交互
+
+        Args:
+            entry (dict): 交互元数据（method、url、status、headers、mime_type、elapsed）
+            body (bytes): 响应体
+        """
+        compressed = zlib.compress(body) if body else b''
+        with self.lock:
+            entry['offset'] = self.file.tell()
+            entry['length'] = len(compressed)
+            self.file.write(compressed)
+            self.entries.append(entry)
+
+    def read_body(self, entry):
+        """读取交互的响应体"""
+        if not entry['length']:
+            return b''
+        return zlib.decompress(self.data[entry['offset']:entry['offset'] + entry['length']])
+
+    def close(self):
+        """写入模式下写出索引后关闭"""
+        if self.mode == 'w':
+            with self.lock:
+                index_offset = self.file.tell()
+                self.file.write(zlib.compress(json.dumps(self.entries, ensure_ascii=False).encode('utf-8')))
+                self.file.write(TRAILER.pack(index_offset))
+                self.file.write(MAGIC)
+        elif self.data is not None:
+            self.data.close()
+        self.file.close()
+
+    def summary(self):
+        """按主机统计交互数和响应体大小"""
+        hosts = {}
+        for entry in self.entries:
+            host = urlsplit(entry['url']).netloc
+            stats = hosts.setdefault(host, {'requests': 0, 'compressed_bytes': 0})
+            stats['requests'] += 1
+            stats['compressed_bytes'] += entry['length']
+        return {'entries': len(self.entries), 'hosts': hosts}
+
+
+class TrafficRecorder:
+    """从CDP性能日志录制HTTP交互"""
+
+    def __init__(self, path):
+        """初始化录制器
+
+        Args:
+            path (str): cassette文件路径
+        """
+        self.cassette = Cassette(path, 'w')
+        # requestId -> 正在进行的交互
+        self.requests = {}
+        self.recorded = 0
+
+    enable_logging = staticmethod(NetworkCapture.enable_logging)
+
+    def start(self, driver):
+        """开启CDP网络事件"""
+        driver.execute_cdp_cmd('Network.enable', {})
+        print(f"✓ 开始录制流量: {self.cassette.path}")
+
+    def finish(self, request, timestamp, body):
+        """把一次完成的交互写入cassette"""
+        if request.get('status') is None:
+            return
+        entry = {
+            'method': request['method'],
+            'url': request['url'],
+            'status': request['status'],
+            'headers': request.get('headers', {}),
+            'mime_type': request.get('mime_type', ''),
+            'elapsed': round(max(timestamp - request['started'], 0.0), 4)
+        }
+        self.cassette.add(entry, body)
+        self.recorded += 1
+
+    def read_body(self, driver, request_id):
+        """读取响应体，读取失败（例如已被浏览器回收）时返回空"""
+        try:
+            body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+        except Exception:
+            return b''
+        text = body.get('body', '')
+        if body.get('base64Encoded'):
+            return base64.b64decode(text)
+        return text.encode('utf-8')
+
+    def poll(self, driver):
+        """读取积累的性能日志并写入已完成的交互
+
+        需要在离开当前文档之前调用，导航之后浏览器可能不再保留旧文档的响应体。
+        """
+        try:
+            entries = driver.get_log('performance')
+        except Exception:
+            return
+
+        for log_entry in entries:
+            try:
+                message = json.loads(log_entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+
+            method = message.get('method')
+            params = message.get('params', {})
+            request_id = params.get('requestId')
+
+            if method == 'Network.requestWillBeSent':
+                url = params['request']['url']
+                if not url.startswith('http'):
+                    continue
+                # 跳转：同一个requestId的上一跳以跳转响应结束
+                previous = self.requests.pop(request_id, None)
+                redirect = params.get('redirectResponse')
+                if previous is not None and redirect:
+                    previous['status'] = redirect.get('status')
+                    previous['headers'] = redirect.get('headers', {})
+                    self.finish(previous, params['timestamp'], b'')
+                self.requests[request_id] = {
+                    'method': params['request'].get('method', 'GET'),
+                    'url': url,
+                    'started': params['timestamp']
+                }
+            elif method == 'Network.responseReceived':
+                request = self.requests.get(request_id)
+                if request is not None:
+                    response = params.get('response', {})
+                    request['status'] = response.get('status')
+                    request['headers'] = response.get('headers', {})
+                    request['mime_type'] = response.get('mimeType', '')
+            elif method == 'Network.loadingFinished':
+                request = self.requests.pop(request_id, None)
+                if request is not None:
+                    self.finish(request, params['timestamp'], self.read_body(driver, request_id))
+            elif method == 'Network.loadingFailed':
+                self.requests.pop(request_id, None)
+
+    def close(self, driver=None):
+        """写入剩余交互并写出索引"""
+        if driver is not None:
+            self.poll(driver)
+        self.cassette.close()
+        print(f"✓ 流量录制完成: {self.recorded} 次交互已保存到 {self.cassette.path}")
+
+
+class ReplayServer:
+    """按cassette回放HTTP交互的本地服务器
+
+    主站（SITE_ORIGIN）映射到服务器根路径，其他域名映射到 /__origin__/域名/ 下，
+    文本响应中的绝对URL同样改写到本地，因此所有请求都同源地发往本服务器。
+    同一个请求录制了多次时按录制顺序依次返回，之后重复返回最后一次。
+    """
+
+    def __init__(self, path, host='127.0.0.1', port=8765, timing=1.0, site_origin=SITE_ORIGIN):
+        """初始化回放服务器
+
+        Args:
+            path (str): cassette文件路径
+            host (str): 监听地址
+            port (int): 监听端口，0表示自动选择
+            timing (float): 耗时倍率，1.0按录制时的耗时返回，0不等待
+            site_origin (str): 映射到根路径的主站地址
+        """
+        self.cassette = Cassette(path)
+        self.timing = timing
+        self.site_host = urlsplit(site_origin).netloc
+        self.hosts = {urlsplit(entry['url']).netloc: urlsplit(entry['url']).scheme for entry in self.cassette.entries}
+        self.hosts.setdefault(self.site_host, urlsplit(site_origin).scheme)
+
+        self.index = {}
+        for entry in self.cassette.entries:
+            self.index.setdefault(request_key(entry['method'], entry['url']), []).append(entry)
+        # 忽略绕过缓存的参数后的索引键 -> 录制时的索引键
+        self.loose_index = {}
+        for key in self.index:
+            self.loose_index.setdefault(loose_key(key), key)
+        # 同一个请求已回放的次数
+        self.served = {}
+        # 找不到录制的请求，用于判断录制是否完整
+        self.misses = []
+        self.lock = threading.Lock()
+
+        self.server = ThreadingHTTPServer((host, port), self.make_handler())
+        self.server.daemon_threads = True
+        self.base_url = f"http://{host}:{self.server.server_address[1]}"
+        self.thread = None
+
+        hosts = '|'.join(re.escape(h) for h in sorted(self.hosts, key=len, reverse=True))
+        # 匹配 https://host、//host 以及JSON中转义的 https:\/\/host
+        self.url_pattern = re.compile(rf'(https?:)?(\\?/\\?/)({hosts})(?![\w.-])')
+
+    def local_url(self, url):
+        """把站点URL转换为回放服务器上的URL"""
+        parts = urlsplit(url)
+        if parts.netloc not in self.hosts:
+            return url
+        prefix = self.base_url if parts.netloc == self.site_host else f"{self.base_url}{ORIGIN_PREFIX}{parts.netloc}"
+        return prefix + url[len(f"{parts.scheme}://{parts.netloc}"):]
+
+    def public_url(self, url):
+        """把回放服务器上的URL还原为站点URL"""
+        if not url.startswith(self.base_url):
+            return url
+        rest = url[len(self.base_url):]
+        if rest.startswith(ORIGIN_PREFIX):
+            host, _, rest = rest[len(ORIGIN_PREFIX):].partition('/')
+            return f"{self.hosts.get(host, 'https')}://{host}/{rest}"
+        return f"{self.hosts[self.site_host]}://{self.site_host}{rest}"
+
+    def rewrite_body(self, body):
+        """改写文本响应中指向录制域名的绝对URL"""
+        text = body.decode('utf-8', errors='surrogateescape')
+        base = self.base_url
+
+        def replace(match):
+            scheme, slashes, host = match.groups()
+            escaped = '\\' in slashes
+            target = base if host == self.site_host else f"{base}{ORIGIN_PREFIX}{host}"
+            if not scheme:
+                # 协议相对URL只替换主机部分
+                target = '//' + target.split('//', 1)[1]
+            return target.replace('/', '\\/') if escaped else target
+
+        return self.url_pattern.sub(replace, text).encode('utf-8', errors='surrogateescape')
+
+    def lookup(self, method, path):
+        """查找请求对应的录制交互
+
+        精确匹配失败时只忽略绕过缓存的查询参数（时间戳等）再匹配一次，
+        uuid等其他参数不同的请求视为没有录制，不返回其他请求的响应。
+        """
+        if path.startswith(ORIGIN_PREFIX):
+            host, _, rest = path[len(ORIGIN_PREFIX):].partition('/')
+            path = '/' + rest
+        else:
+            host = self.site_host
+        key = f"{method} {host}{path}"
+
+        with self.lock:
+            candidates = self.index.get(key)
+            if candidates is None and loose_key(key) in self.loose_index:
+                key = self.loose_index[loose_key(key)]
+                candidates = self.index[key]
+            if candidates is None:
+                self.misses.append(key)
+                return None
+            count = self.served.get(key, 0)
+            self.served[key] = count + 1
+            return candidates[min(count, len(candidates) - 1)]
+
+    def make_handler(self):
+        """生成绑定到本服务器的请求处理类"""
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def handle_request(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    self.rfile.read(length)
+
+                entry = replay.lookup(self.command, self.path)
+                if entry is None:
+                    self.send_error(404, 'not recorded')
+                    return
+
+                if replay.timing:
+                    time.sleep(entry['elapsed'] * replay.timing)
+
+                body = replay.cassette.read_body(entry)
+                mime_type = entry.get('mime_type', '')
+                if body and any(kind in mime_type for kind in TEXT_TYPES):
+                    body = replay.rewrite_body(body)
+
+                self.send_response(entry['status'])
+                for name, value in entry['headers'].items():
+                    if name.lower() in SKIPPED_HEADERS:
+                        continue
+                    if name.lower() == 'location':
+                        value = replay.local_url(value)
+                    for line in str(value).split('\n'):
+                        self.send_header(name, line)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            do_GET = do_POST = do_HEAD = do_PUT = do_DELETE = handle_request
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """在后台线程中启动服务器"""
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"✓ 回放服务器已启动: {self.base_url}（{len(self.cassette.entries)} 次录制的交互）")
+        return self
+
+    def stop(self):
+        """停止服务器并报告未录制的请求"""
+        self.server.shutdown()
+        self.server.server_close()
+        self.cassette.close()
+        if self.misses:
+            print(f"回放时有 {len(self.misses)} 个请求没有录制，例如: {self.misses[0]}")
+
+
+def replay_from_config(cassette_config):
+    """按配置中的cassette配置段启动回放服务器，非回放模式返回None"""
+    if cassette_config.get('mode') != 'replay':
+        return None
+    return ReplayServer(
+        cassette_config.get('path', 'output/site.cassette'),
+        port=cassette_config.get('port', 0),
+        timing=cassette_config.get('timing', 1.0)
+    ).start()
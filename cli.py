@@ -0,0 +1,640 @@
+"""
+命令行入口
+统一的非交互式命令行，各子命令只在执行时导入自己需要的依赖：
+浏览器相关命令才导入Selenium，导出和统计命令才导入NumPy
+
+用法:
+    python cli.py crawl --uid 10001205
+    python cli.py crawl --uid 10001205 --uid 10001206 --uid 10001207 --tabs 3
+    python cli.py batch --start-uid 10001009
+    python cli.py batch --start-uid 10001009 --end-uid 10100000
+    python cli.py batch --start-uid 10001009 --end-uid 10100000 --status-port 8766
+    python cli.py batch --start-uid 10001009 --end-uid 10020000 --sequential --max-misses 0 --time-budget 3600 --max-workers 4
+    python cli.py batch --from-results output/batch_results_*.json --only live --time-budget 7200 --max-workers 4
+    python cli.py crawl --uid-file uids.txt
+    python cli.py pipeline --start-uid 10001009 --count 1000 --fetchers 2
+    python cli.py batch --start-uid 10001009 --end-uid 10100000 --format binary
+    python cli.py batch --start-uid 10001009 --feeds
+    python cli.py feeds --from-results output/batch_results_*.json
+    python cli.py batch --discover --from-results output/batch_results_*.json --only live
+    python cli.py frontier
+    python cli.py reparse output/page_source_*.html
+    python cli.py reparse output/page_source_*.html --cache-file output/parse_cache.json
+    python cli.py export output/batch_results_*.json --format npy
+    python cli.py analyze output/export_20250101_000000
+    python cli.py stats output/batch_results_*.json
+    python cli.py history import output/batch_results_*.json
+    python cli.py history show --uid 10001205 --at 2025-01-01
+    python cli.py crawl --uid 10001205 --record output/site.cassette
+    python cli.py batch --start-uid 10001009 --replay output/site.cassette
+    python cli.py replay serve output/site.cassette --port 8765
+    python cli.py --profile reparse output/page_source_*.html
+    python cli.py pages --start-uid 10001009 --count 20 --browsers 2
+    python cli.py pages --html output/page_source_*.html
+    python cli.py compact output/batch_results_*.json
+    python cli.py lookup 10001205
+"""
+
+import time
+
+START_TIME = time.perf_counter()
+
+import sys
+import glob
+import json
+import argparse
+from datetime import datetime
+
+
+def default_result_files():
+    """output/中的全部结果文件"""
+    return sorted(
+        glob.glob('output/spider_results_*.json') + glob.glob('output/batch_results_*.json')
+        + glob.glob('output/spider_results_*.ffr') + glob.glob('output/batch_results_*.ffr')
+    )
+
+
+def apply_cassette_args(spider, args):
+    """命令行的 --record/--replay 覆盖配置文件中的cassette配置"""
+    if args.record:
+        spider.cassette_config = dict(spider.cassette_config, mode='record', path=args.record)
+    elif args.replay:
+        spider.cassette_config = dict(spider.cassette_config, mode='replay', path=args.replay)
+
+
+def input_source(args):
+    """由 --uid-file/--from-results 构造流式输入，都未指定时返回None"""
+    import itertools
+    from sources import read_targets, uids_from_results
+
+    sources = [read_targets(path) for path in args.uid_file]
+    if args.from_results:
+        paths = [path for pattern in args.from_results for path in sorted(glob.glob(pattern)) or [pattern]]
+        sources.append(uids_from_results(paths, args.only))
+    return itertools.chain.from_iterable(sources) if sources else None
+
+
+def add_input_args(parser):
+    """流式输入参数"""
+    parser.add_argument('--uid-file', action='append', default=[],
+                        help='逐行读取UID或URL的文件，可重复，-表示标准输入')
+    parser.add_argument('--from-results', nargs='+', help='以前的结果文件（可用通配符），从中读取UID')
+    parser.add_argument('--only', choices=['all', 'live', 'missing'], default='all',
+                        help='从结果文件读取时只取存在/不存在的用户')
+
+
+def add_format_arg(parser):
+    """结果文件格式参数"""
+    parser.add_argument('--format', choices=['json', 'binary'],
+                        help='结果文件格式，默认按配置文件的output.format（json）')
+
+
+def apply_format_args(spider, args):
+    """命令行的 --format 覆盖配置文件中的结果文件格式"""
+    if args.format:
+        from serializers import serializer_from_config
+        spider.serializer = serializer_from_config(spider.config, args.format)
+
+
+def apply_feeds_args(spider, args):
+    """命令行的 --feeds 在配置文件未启用时也采集帖子和动态"""
+    if args.feeds and not spider.feeds:
+        from feeds import FeedCrawler
+        crawler = FeedCrawler(spider.config.get('feeds', {}))
+        if crawler.sections:
+            spider.feeds = crawler
+        else:
+            print("配置中没有可用的动态栏目（feeds.sections 的 api_url），不采集动态")
+
+
+def cmd_crawl(args):
+    """爬取指定的URL或UID"""
+    from ff14_spider import FF14RisingStonesSpider
+    from records import PROFILE_URL_TEMPLATE
+
+    spider = FF14RisingStonesSpider(args.config)
+    spider.interactive = args.interactive
+    if args.tabs:
+        spider.tabs = args.tabs
+    apply_cassette_args(spider, args)
+    apply_format_args(spider, args)
+    apply_feeds_args(spider, args)
+
+    import itertools
+
+    urls = list(args.url) + [PROFILE_URL_TEMPLATE.format(uid=uid) for uid in args.uid]
+    source = input_source(args)
+    if source is not None:
+        urls = itertools.chain(urls, source)
+    return 0 if spider.run(urls or None) else 1
+
+
+def cmd_batch(args):
+    """从起始UID开始批量爬取"""
+    import itertools
+    from batch_spider import BatchSpiderProduction
+    from policies import policies_from_args
+
+    # --end-uid 默认按密度调度整个区间；加 --sequential 时作为顺序爬取的结束UID
+    policies = policies_from_args(
+        max_users=args.max_users,
+        end_uid=args.end_uid if args.sequential else None,
+        max_misses=args.max_misses,
+        time_budget=args.time_budget,
+        request_budget=args.request_budget,
+        target_live=args.target_live
+    )
+    batch_spider = BatchSpiderProduction(start_uid=args.start_uid, policies=policies,
+                                         batch_size=args.batch_size, max_workers=args.max_workers,
+                                         delay=args.delay)
+    batch_spider.spider.interactive = args.interactive
+    apply_cassette_args(batch_spider.spider, args)
+    apply_format_args(batch_spider.spider, args)
+    apply_feeds_args(batch_spider.spider, args)
+    if args.probe:
+        from probe import ExistenceProbe
+        probe_config = batch_spider.spider.config.get('probe', {})
+        if probe_config.get('api_url'):
+            batch_spider.spider.probe = ExistenceProbe(probe_config)
+        else:
+            print("配置中没有 probe.api_url，不使用预检")
+    if args.status_port:
+        batch_spider.progress.start_server(args.status_port)
+
+    source = input_source(args)
+    frontier = None
+    if args.discover:
+        from frontier import frontier_from_config
+        frontier = frontier_from_config(batch_spider.spider.config)
+        if args.seed_uid:
+            source = itertools.chain(args.seed_uid, source or [])
+        success = batch_spider.crawl_frontier(frontier, source)
+    elif source is not None:
+        success = batch_spider.crawl_uids(source)
+    elif args.end_uid is not None and not args.sequential:
+        success = batch_spider.crawl_scheduled(args.end_uid, block_size=args.block_size)
+    else:
+        success = batch_spider.crawl_until_nonexistent()
+
+    try:
+        if not success:
+            print("批量爬取失败")
+            return 1
+        batch_spider.save_results()
+        return 0
+    finally:
+        if frontier is not None:
+            frontier.close()
+
+
+def cmd_frontier(args):
+    """发现模式的待爬取集合状态"""
+    from frontier import Frontier
+
+    with open(args.config, 'r', encoding='utf-8') as f:
+        frontier_config = json.load(f).get('frontier', {})
+    if args.db:
+        frontier_config = dict(frontier_config, db_file=args.db)
+    frontier = Frontier(frontier_config)
+    try:
+        if args.seed_uid:
+            print(f"新加入种子 {frontier.add_uids(args.seed_uid)} 个")
+        stats = frontier.stats()
+    finally:
+        frontier.close()
+
+    print(f"已知UID: {stats['players']}（已爬取 {stats['crawled']}，存在 {stats['live']}，待爬取 {stats['due']}）")
+    print(f"已知部队: {stats['fcs']}（已展开 {stats['fcs_expanded']}）")
+    return 0
+
+
+def cmd_pipeline(args):
+    """分阶段流水线爬取一段连续UID"""
+    from pipeline import CrawlPipeline
+    from records import PROFILE_URL_TEMPLATE
+    from serializers import serializer_from_config
+
+    try:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        config = {}
+
+    pipeline = CrawlPipeline(
+        fetchers=args.fetchers,
+        parsers=args.parsers,
+        queue_size=args.queue_size,
+        keep_html=args.keep_html,
+        config_file=args.config,
+        serializer=serializer_from_config(config, args.format),
+        parse_cache_size=(config.get('parse_cache', {}).get('max_entries', 10000)
+                          if config.get('parse_cache', {}).get('enabled', True) else 0)
+    )
+    urls = (PROFILE_URL_TEMPLATE.format(uid=uid) for uid in range(args.start_uid, args.start_uid + args.count))
+    try:
+        pipeline.run(urls)
+    except RuntimeError as e:
+        print(f"✗ 流水线失败: {e}")
+        return 1
+    return 0
+
+
+def cmd_feeds(args):
+    """只增量采集帖子和动态，不重新爬取个人信息"""
+    import itertools
+    from ff14_spider import FF14RisingStonesSpider
+
+    spider = FF14RisingStonesSpider(args.config)
+    spider.interactive = args.interactive
+    apply_cassette_args(spider, args)
+    apply_format_args(spider, args)
+    args.feeds = True
+    apply_feeds_args(spider, args)
+
+    uids = list(args.uid)
+    source = input_source(args)
+    if source is not None:
+        uids = itertools.chain(uids, source)
+    return 0 if spider.run_feeds(uids) else 1
+
+
+def cmd_reparse(args):
+    """离线重新解析保存的页面源码"""
+    from profile_parser import reparse_html_file
+    from selector_engine import engine_from_config
+    from parse_cache import parse_cache_from_config
+
+    paths = args.paths or sorted(glob.glob('output/page_source_*.html'))
+    if not paths:
+        print("没有找到需要重新解析的页面源码")
+        return 1
+
+    try:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        config = {}
+    selector_engine = None if args.no_selectors else engine_from_config(config)
+    parse_cache = None if args.no_cache else parse_cache_from_config(config, args.cache_file)
+
+    results = []
+    for path in paths:
+        try:
+            results.append(reparse_html_file(path, selector_engine, parse_cache))
+        except Exception as e:
+            print(f"✗ 解析失败 {path}: {e}")
+
+    if parse_cache:
+        report = parse_cache.report()
+        if report:
+            print(report)
+        parse_cache.save()
+
+    if selector_engine:
+        report = selector_engine.report()
+        if report:
+            print("选择器命中率:")
+            print('\n'.join(report))
+        selector_engine.save()
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = args.output or f"output/spider_results_reparse_{timestamp}.json"
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    print(f"✓ 已重新解析 {len(results)}/{len(paths)} 个页面，结果保存到: {filename}")
+    return 0
+
+
+def cmd_export(args):
+    """导出为列式存储"""
+    from exporter import export_results
+
+    paths = args.paths or default_result_files()
+    if not paths:
+        print("没有找到需要导出的结果文件")
+        return 1
+    export_results(paths, args.output, args.format)
+    return 0
+
+
+def cmd_analyze(args):
+    """生成玩家群体统计报告"""
+    from analytics import run_analytics
+
+    paths = args.paths or default_result_files()
+    if not paths:
+        print("没有找到需要分析的数据")
+        return 1
+
+    if len(paths) == 1 and not paths[0].endswith(('.json', '.jsonl', '.ffr')):
+        run_analytics(paths[0], bucket_size=args.bucket_size)
+    else:
+        run_analytics(paths, bucket_size=args.bucket_size)
+    return 0
+
+
+def cmd_stats(args):
+    """统计结果文件中的记录数"""
+    from records import iter_player_infos
+
+    paths = args.paths or default_result_files()
+    if not paths:
+        print("没有找到结果文件")
+        return 1
+
+    total = live = nonexistent = 0
+    uids = set()
+    for path in paths:
+        file_total = file_live = 0
+        for player_info in iter_player_infos(path):
+            player_data = player_info.get('player_data', {})
+            file_total += 1
+            if player_data.get('user_exists', True):
+                file_live += 1
+            if player_data.get('uid'):
+                uids.add(player_data['uid'])
+        total += file_total
+        live += file_live
+        nonexistent += file_total - file_live
+        print(f"  {path}: {file_total} 条，存在 {file_live}，不存在 {file_total - file_live}")
+
+    print(f"\n文件数: {len(paths)}")
+    print(f"记录数: {total}（去重后UID {len(uids)} 个）")
+    print(f"存在用户: {live}")
+    print(f"不存在用户: {nonexistent}")
+    return 0
+
+
+def cmd_history(args):
+    """快照历史：导入、查询、压缩"""
+    from history import HistoryStore, parse_time_arg
+
+    store = HistoryStore(args.db, keyframe_interval=args.keyframe_interval)
+    try:
+        if args.action == 'import':
+            paths = args.paths or default_result_files()
+            store.import_files(paths)
+        elif args.action == 'show':
+            if args.uid is None:
+                print("请使用 --uid 指定要查询的UID")
+                return 1
+            state = store.state_at(args.uid, parse_time_arg(args.at))
+            print(json.dumps(state, ensure_ascii=False, indent=2) if state else "没有该时间点的记录")
+        elif args.action == 'compact':
+            store.compact(parse_time_arg(args.before))
+
+        print(json.dumps(store.stats(), ensure_ascii=False))
+    finally:
+        store.close()
+    return 0
+
+
+def cmd_pages(args):
+    """分析页面结构：采集快照后离线统计选择器和关键词"""
+    from page_analyzer import analyze_urls, analyze_and_save, snapshot_from_html_file
+    from records import PROFILE_URL_TEMPLATE
+
+    if args.html:
+        snapshots = []
+        for path in args.html:
+            try:
+                snapshots.append(snapshot_from_html_file(path))
+            except Exception as e:
+                print(f"✗ 读取失败 {path}: {e}")
+        analyze_and_save(snapshots, args.workers)
+        return 0
+
+    uids = list(args.uid)
+    if args.start_uid is not None:
+        uids.extend(range(args.start_uid, args.start_uid + args.count))
+    if not uids:
+        print("请使用 --uid、--start-uid 或 --html 指定要分析的页面")
+        return 1
+    urls = [PROFILE_URL_TEMPLATE.format(uid=uid) for uid in uids]
+    analyze_urls(urls, browsers=args.browsers, workers=args.workers, wait=args.wait)
+    return 0
+
+
+def cmd_compact(args):
+    """合并结果文件为按UID排序的分段"""
+    from segments import compact
+
+    paths = args.paths or default_result_files()
+    if not paths:
+        print("没有找到需要压实的结果文件")
+        return 1
+    compact(paths, args.segments, segment_size=args.segment_size,
+            index_interval=args.index_interval, remove_sources=args.remove_sources)
+    return 0
+
+
+def cmd_lookup(args):
+    """在压实后的分段中查询UID"""
+    from segments import SegmentReader
+
+    reader = SegmentReader(args.segments)
+    try:
+        code = 0
+        for uid in args.uid:
+            player_info = reader.lookup(uid)
+            if player_info is None:
+                print(f"UID {uid}: 没有记录")
+                code = 1
+            else:
+                print(json.dumps(player_info, ensure_ascii=False, indent=2))
+    finally:
+        reader.close()
+    return code
+
+
+def cmd_replay(args):
+    """回放录制的流量或查看cassette内容"""
+    from cassette import Cassette, ReplayServer
+    from records import PROFILE_URL_TEMPLATE
+
+    if args.action == 'info':
+        cassette = Cassette(args.cassette)
+        print(json.dumps(cassette.summary(), ensure_ascii=False, indent=2))
+        cassette.close()
+        return 0
+
+    server = ReplayServer(args.cassette, host=args.host, port=args.port, timing=args.speed).start()
+    print(f"个人信息页: {server.local_url(PROFILE_URL_TEMPLATE.format(uid='<UID>'))}，按Ctrl+C停止")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+def add_cassette_args(parser):
+    """录制/回放参数"""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--record', metavar='CASSETTE', help='录制本次爬取的全部HTTP交互到cassette文件')
+    group.add_argument('--replay', metavar='CASSETTE', help='使用本地回放服务器代替真实站点')
+
+
+def build_parser():
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(prog='cli.py', description='FF14 Rising Stones 爬虫命令行')
+    parser.add_argument('--timing', action='store_true', help='打印启动耗时和总耗时')
+    parser.add_argument('--profile', action='store_true', help='用cProfile和tracemalloc分析本次运行，结果保存到 output/')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    crawl = subparsers.add_parser('crawl', help='爬取指定的URL或UID')
+    crawl.add_argument('--url', action='append', default=[], help='目标URL，可重复')
+    crawl.add_argument('--uid', action='append', default=[], type=int, help='目标UID，可重复')
+    crawl.add_argument('--config', default='config.json', help='配置文件路径')
+    crawl.add_argument('--interactive', action='store_true', help='需要登录时等待手动登录')
+    crawl.add_argument('--tabs', type=int, help='在同一个浏览器中同时加载的标签页数')
+    crawl.add_argument('--feeds', action='store_true', help='存在的用户接着增量采集帖子和动态')
+    add_input_args(crawl)
+    add_format_arg(crawl)
+    add_cassette_args(crawl)
+    crawl.set_defaults(func=cmd_crawl)
+
+    batch = subparsers.add_parser('batch', help='从起始UID开始批量爬取')
+    batch.add_argument('--start-uid', type=int, default=10001009, help='起始UID')
+    batch.add_argument('--end-uid', type=int, help='结束UID，指定后按存活密度调度爬取整个区间')
+    batch.add_argument('--block-size', type=int, default=1000, help='按密度调度时估计密度的区块大小')
+    batch.add_argument('--sequential', action='store_true', help='指定--end-uid时仍按UID顺序爬取，不按密度调度')
+    batch.add_argument('--max-users', type=int, help='最多爬取的UID数')
+    batch.add_argument('--max-misses', type=int, default=10, help='连续不存在用户数达到该值时停止，0表示不限制')
+    batch.add_argument('--time-budget', type=float, help='时间预算（秒），剩余时间不足以完成一个UID时停止')
+    batch.add_argument('--request-budget', type=int, help='最多向站点发出的请求数（页面和预检各计一次）')
+    batch.add_argument('--target-live', type=int, help='找到该数量的存在用户后停止')
+    batch.add_argument('--max-workers', type=int, default=1, help='并发浏览器数上限，按时间预算自动分配')
+    batch.add_argument('--batch-size', type=int, default=50, help='每爬取多少个UID保存一个批次')
+    batch.add_argument('--delay', type=float, default=1, help='每个浏览器两次请求之间的间隔（秒）')
+    add_input_args(batch)
+    batch.add_argument('--interactive', action='store_true', help='需要登录时等待手动登录')
+    batch.add_argument('--status-port', type=int, help='在该本地端口提供实时爬取状态（JSON）')
+    batch.add_argument('--probe', action='store_true', help='先用接口预检UID是否存在，不存在的UID跳过页面渲染')
+    batch.add_argument('--feeds', action='store_true', help='存在的用户接着增量采集帖子和动态')
+    batch.add_argument('--discover', action='store_true',
+                       help='发现模式：沿部队成员列表扩展待爬取集合，输入的UID作为种子')
+    batch.add_argument('--seed-uid', action='append', default=[], type=int, help='发现模式的种子UID，可重复')
+    add_format_arg(batch)
+    add_cassette_args(batch)
+    batch.set_defaults(func=cmd_batch)
+
+    pipeline = subparsers.add_parser('pipeline', help='分阶段流水线爬取一段连续UID')
+    pipeline.add_argument('--start-uid', type=int, default=10001009, help='起始UID')
+    pipeline.add_argument('--count', type=int, required=True, help='爬取的UID数量')
+    pipeline.add_argument('--fetchers', type=int, default=1, help='抓取worker数（每个一个浏览器）')
+    pipeline.add_argument('--parsers', type=int, help='解析进程数，默认CPU核数')
+    pipeline.add_argument('--queue-size', type=int, default=32, help='阶段间队列长度')
+    pipeline.add_argument('--keep-html', action='store_true', help='保存页面源码')
+    pipeline.add_argument('--config', default='config.json', help='配置文件路径')
+    add_format_arg(pipeline)
+    pipeline.set_defaults(func=cmd_pipeline)
+
+    frontier = subparsers.add_parser('frontier', help='查看发现模式的待爬取集合')
+    frontier.add_argument('--config', default='config.json', help='配置文件路径（读取frontier配置）')
+    frontier.add_argument('--db', help='待爬取集合数据库，默认按配置')
+    frontier.add_argument('--seed-uid', action='append', default=[], type=int, help='加入种子UID，可重复')
+    frontier.set_defaults(func=cmd_frontier)
+
+    feeds = subparsers.add_parser('feeds', help='只增量采集帖子和动态')
+    feeds.add_argument('--uid', action='append', default=[], type=int, help='目标UID，可重复')
+    feeds.add_argument('--config', default='config.json', help='配置文件路径')
+    feeds.add_argument('--interactive', action='store_true', help='需要登录时等待手动登录')
+    add_input_args(feeds)
+    add_format_arg(feeds)
+    add_cassette_args(feeds)
+    # 从结果文件读取时默认只取存在的用户
+    feeds.set_defaults(func=cmd_feeds, only='live')
+
+    reparse = subparsers.add_parser('reparse', help='离线重新解析保存的页面源码')
+    reparse.add_argument('paths', nargs='*', help='页面源码文件，默认 output/page_source_*.html')
+    reparse.add_argument('--output', help='结果文件路径')
+    reparse.add_argument('--config', default='config.json', help='配置文件路径（读取selectors）')
+    reparse.add_argument('--no-selectors', action='store_true', help='不按配置的选择器提取字段')
+    reparse.add_argument('--cache-file', help='解析缓存文件，再次重新解析同一批存档时直接命中（默认读取配置的parse_cache）')
+    reparse.add_argument('--no-cache', action='store_true', help='不使用解析缓存')
+    reparse.set_defaults(func=cmd_reparse)
+
+    export = subparsers.add_parser('export', help='导出为列式存储')
+    export.add_argument('paths', nargs='*', help='结果文件，默认 output/ 中的全部结果')
+    export.add_argument('--format', choices=['auto', 'parquet', 'npy'], default='auto', help='输出格式')
+    export.add_argument('--output', help='输出路径')
+    export.set_defaults(func=cmd_export)
+
+    analyze = subparsers.add_parser('analyze', help='生成玩家群体统计报告')
+    analyze.add_argument('paths', nargs='*', help='导出路径或结果文件')
+    analyze.add_argument('--bucket-size', type=int, default=10000, help='UID区间大小')
+    analyze.set_defaults(func=cmd_analyze)
+
+    stats = subparsers.add_parser('stats', help='统计结果文件中的记录数')
+    stats.add_argument('paths', nargs='*', help='结果文件，默认 output/ 中的全部结果')
+    stats.set_defaults(func=cmd_stats)
+
+    history = subparsers.add_parser('history', help='增量快照历史')
+    history.add_argument('action', choices=['import', 'show', 'compact', 'stats'], help='操作')
+    history.add_argument('paths', nargs='*', help='import时导入的结果文件，默认 output/ 中的全部结果')
+    history.add_argument('--db', default='output/history.db', help='历史数据库路径')
+    history.add_argument('--uid', type=int, help='show时查询的UID')
+    history.add_argument('--at', help='show时查询的时间点（ISO时间或epoch秒），默认最新')
+    history.add_argument('--before', help='compact时把该时间点之前的历史合并为一个完整快照')
+    history.add_argument('--keyframe-interval', type=int, default=20, help='连续多少个增量之后写入完整快照')
+    history.set_defaults(func=cmd_history)
+
+    pages = subparsers.add_parser('pages', help='分析页面结构（选择器和关键词统计）')
+    pages.add_argument('--uid', action='append', default=[], type=int, help='要分析的UID，可重复')
+    pages.add_argument('--start-uid', type=int, help='连续分析的起始UID')
+    pages.add_argument('--count', type=int, default=10, help='连续分析的UID数量')
+    pages.add_argument('--html', nargs='+', help='离线分析保存的页面源码，不启动浏览器')
+    pages.add_argument('--browsers', type=int, default=1, help='同时采集快照的浏览器数')
+    pages.add_argument('--workers', type=int, help='离线分析的进程数，默认CPU核数')
+    pages.add_argument('--wait', type=float, default=5, help='每个页面加载后等待渲染的秒数')
+    pages.set_defaults(func=cmd_pages)
+
+    compact = subparsers.add_parser('compact', help='合并结果文件为按UID排序、去重的分段')
+    compact.add_argument('paths', nargs='*', help='结果文件，默认 output/ 中的全部结果')
+    compact.add_argument('--segments', default='output/segments', help='分段目录')
+    compact.add_argument('--segment-size', type=int, default=100000, help='每个分段的记录数')
+    compact.add_argument('--index-interval', type=int, default=64, help='稀疏索引间隔')
+    compact.add_argument('--remove-sources', action='store_true', help='压实后删除输入文件')
+    compact.set_defaults(func=cmd_compact)
+
+    lookup = subparsers.add_parser('lookup', help='在压实后的分段中查询UID')
+    lookup.add_argument('uid', nargs='+', type=int, help='UID')
+    lookup.add_argument('--segments', default='output/segments', help='分段目录')
+    lookup.set_defaults(func=cmd_lookup)
+
+    replay = subparsers.add_parser('replay', help='回放录制的流量')
+    replay.add_argument('action', choices=['serve', 'info'], help='serve 启动回放服务器；info 查看录制内容')
+    replay.add_argument('cassette', help='cassette文件路径')
+    replay.add_argument('--host', default='127.0.0.1', help='监听地址')
+    replay.add_argument('--port', type=int, default=8765, help='监听端口')
+    replay.add_argument('--speed', type=float, default=1.0, help='耗时倍率：1按录制时的耗时返回，0不等待')
+    replay.set_defaults(func=cmd_replay)
+
+    return parser
+
+
+def main(argv=None):
+    """主函数"""
+    args = build_parser().parse_args(argv)
+
+    if args.timing:
+        print(f"启动耗时: {(time.perf_counter() - START_TIME) * 1000:.1f} ms")
+
+    if args.profile:
+        from profiling import profile_run
+        with profile_run(args.command):
+            code = args.func(args)
+    else:
+        code = args.func(args)
+
+    if args.timing:
+        print(f"总耗时: {(time.perf_counter() - START_TIME) * 1000:.1f} ms")
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
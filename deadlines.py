@@ -0,0 +1,70 @@
+"""
+截止时间模块
+把 timeouts 配置应用到浏览器驱动（页面加载策略、页面加载超时、脚本超时），
+并为每个UID提供截止时间：超时的页面通过 window.stop 取消加载，UID交给重试而不是阻塞整个批次
+"""
+
+import time
+
+PAGE_LOAD_STRATEGIES = ('normal', 'eager', 'none')
+
+
+class DeadlineExceeded(Exception):
+    """单个UID的处理超过截止时间"""
+
+
+class Deadline:
+    """单个UID的截止时间"""
+
+    __slots__ = ('budget', 'expires')
+
+    def __init__(self, budget):
+        """初始化截止时间
+
+        Args:
+            budget (float): 允许的秒数，None或0表示不限制
+        """
+        self.budget = budget
+        self.expires = time.time() + budget if budget else None
+
+    def remaining(self):
+        """剩余秒数"""
+        if self.expires is None:
+            return float('inf')
+        return self.expires - time.time()
+
+    def check(self, stage):
+        """已超过截止时间时抛出DeadlineExceeded"""
+        if self.remaining() <= 0:
+            raise DeadlineExceeded(f"{stage}超过单个UID的截止时间 {self.budget} 秒")
+
+    def clip(self, seconds):
+        """把等待时间限制在剩余时间内"""
+        return max(0.0, min(seconds, self.remaining()))
+
+    def sleep(self, seconds, stage='等待页面'):
+        """在截止时间内等待，等待后已超时则抛出DeadlineExceeded"""
+        time.sleep(self.clip(seconds))
+        self.check(stage)
+
+
+def apply_page_load_strategy(options, strategy):
+    """设置页面加载策略：normal 等待load事件，eager 等待DOMContentLoaded，none 不等待"""
+    if strategy not in PAGE_LOAD_STRATEGIES:
+        print(f"未知的页面加载策略 {strategy}，使用normal")
+        strategy = 'normal'
+    options.page_load_strategy = strategy
+
+
+def apply_timeouts(driver, timeouts):
+    """把 timeouts 配置应用到驱动：页面加载超时和脚本超时"""
+    driver.set_page_load_timeout(timeouts.get('page_load', 30))
+    driver.set_script_timeout(timeouts.get('script', 10))
+
+
+def stop_loading(driver):
+    """取消当前页面仍在进行的加载，失败时忽略"""
+    try:
+        driver.execute_script("window.stop();")
+    except Exception:
+        pass
@@ -0,0 +1,305 @@
+"""
+结果导出模块
+把爬取结果中的中文文本字段规范化为类型化的列，并写出列式存储
+（安装了pyarrow时写Parquet，否则写可内存映射的NumPy .npy目录）
+"""
+
+import os
+import re
+import sys
+import json
+import glob
+from array import array
+from datetime import datetime
+
+import numpy as np
+
+from records import iter_player_infos, parse_timestamp
+
+# 种族枚举，编码为下标，0表示未知；匹配时使用页面中可能出现的前缀
+RACES = ('未知', '人族', '精灵族', '拉拉菲尔族', '猫魅族', '鲁加族', '敖龙族', '硌狮族', '维埃拉族')
+RACE_PATTERNS = ('人族', '精灵族', '拉拉菲尔', '猫魅族', '鲁加', '敖龙族', '硌狮族', '维埃拉')
+
+GENDERS = ('未知', '男', '女')
+
+# 缺失或被屏蔽的数值统一使用-1
+MISSING = -1
+
+PLAYTIME_PATTERN = re.compile(r'(?:(\d+)\s*天)?\s*(?:(\d+)\s*小时)?\s*(?:(\d+)\s*分钟?)?')
+DATE_PATTERN = re.compile(r'(\d{4})[-/.年](\d{1,2})[-/.月](\d{1,2})日?(?:\s+(\d{1,2}):(\d{2})(?::(\d{2}))?)?')
+JOB_LEVEL_PATTERN = re.compile(r'([^\s\d:：|/]*)\s*[Ll][Vv]\.?\s*(\d+)')
+
+# 列名 -> array.array类型码、NumPy类型
+COLUMNS = {
+    'uid': ('q', np.int64),
+    'user_exists': ('b', np.int8),
+    'crawled_at': ('d', np.float64),
+    'playtime_minutes': ('i', np.int32),
+    'create_time': ('q', np.int64),
+    'last_login': ('q', np.int64),
+    'last_login_hidden': ('b', np.int8),
+    'recent_activity_time': ('q', np.int64),
+    'race': ('b', np.int8),
+    'gender': ('b', np.int8),
+    'fc': ('i', np.int32),
+    'max_level': ('h', np.int16),
+    'job_count': ('h', np.int16),
+}
+
+# 不定长的职业等级列，按job_count展开存储
+JOB_COLUMNS = {
+    'job_codes': ('h', np.int16),
+    'job_levels': ('h', np.int16),
+}
+
+
+def parse_playtime_minutes(text):
+    """"X天Y小时Z分钟" 转为分钟数"""
+    if not text:
+        return MISSING
+    # 模式的各部分都是可选的，会在前缀处匹配到空串，取第一个非空匹配
+    match = next((match for match in PLAYTIME_PATTERN.finditer(text) if any(match.groups())), None)
+    if match is None:
+        return MISSING
+    days, hours, minutes = (int(value) if value else 0 for value in match.groups())
+    return (days * 24 + hours) * 60 + minutes
+
+
+def parse_date_epoch(text):
+    """日期文本转为epoch秒，无法解析（包括*已屏蔽*）时返回-1"""
+    if not text:
+        return MISSING
+    match = DATE_PATTERN.search(text)
+    if not match:
+        return MISSING
+    year, month, day, hour, minute, second = (int(value) if value else 0 for value in match.groups())
+    try:
+        return int(datetime(year, month, day, hour, minute, second).timestamp())
+    except ValueError:
+        return MISSING
+
+
+def parse_race_gender(text):
+    """种族性别文本转为 (种族编码, 性别编码)"""
+    if not text:
+        return 0, 0
+    race = 0
+    for code, pattern in enumerate(RACE_PATTERNS, 1):
+        if pattern in text:
+            race = code
+            break
+    if '男' in text or '♂' in text:
+        gender = 1
+    elif '女' in text or '♀' in text:
+        gender = 2
+    else:
+        gender = 0
+    return race, gender
+
+
+def parse_job_levels(level_info):
+    """level_info中的等级行转为 [(职业名, 等级), ...]，没有职业名时记为冒险者"""
+    jobs = []
+    for line in level_info or []:
+        for match in JOB_LEVEL_PATTERN.finditer(str(line)):
+            jobs.append((match.group(1) or '冒险者', int(match.group(2))))
+    return jobs
+
+
+class ColumnBuilder:
+    """逐行追加规范化后的数值，内部使用array.array，避免为每行保留字典"""
+
+    def __init__(self):
+        self.columns = {name: array(code) for name, (code, _) in COLUMNS.items()}
+        self.job_columns = {name: array(code) for name, (code, _) in JOB_COLUMNS.items()}
+        # 字典编码：字符串 -> 编码
+        self.fc_names = {}
+        self.job_names = {}
+
+    def dictionary_code(self, dictionary, value):
+        """获取字符串的字典编码，第一次出现时分配新编码"""
+        if value not in dictionary:
+            dictionary[value] = len(dictionary)
+        return dictionary[value]
+
+    def add(self, player_info):
+        """追加一条player_info"""
+        player_data = player_info.get('player_data', {})
+
+        uid = player_data.get('uid')
+        if uid is None or not str(uid).isdigit():
+            url_match = re.search(r'uuid=(\d+)', player_info.get('url', ''))
+            if not url_match:
+                return False
+            uid = url_match.group(1)
+
+        exists = bool(player_data.get('user_exists', True))
+        crawled_at = parse_timestamp(player_info.get('timestamp'))
+        race, gender = parse_race_gender(player_data.get('race_gender'))
+        last_login = player_data.get('last_login')
+        fc_name = player_data.get('fc_name')
+        jobs = parse_job_levels(player_data.get('level_info'))
+
+        columns = self.columns
+        columns['uid'].append(int(uid))
+        columns['user_exists'].append(1 if exists else 0)
+        columns['crawled_at'].append(crawled_at if crawled_at is not None else float('nan'))
+        columns['playtime_minutes'].append(parse_playtime_minutes(player_data.get('total_playtime')))
+        columns['create_time'].append(parse_date_epoch(player_data.get('create_time')))
+        columns['last_login'].append(parse_date_epoch(last_login))
+        columns['last_login_hidden'].append(1 if last_login and '屏蔽' in last_login else 0)
+        columns['recent_activity_time'].append(parse_date_epoch(player_data.get('recent_activity_time')))
+        columns['race'].append(race)
+        columns['gender'].append(gender)
+        columns['fc'].append(self.dictionary_code(self.fc_names, fc_name) if fc_name else MISSING)
+        columns['max_level'].append(max((level for _, level in jobs), default=MISSING))
+        columns['job_count'].append(len(jobs))
+
+        for job_name, level in jobs:
+            self.job_columns['job_codes'].append(self.dictionary_code(self.job_names, job_name))
+            self.job_columns['job_levels'].append(level)
+        return True
+
+    def to_arrays(self):
+        """转换为NumPy数组，同一UID出现多次时只保留最新爬取的一条"""
+        arrays = {name: np.frombuffer(self.columns[name], dtype=dtype).copy()
+                  for name, (_, dtype) in COLUMNS.items()}
+        job_arrays = {name: np.frombuffer(self.job_columns[name], dtype=dtype).copy()
+                      for name, (_, dtype) in JOB_COLUMNS.items()}
+
+        # 按uid升序、爬取时间降序排序后取每个uid的第一条
+        crawled_at = np.nan_to_num(arrays['crawled_at'], nan=-np.inf)
+        order = np.lexsort((-crawled_at, arrays['uid']))
+        sorted_uid = arrays['uid'][order]
+        keep = order[np.concatenate(([True], sorted_uid[1:] != sorted_uid[:-1]))] if len(order) else order
+
+        # 职业等级按行展开，需要随行一起筛选：保留行在原数组中的区间 [start, start + count)
+        row_counts = arrays['job_count'].astype(np.int64)
+        starts = (np.cumsum(row_counts) - row_counts)[keep]
+        counts = row_counts[keep]
+        kept_starts = np.cumsum(counts) - counts
+        job_index = np.repeat(starts - kept_starts, counts) + np.arange(counts.sum())
+
+        arrays = {name: values[keep] for name, values in arrays.items()}
+        arrays.update({name: values[job_index] for name, values in job_arrays.items()})
+        return arrays
+
+    def metadata(self):
+        """枚举和字典编码信息"""
+        return {
+            'races': list(RACES),
+            'genders': list(GENDERS),
+            'fc_names': list(self.fc_names),
+            'job_names': list(self.job_names),
+            'missing': MISSING,
+            'exported_at': datetime.now().isoformat(),
+        }
+
+
+def write_npy(output_path, arrays, metadata):
+    """写出.npy目录：每列一个文件，读取时可内存映射"""
+    os.makedirs(output_path, exist_ok=True)
+    for name, values in arrays.items():
+        np.save(os.path.join(output_path, f"{name}.npy"), values)
+    with open(os.path.join(output_path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+
+
+def write_parquet(output_path, arrays, metadata):
+    """写出Parquet文件，职业等级存为列表列"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    offsets = np.concatenate(([0], np.cumsum(arrays['job_count'], dtype=np.int32)))
+    table = pa.table({name: arrays[name] for name in COLUMNS})
+    for name in JOB_COLUMNS:
+        table = table.append_column(name, pa.ListArray.from_arrays(pa.array(offsets), pa.array(arrays[name])))
+    table = table.replace_schema_metadata({'ff14_export': json.dumps(metadata, ensure_ascii=False)})
+    pq.write_table(table, output_path)
+
+
+def has_pyarrow():
+    """是否安装了pyarrow"""
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def export_results(paths, output_path=None, fmt='auto'):
+    """把结果文件导出为列式存储
+
+    Args:
+        paths (list): 结果文件路径列表
+        output_path (str): 输出路径，默认 output/export_时间戳(.parquet)
+        fmt (str): parquet、npy 或 auto（有pyarrow时使用parquet）
+
+    Returns:
+        str: 实际写出的路径
+    """
+    if fmt == 'auto':
+        fmt = 'parquet' if has_pyarrow() else 'npy'
+
+    builder = ColumnBuilder()
+    skipped = 0
+    for path in paths:
+        for player_info in iter_player_infos(path):
+            if not builder.add(player_info):
+                skipped += 1
+
+    arrays = builder.to_arrays()
+    metadata = builder.metadata()
+
+    if output_path is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_path = f"output/export_{timestamp}" + ('.parquet' if fmt == 'parquet' else '')
+
+    if fmt == 'parquet':
+        write_parquet(output_path, arrays, metadata)
+    else:
+        write_npy(output_path, arrays, metadata)
+
+    print(f"✓ 已导出 {len(arrays['uid'])} 个UID到: {output_path}")
+    if skipped:
+        print(f"✗ 跳过 {skipped} 条无法确定UID的记录")
+    return output_path
+
+
+def load_columns(path, mmap=True):
+    """读取导出的列式数据
+
+    Returns:
+        tuple: (列名 -> NumPy数组, 元数据)
+    """
+    if os.path.isdir(path):
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        arrays = {}
+        for name in list(COLUMNS) + list(JOB_COLUMNS):
+            arrays[name] = np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r' if mmap else None)
+        return arrays, metadata
+
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path)
+    metadata = json.loads(table.schema.metadata[b'ff14_export'])
+    arrays = {name: table.column(name).to_numpy() for name in COLUMNS}
+    for name in JOB_COLUMNS:
+        arrays[name] = table.column(name).combine_chunks().flatten().to_numpy()
+    return arrays, metadata
+
+
+def main():
+    """主函数：python exporter.py [结果文件...]，默认导出output/中的全部结果"""
+    paths = sys.argv[1:] or sorted(
+        glob.glob('output/spider_results_*.json') + glob.glob('output/batch_results_*.json')
+    )
+    if not paths:
+        print("没有找到需要导出的结果文件")
+        return
+    export_results(paths)
+
+
+if __name__ == "__main__":
+    main()
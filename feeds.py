@@ -0,0 +1,449 @@
+"""
+个人动态采集模块
+个人信息页的"TA的帖子"、"TA的动态"两个分页列表通过接口逐页读取：
+- 在已打开的站点页面中用fetch并发请求多页（带上站点cookie），不渲染页面
+- 每个UID、每个栏目记录最近一次见到的最新条目（游标），再次爬取时遇到游标即停止翻页，
+  只取新增的条目；首次爬取按配置的页数上限翻页
+- 新条目超过页数上限时记录缺口（已采集到的最早条目和原来的游标），之后每次爬取从缺口处继续补采，
+  直到与原来的游标衔接，不会因为游标推进而丢失中间的条目
+- 新条目逐条追加到结果文件（serializers模块的流式写出），不在内存中累积
+"""
+
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime
+
+from network_capture import NetworkCapture
+
+# 在页面上下文中并发请求多个URL，返回 [[HTTP状态, 响应文本], ...]，请求失败时状态为0
+FEED_SCRIPT = """
+var urls = arguments[0], timeout = arguments[1], done = arguments[arguments.length - 1];
+function fetchOne(url) {
+    var controller = window.AbortController ? new AbortController() : null;
+    var timer = setTimeout(function () { if (controller) { controller.abort(); } }, timeout);
+    return fetch(url, {credentials: 'include', signal: controller ? controller.signal : undefined})
+        .then(function (response) {
+            return response.text().then(function (text) {
+                clearTimeout(timer);
+                return [response.status, text];
+            });
+        })
+        .catch(function (error) {
+            clearTimeout(timer);
+            return [0, String(error)];
+        });
+}
+Promise.all(urls.map(fetchOne)).then(done);
+"""
+
+# 脚本超时比单个请求的超时多留的秒数，超时的请求由页面中的计时器中止并返回 [0, ...]
+SCRIPT_TIMEOUT_MARGIN = 5
+
+
+def fetch_all(driver, urls, timeout):
+    """在已打开站点页面的浏览器中并发请求多个接口URL
+
+    Args:
+        driver: WebDriver
+        urls (list): 接口URL
+        timeout (float): 单个请求的超时秒数
+
+    Returns:
+        list: 每个URL的 [HTTP状态, 响应文本]
+    """
+    # 请求超时不小于驱动的脚本超时（timeouts.script）时，慢请求会让整个脚本超时、整批页面失败，
+    # 调用期间把脚本超时放宽到请求超时之后，结束后恢复
+    script_timeout = driver.timeouts.script
+    driver.set_script_timeout(max(script_timeout, timeout + SCRIPT_TIMEOUT_MARGIN))
+    try:
+        return driver.execute_async_script(FEED_SCRIPT, urls, int(timeout * 1000))
+    finally:
+        driver.set_script_timeout(script_timeout)
+
+
+def response_list(status, text, path):
+    """从接口响应中按点分路径取出列表，请求失败或响应不可信时返回None"""
+    if status != 200:
+        return None
+    try:
+        body = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(body, dict):
+        return None
+    items = NetworkCapture.lookup(body, path)
+    return items if isinstance(items, list) else None
+
+
+class CursorStore:
+    """基于SQLite的增量游标：每个UID、每个栏目最近见到的最新条目"""
+
+    def __init__(self, db_file='output/feed_cursors.db'):
+        """初始化游标存储（第一次使用时才打开数据库）
+
+        Args:
+            db_file (str): 数据库文件路径
+        """
+        self.db_file = db_file
+        self.conn = None
+
+    def connect(self):
+        if self.conn is None:
+            # 批量爬取的多个worker线程共用一个连接，调用方持有锁
+            self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS feed_cursors (
+                    uid INTEGER NOT NULL,
+                    section TEXT NOT NULL,
+                    item_id TEXT,
+                    item_time TEXT,
+                    item_count INTEGER NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (uid, section)
+                );
+                CREATE TABLE IF NOT EXISTS feed_gaps (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    uid INTEGER NOT NULL,
+                    section TEXT NOT NULL,
+                    target_id TEXT,
+                    target_time TEXT,
+                    from_id TEXT,
+                    from_time TEXT,
+                    page INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_feed_gaps_uid ON feed_gaps (uid, section);
+            """)
+        return self.conn
+
+    def get(self, uid, section):
+        """读取游标，没有爬取过时返回None
+
+        Returns:
+            dict: {'id': 最新条目ID, 'time': 最新条目时间, 'count': 累计条目数}
+        """
+        row = self.connect().execute(
+            "SELECT item_id, item_time, item_count FROM feed_cursors WHERE uid = ? AND section = ?",
+            (uid, section)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'id': row[0], 'time': row[1], 'count': row[2]}
+
+    def set(self, uid, section, item_id, item_time, new_count):
+        """把游标推进到最新条目"""
+        self.connect().execute(
+            "INSERT INTO feed_cursors (uid, section, item_id, item_time, item_count, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (uid, section) DO UPDATE SET item_id = excluded.item_id, "
+            "item_time = excluded.item_time, item_count = item_count + excluded.item_count, "
+            "updated_at = excluded.updated_at",
+            (uid, section, item_id, item_time, new_count, time.time())
+        )
+
+    def add_count(self, uid, section, new_count):
+        """只补采了更早的条目，游标不变，只累加条目数"""
+        self.connect().execute(
+            "UPDATE feed_cursors SET item_count = item_count + ?, updated_at = ? WHERE uid = ? AND section = ?",
+            (new_count, time.time(), uid, section)
+        )
+
+    def gaps(self, uid, section):
+        """读取未补采完的缺口
+
+        Returns:
+            list: [{'id', 'target': 缺口末端（原来的游标）, 'from': 已采集到的最早条目, 'page': 上次翻到的页码}]
+        """
+        rows = self.connect().execute(
+            "SELECT id, target_id, target_time, from_id, from_time, page FROM feed_gaps "
+            "WHERE uid = ? AND section = ? ORDER BY id",
+            (uid, section)
+        ).fetchall()
+        return [
+            {'id': row[0], 'target': {'id': row[1], 'time': row[2]}, 'from': {'id': row[3], 'time': row[4]}, 'page': row[5]}
+            for row in rows
+        ]
+
+    def add_gap(self, uid, section, target, from_key, page):
+        """记录缺口：from_key之前、target之后的条目还没有采集"""
+        self.connect().execute(
+            "INSERT INTO feed_gaps (uid, section, target_id, target_time, from_id, from_time, page, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (uid, section, target['id'], target['time'], *from_key, page, time.time())
+        )
+
+    def update_gap(self, gap_id, from_key, page):
+        """缺口补采了一部分"""
+        self.connect().execute(
+            "UPDATE feed_gaps SET from_id = ?, from_time = ?, page = ?, updated_at = ? WHERE id = ?",
+            (*from_key, page, time.time(), gap_id)
+        )
+
+    def delete_gap(self, gap_id):
+        """缺口已补采完"""
+        self.connect().execute("DELETE FROM feed_gaps WHERE id = ?", (gap_id,))
+
+    def commit(self):
+        if self.conn is not None:
+            self.conn.commit()
+
+    def close(self):
+        """提交并关闭数据库"""
+        if self.conn is not None:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
+
+
+class FeedCrawler:
+    """按游标增量采集分页动态"""
+
+    def __init__(self, feeds_config):
+        """初始化动态采集
+
+        Args:
+            feeds_config (dict): 配置文件中的feeds配置段
+        """
+        self.sections = {
+            name: section for name, section in feeds_config.get('sections', {}).items()
+            if section.get('api_url')
+        }
+        # 同时在途的页数
+        self.concurrency = max(1, feeds_config.get('concurrency', 4))
+        # 每个栏目最多翻的页数（首次爬取时限制历史深度）
+        self.max_pages = feeds_config.get('max_pages', 20)
+        self.timeout = feeds_config.get('timeout', 10)
+        self.cursors = CursorStore(feeds_config.get('cursor_file', 'output/feed_cursors.db'))
+        self.output_file = feeds_config.get('output_file')
+
+        # 批量爬取时多个worker共用一个实例，游标和写出流由lock保护
+        self.lock = threading.Lock()
+        self.sink = None
+        self.uids = 0
+        self.pages = 0
+        self.items = {name: 0 for name in self.sections}
+        self.failed = 0
+
+    def fetch_pages(self, driver, uid, section, pages, site_url=None):
+        """并发请求多页
+
+        Returns:
+            list: 每页的条目列表，请求失败或响应不可信的页为None
+        """
+        urls = []
+        for page in pages:
+            url = section['api_url'].format(uid=uid, page=page, limit=section.get('limit', 10))
+            urls.append(site_url(url) if site_url else url)
+        items_path = section.get('items_path', 'data.rows')
+        return [response_list(status, text, items_path) for status, text in fetch_all(driver, urls, self.timeout)]
+
+    @staticmethod
+    def item_key(item, section):
+        """条目的 (ID, 时间)，都转为字符串"""
+        item_id = NetworkCapture.lookup(item, section.get('id_field', 'id')) if isinstance(item, dict) else None
+        item_time = NetworkCapture.lookup(item, section['time_field']) if isinstance(item, dict) and section.get('time_field') else None
+        return (None if item_id is None else str(item_id), None if item_time is None else str(item_time))
+
+    def newest_key(self, items, section):
+        """最新条目的 (ID, 时间)：有时间字段时取时间最晚的（置顶的旧条目可能排在第一条），否则取第一条"""
+        keys = [self.item_key(item, section) for item in items]
+        if section.get('time_field') and any(item_time for _, item_time in keys):
+            return max(keys, key=lambda key: key[1] or '')
+        return keys[0]
+
+    def is_seen(self, item, cursor, section):
+        """条目是否不晚于游标（列表按时间倒序）"""
+        if cursor is None:
+            return False
+        item_id, item_time = self.item_key(item, section)
+        if item_id is not None and item_id == cursor['id']:
+            return True
+        if item_time is not None and cursor['time'] is not None:
+            return item_time < cursor['time']
+        if item_id is not None and item_id.isdigit() and (cursor['id'] or '').isdigit():
+            return int(item_id) <= int(cursor['id'])
+        return False
+
+    def is_older(self, item, key, section):
+        """条目是否早于已采集到的最早条目（不含该条目本身）"""
+        return self.is_seen(item, key, section) and self.item_key(item, section)[0] != key['id']
+
+    def scan_pages(self, driver, uid, section, first_page, stop_cursor, keep, site_url=None):
+        """从first_page开始翻页，最多max_pages页
+
+        先只请求一页，需要继续翻页时每次并发请求concurrency页。
+        一页的最后一条已经不晚于stop_cursor（或这一页不满）时停止翻页。
+
+        Returns:
+            tuple: (keep保留的条目，按时间倒序；请求的页数；最后一页的页码；是否翻到了stop_cursor或列表末尾)。
+                任何一页失败时条目为None
+        """
+        limit = section.get('limit', 10)
+        kept = []
+        requested = 0
+        page = first_page
+        last_page = first_page - 1
+        while requested < self.max_pages:
+            window = 1 if requested == 0 else self.concurrency
+            pages = list(range(page, page + min(window, self.max_pages - requested)))
+            results = self.fetch_pages(driver, uid, section, pages, site_url)
+            requested += len(pages)
+
+            for number, items in zip(pages, results):
+                if items is None:
+                    return None, requested, last_page, False
+                last_page = number
+                kept.extend(item for item in items if keep(item))
+                if len(items) < limit or (items and self.is_seen(items[-1], stop_cursor, section)):
+                    # 之后的页（并发多请求的部分）都是更早的条目，丢弃
+                    return kept, requested, last_page, True
+            page = pages[-1] + 1
+        return kept, requested, last_page, False
+
+    def crawl_section(self, driver, uid, name, section, site_url=None):
+        """增量采集一个栏目，并继续补采以前留下的缺口
+
+        增量爬取时大多数情况下第1页就能遇到游标，首次爬取时多数用户的条目不满一页。
+        置顶条目不在时间顺序中，按条过滤。
+        新条目超过max_pages页时，已采集到的最早条目和原来的游标之间是缺口：
+        游标照常推进到最新条目，缺口单独记录，之后每次爬取从缺口处（页码按新增条目数顺延）继续翻页补采。
+
+        Returns:
+            dict: {'items': 新条目，'backfilled': 补采的条目（都按时间倒序），'pages': 请求的页数，
+                'gap': 新的缺口或None，'gap_updates': [(缺口, 补采后的状态或None表示补采完)]}。
+                任何一页失败时items为None（游标和缺口都不变）
+        """
+        with self.lock:
+            cursor = self.cursors.get(uid, name)
+            gaps = self.cursors.gaps(uid, name)
+        title = section.get('title', name)
+        limit = section.get('limit', 10)
+
+        new_items, requested, last_page, reached = self.scan_pages(
+            driver, uid, section, 1, cursor, lambda item: not self.is_seen(item, cursor, section), site_url
+        )
+        if new_items is None:
+            return {'items': None, 'pages': requested}
+        outcome = {'items': new_items, 'backfilled': [], 'pages': requested, 'gap': None, 'gap_updates': []}
+        if cursor is not None and not reached and new_items:
+            outcome['gap'] = {'target': cursor, 'from': self.item_key(new_items[-1], section), 'page': last_page}
+            print(f"  {title}: 新条目超过 {self.max_pages} 页，更早的新条目下次继续补采")
+
+        for gap in gaps:
+            # 新增的条目把缺口向后推，从顺延后的页码开始（提前一页，已采集的条目按from过滤）
+            first_page = max(1, gap['page'] + len(new_items) // limit)
+            start_key = gap['from']
+            backfilled, pages, last_page, reached = self.scan_pages(
+                driver, uid, section, first_page, gap['target'],
+                lambda item: self.is_older(item, start_key, section) and not self.is_seen(item, gap['target'], section),
+                site_url
+            )
+            outcome['pages'] += pages
+            if backfilled is None:
+                outcome['items'] = None
+                return outcome
+            outcome['backfilled'].extend(backfilled)
+            if reached:
+                outcome['gap_updates'].append((gap, None))
+                print(f"  {title}: 缺口补采完成，补采 {len(backfilled)} 条")
+            else:
+                from_key = self.item_key(backfilled[-1], section) if backfilled else (start_key['id'], start_key['time'])
+                outcome['gap_updates'].append((gap, (from_key, last_page)))
+        return outcome
+
+    def crawl(self, driver, uid, serializer, site_url=None):
+        """采集一个UID的全部栏目，新条目写入结果文件并推进游标
+
+        Args:
+            driver: 已打开站点页面的WebDriver
+            uid (int): UID
+            serializer: 结果文件格式（serializers模块）
+            site_url (callable): 回放模式下把站点URL转换为本地URL
+
+        Returns:
+            dict: {'pages': 请求的页数, 'items': {栏目: 新条目数}, 'failed': 失败的栏目数}
+        """
+        summary = {'pages': 0, 'items': {}, 'failed': 0}
+        fetched_at = datetime.now().isoformat()
+        for name, section in self.sections.items():
+            try:
+                outcome = self.crawl_section(driver, uid, name, section, site_url)
+            except Exception as e:
+                print(f"✗ {section.get('title', name)} 采集失败: {e}")
+                outcome = None
+            requested = outcome['pages'] if outcome else 0
+            summary['pages'] += requested
+
+            with self.lock:
+                self.pages += requested
+                if outcome is None or outcome['items'] is None:
+                    self.failed += 1
+                    summary['failed'] += 1
+                    continue
+                new_items = outcome['items']
+                written = outcome['backfilled'] + new_items
+                summary['items'][name] = len(written)
+                if written:
+                    self.items[name] += len(written)
+                    sink = self.open_sink(serializer)
+                    # 按时间正序写出（补采的更早条目在前），文件中的条目与发布顺序一致
+                    for item in reversed(outcome['backfilled']):
+                        sink.write({'uid': str(uid), 'section': name, 'fetched_at': fetched_at, 'item': item})
+                    for item in reversed(new_items):
+                        sink.write({'uid': str(uid), 'section': name, 'fetched_at': fetched_at, 'item': item})
+                if new_items:
+                    self.cursors.set(uid, name, *self.newest_key(new_items, section), len(written))
+                elif written:
+                    self.cursors.add_count(uid, name, len(written))
+                for gap, state in outcome['gap_updates']:
+                    if state is None:
+                        self.cursors.delete_gap(gap['id'])
+                    else:
+                        self.cursors.update_gap(gap['id'], *state)
+                if outcome['gap']:
+                    gap = outcome['gap']
+                    self.cursors.add_gap(uid, name, gap['target'], gap['from'], gap['page'])
+
+        with self.lock:
+            self.uids += 1
+            self.cursors.commit()
+        return summary
+
+    def open_sink(self, serializer):
+        """第一次有新条目时打开写出流（调用方持有lock）"""
+        if self.sink is None:
+            if not self.output_file:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                self.output_file = f"output/feed_items_{timestamp}{serializer.stream_extension}"
+            self.sink = serializer.open_stream(self.output_file)
+        return self.sink
+
+    def summary(self):
+        """采集统计"""
+        return {
+            'uids': self.uids,
+            'pages': self.pages,
+            'items': dict(self.items),
+            'failed': self.failed,
+            'output_file': self.output_file
+        }
+
+    def close(self):
+        """关闭写出流和游标数据库"""
+        with self.lock:
+            if self.sink is not None:
+                self.sink.close()
+                print(f"✓ 动态已保存到: {self.output_file}")
+                self.sink = None
+            self.cursors.close()
+
+
+def feeds_from_config(config):
+    """按配置创建动态采集，未启用或没有配置接口的栏目时返回None"""
+    feeds_config = config.get('feeds', {})
+    if not feeds_config.get('enabled'):
+        return None
+    crawler = FeedCrawler(feeds_config)
+    return crawler if crawler.sections else None
@@ -8,13 +8,53 @@ import json
 import re
 import os
 import pickle
+import itertools
 from datetime import datetime
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.edge.options import Options
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from network_capture import NetworkCapture
+from deadlines import Deadline, DeadlineExceeded, apply_page_load_strategy, apply_timeouts, stop_loading
+from profile_parser import body_text_to_lines, parse_fc, parse_profile_lines, saved_url_comment
+from selector_engine import engine_from_config
+from probe import probe_from_config
+from sources import Deduplicator, to_urls, to_uids, uid_from_url
+from feeds import feeds_from_config
+from serializers import serializer_from_config
+from parse_cache import parse_cache_from_config
+
+# Selenium只在真正启动浏览器时导入，离线任务（重新解析、导出、统计）不承担其导入开销
+
+# 在已加载的SPA内切换路由：优先调用前端路由，取不到路由实例时改写location.hash
+SPA_NAVIGATE_SCRIPT = """
+var route = arguments[0];
+try { performance.clearResourceTimings(); } catch (e) {}
+var app = document.querySelector('#app');
+var router = null;
+if (app && app.__vue_app__) {
+    router = app.__vue_app__.config.globalProperties.$router;
+} else if (app && app.__vue__) {
+    router = app.__vue__.$router;
+}
+if (router) {
+    router.push(route.replace(/^#/, '')).catch(function () {});
+    return 'router';
+}
+window.location.hash = route;
+return 'hash';
+"""
+
+# 检查本次路由切换后是否已经请求过该UID相关的资源（用于识别内容相同的不存在用户页面）
+UID_RESOURCE_SCRIPT = """
+var uid = arguments[0];
+return performance.getEntriesByType('resource').some(function (e) {
+    return e.name.indexOf(uid) !== -1 && e.responseEnd > 0;
+});
+"""
+
+# 页面中所有链接的 [href, 文本]（发现模式下从部队链接读取部队ID）
+LINKS_SCRIPT = """
+return Array.prototype.map.call(document.querySelectorAll('a[href]'), function (a) {
+    return [a.getAttribute('href'), a.textContent || ''];
+});
+"""
 
 class FF14RisingStonesSpider:
     """FF14 Rising Stones网站爬虫"""
@@ -30,6 +70,53 @@ class FF14RisingStonesSpider:
         self.results = []
         self.cookies_file = 'cookies.pkl'
         
+        # 导航模式: full 每个UID完整加载页面; hash 加载一次SPA后通过路由切换UID
+        navigation_config = self.config.get('navigation', {})
+        self.navigation_mode = navigation_config.get('mode', 'full')
+        self.render_timeout = navigation_config.get('render_timeout', 10)
+        self.settle_time = navigation_config.get('settle_time', 0.5)
+        # 多标签模式: 在同一个浏览器中同时打开多个标签页，页面加载等待相互重叠
+        self.tabs = navigation_config.get('tabs', 1)
+        self.spa_loaded = False
+        self.cookies_loaded = False
+        
+        # 非交互模式（定时任务）下遇到登录页直接失败，不等待input()
+        self.interactive = True
+        
+        # 截止时间: 每个UID的处理时间上限，超时的UID由调用方重试
+        self.timeouts = self.config.get('timeouts', {})
+        self.deadline = None
+        # 上一次爬取失败的原因: timeout 超时（可重试）、login 登录失败、error 其他错误
+        self.last_failure = None
+        # 上一次爬取各阶段的耗时（navigate 导航和等待渲染，extract 提取和保存）
+        self.last_timings = {}
+        # 发现模式下从部队链接中读取部队ID的正则（Frontier.fc_id_pattern），None时不读取
+        self.fc_id_pattern = None
+        
+        # 接口捕获模式: 通过CDP网络事件直接解析个人信息接口返回的JSON
+        capture_config = self.config.get('capture', {})
+        self.capture = NetworkCapture(capture_config) if capture_config.get('enabled') else None
+        
+        # 流量录制/回放: record 把真实爬取的全部HTTP交互写入cassette; replay 改为访问本地回放服务器
+        self.cassette_config = self.config.get('cassette', {})
+        self.recorder = None
+        self.replay = None
+        
+        # 选择器引擎: 按config.json的selectors提取页面字段，记住命中的选择器并统计命中率
+        self.selector_engine = engine_from_config(self.config)
+        
+        # 存在性预检: 在已打开的站点页面中直接请求个人信息接口，不存在的UID跳过完整渲染
+        self.probe = probe_from_config(self.config)
+        
+        # 结果文件格式: json 格式化JSON（默认）; binary 紧凑的长度前缀二进制格式，可选块压缩
+        self.serializer = serializer_from_config(self.config)
+        
+        # 动态采集: 存在的用户按游标增量采集"TA的帖子"、"TA的动态"分页列表
+        self.feeds = feeds_from_config(self.config)
+        
+        # 解析缓存: 页面文本相同（例如不存在的UID的模板页面）时复用上一次的解析结果
+        self.parse_cache = parse_cache_from_config(self.config)
+        
     def load_config(self, config_file):
         """加载配置文件"""
         try:
@@ -42,8 +129,22 @@ class FF14RisingStonesSpider:
     def get_default_config(self):
         """获取默认配置"""
         return {
-            "browser": {"headless": False},
-            "timeouts": {"page_load": 30, "element_wait": 10, "dynamic_content": 15},
+            "browser": {"headless": False, "page_load_strategy": "normal"},
+            "timeouts": {"page_load": 30, "element_wait": 10, "dynamic_content": 15, "script": 10, "per_uid": 60},
+            "navigation": {"mode": "full", "render_timeout": 10, "settle_time": 0.5, "tabs": 1},
+            "capture": {"enabled": False},
+            "cassette": {"mode": "off", "path": "output/site.cassette", "port": 0, "timing": 1.0},
+            "progress": {"status_file": "output/crawl_status.json", "port": 0, "write_interval": 2, "window": 60},
+            "selector_engine": {"enabled": True, "stats_file": "output/selector_stats.json"},
+            "probe": {"enabled": False, "api_url": None, "exists_path": "data", "valid_path": "code",
+                      "valid_values": [10000], "timeout": 5, "verify_interval": 20},
+            "output": {"format": "json", "compression": "zlib", "level": 6, "block_records": 1000},
+            "feeds": {"enabled": False, "concurrency": 4, "max_pages": 20, "timeout": 10,
+                      "cursor_file": "output/feed_cursors.db", "sections": {}},
+            "frontier": {"db_file": "output/frontier.db", "recrawl_after_days": 7, "fc_refresh_days": 3,
+                         "members_api_url": None, "fc_id_pattern": "[?&](?:guild_?id|guildId|fc_?id)=(\\d+)",
+                         "limit": 50, "max_pages": 10, "concurrency": 4},
+            "parse_cache": {"enabled": True, "max_entries": 10000, "cache_file": None},
             "selectors": {
                 "player_name": [".character-name", ".player-name", "h1", "h2"],
                 "server": [".server", ".world", "[class*='server']"],
@@ -55,6 +156,9 @@ class FF14RisingStonesSpider:
     def setup_driver(self):
         """设置浏览器驱动"""
         try:
+            from selenium import webdriver
+            from selenium.webdriver.edge.options import Options
+            
             options = Options()
             
             browser_config = self.config.get('browser', {})
@@ -80,8 +184,40 @@ class FF14RisingStonesSpider:
                 width, height = browser_config['window_size']
                 options.add_argument(f'--window-size={width},{height}')
             
+            # 多标签模式下导航命令不能等待页面加载完成，否则各标签页无法同时加载
+            if self.tabs > 1:
+                apply_page_load_strategy(options, 'none')
+                if self.capture:
+                    # 性能日志不区分标签页，无法把接口响应对应到具体页面
+                    print("多标签模式不支持接口捕获，改用页面文本解析")
+                    self.capture = None
+            else:
+                apply_page_load_strategy(options, browser_config.get('page_load_strategy', 'normal'))
+            
+            cassette_mode = self.cassette_config.get('mode', 'off')
+            if cassette_mode == 'record' and self.capture:
+                # 录制和接口捕获都会取走性能日志，不能同时使用
+                print("录制模式不支持接口捕获，改用页面文本解析")
+                self.capture = None
+            
+            if self.capture or cassette_mode == 'record':
+                NetworkCapture.enable_logging(options)
+            
+            if cassette_mode == 'replay':
+                from cassette import replay_from_config
+                self.replay = replay_from_config(self.cassette_config)
+            
             self.driver = webdriver.Edge(options=options)
             self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+            apply_timeouts(self.driver, self.timeouts)
+            
+            if self.capture:
+                self.capture.start(self.driver)
+            
+            if cassette_mode == 'record':
+                from cassette import TrafficRecorder
+                self.recorder = TrafficRecorder(self.cassette_config.get('path', 'output/site.cassette'))
+                self.recorder.start(self.driver)
             
             return True
             
@@ -107,7 +243,7 @@ class FF14RisingStonesSpider:
                     cookies = pickle.load(f)
                 
                 # 先访问首页以设置域名
-                self.driver.get("https://ff14risingstones.web.sdo.com")
+                self.navigate(self.site_url("https://ff14risingstones.web.sdo.com"))
                 time.sleep(2)
                 
                 # 添加cookies
@@ -125,6 +261,10 @@ class FF14RisingStonesSpider:
     
     def wait_for_login(self):
         """等待用户在当前浏览器中完成登录"""
+        if not self.interactive:
+            print("✗ 需要登录，但当前为非交互模式，请先交互运行一次保存登录态")
+            return False
+        
         print("\n" + "="*50)
         print("检测到需要登录")
         print("请在当前浏览器窗口中完成登录操作")
@@ -148,187 +288,157 @@ class FF14RisingStonesSpider:
         print("✗ 登录超时")
         return False
     
-    def extract_player_info(self):
-        """提取玩家信息"""
+    def site_url(self, url):
+        """回放模式下把站点URL转换为本地回放服务器上的URL"""
+        return self.replay.local_url(url) if self.replay else url
+    
+    def public_url(self, url):
+        """回放模式下把本地URL还原为站点URL，保证结果与真实爬取一致"""
+        return self.replay.public_url(url) if self.replay else url
+    
+    def record_traffic(self):
+        """录制模式下写入当前文档已完成的HTTP交互（必须在离开文档之前调用）"""
+        if self.recorder:
+            self.recorder.poll(self.driver)
+    
+    def wait(self, seconds):
+        """固定等待，存在截止时间时不超过剩余时间"""
+        if self.deadline:
+            self.deadline.sleep(seconds)
+        else:
+            time.sleep(seconds)
+    
+    def navigate(self, url):
+        """完整加载URL，超过页面加载超时时取消加载并抛出DeadlineExceeded"""
+        from selenium.common.exceptions import TimeoutException
+        
+        try:
+            self.driver.get(url)
+        except TimeoutException:
+            stop_loading(self.driver)
+            raise DeadlineExceeded(f"页面加载超过 {self.timeouts.get('page_load', 30)} 秒")
+        if self.deadline:
+            self.deadline.check('页面加载')
+    
+    def begin_deadline(self):
+        """开始处理一个新的UID"""
+        self.last_failure = None
+        self.last_timings = {}
+        self.deadline = Deadline(self.timeouts.get('per_uid', 60))
+    
+    def handle_timeout(self, error):
+        """UID超时：取消页面加载，下一个UID重新完整加载"""
+        print(f"✗ 爬取超时: {error}")
+        stop_loading(self.driver)
+        self.last_failure = 'timeout'
+        self.spa_loaded = False
+    
+    def get_route(self, url):
+        """获取URL中的hash路由部分"""
+        if '#' not in url:
+            return None
+        return '#' + url.split('#', 1)[1]
+    
+    def is_profile_rendered(self, uid, state):
+        """判断路由切换后个人信息页是否已经重新渲染
+        
+        Args:
+            uid (str): 目标UID
+            state (dict): 轮询间共享的状态，记录上一次看到的文本
+        """
+        from selenium.webdriver.common.by import By
+        
+        text = self.driver.find_element(By.TAG_NAME, "body").text
+        
+        if "个人信息" not in text:
+            return False
+        
+        # 页面中已出现目标UID，说明是新内容
+        fresh = re.search(rf'UID:\s*{uid}\b', text) is not None
+        
+        # 不存在的用户页面文本可能与上一个完全相同，需要确认本次确实请求过该UID
+        if not fresh and "盛趣游戏" in text:
+            fresh = bool(self.driver.execute_script(UID_RESOURCE_SCRIPT, uid))
+        
+        if not fresh:
+            return False
+        
+        # 等待文本稳定，避免读取到渲染到一半的内容
+        now = time.time()
+        if state.get('text') != text:
+            state['text'] = text
+            state['since'] = now
+            return False
+        return now - state['since'] >= self.settle_time
+    
+    def navigate_in_spa(self, url):
+        """在已加载的SPA中切换到目标路由，只等待个人信息页重新渲染
+        
+        Returns:
+            bool: 渲染成功返回True，检测到旧内容或超时返回False
+        """
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.common.exceptions import TimeoutException
+        
+        route = self.get_route(url)
+        url_match = re.search(r'uuid=(\d+)', url)
+        if not route or not url_match:
+            return False
+        
+        uid = url_match.group(1)
+        
+        try:
+            method = self.driver.execute_script(SPA_NAVIGATE_SCRIPT, route)
+            print(f"SPA内导航({method}): {route}")
+            
+            state = {}
+            timeout = self.deadline.clip(self.render_timeout) if self.deadline else self.render_timeout
+            WebDriverWait(self.driver, timeout, poll_frequency=0.2).until(
+                lambda d: self.is_profile_rendered(uid, state)
+            )
+            return True
+            
+        except TimeoutException:
+            print("✗ 等待个人信息页渲染超时")
+            return False
+        except Exception as e:
+            print(f"✗ SPA内导航失败: {e}")
+            return False
+    
+    def extract_player_info(self, wait_dynamic=True):
+        """提取玩家信息
+        
+        Args:
+            wait_dynamic (bool): 是否固定等待动态内容加载，SPA内导航已等待渲染完成时可跳过
+        """
         player_info = {
-            'url': self.driver.current_url,
+            'url': self.public_url(self.driver.current_url),
             'title': self.driver.title,
             'timestamp': datetime.now().isoformat(),
             'player_data': {}
         }
         
-        # 等待动态内容加载
-        time.sleep(self.config['timeouts']['dynamic_content'])
+        # 接口捕获模式下直接使用接口JSON，无需等待页面渲染
+        captured_data = self.extract_from_capture(player_info['url']) if self.capture else None
         
-        try:
-            # 获取页面所有文本内容
-            body_text = self.driver.find_element(By.TAG_NAME, "body").text
-            lines = [line.strip() for line in body_text.split('\n') if line.strip()]
-            
-            # 提取玩家ID
-            player_info['player_data']['player_id'] = None
-            player_info['player_data']['user_exists'] = True  # 默认用户存在
-            
-            for i, line in enumerate(lines):
-                if line == "个人信息" and i + 1 < len(lines):
-                    extracted_id = lines[i + 1]
-                    player_info['player_data']['player_id'] = extracted_id
-                    
-                    # 检测用户是否存在
-                    if extracted_id == "盛趣游戏":
-                        player_info['player_data']['user_exists'] = False
-                        player_info['player_data']['error_message'] = "用户不存在"
-                        
-                        # 从URL中提取uid
-                        url_match = re.search(r'uuid=(\d+)', player_info['url'])
-                        if url_match:
-                            player_info['player_data']['uid'] = url_match.group(1)
-                            player_info['player_data']['error_message'] = f"UID {url_match.group(1)} 对应的用户不存在"
-                    
-                    break
-            
-            # 如果用户不存在，跳过其他信息的提取
-            if not player_info['player_data']['user_exists']:
-                print(f"✗ 检测到用户不存在: {player_info['player_data']['error_message']}")
-                # 清空其他字段
-                player_info['player_data']['create_time'] = None
-                player_info['player_data']['last_login'] = None
-                player_info['player_data']['total_playtime'] = None
-                player_info['player_data']['recent_activity'] = None
-                player_info['player_data']['recent_activity_time'] = None
-                player_info['player_data']['race_gender'] = None
-                player_info['player_data']['fc_name'] = None
-                player_info['player_data']['housing_info'] = None
-                player_info['player_data']['level_info'] = None
-            else:
-                # 用户存在时才提取详细信息
-                
-                # 提取UID
-                player_info['player_data']['uid'] = None
-                for line in lines:
-                    if line.startswith("UID:"):
-                        player_info['player_data']['uid'] = line.replace("UID:", "").strip()
-                        break
-            
-                # 提取创角时间
-                player_info['player_data']['create_time'] = None
-                for i, line in enumerate(lines):
-                    if "创角时间" in line:
-                        if "：" in line:
-                            player_info['player_data']['create_time'] = line.split("：")[1].strip()
-                        elif i + 1 < len(lines):
-                            # 查找下一行是否是日期格式
-                            next_line = lines[i + 1]
-                            if re.match(r'\d{4}-\d{2}-\d{2}', next_line):
-                                player_info['player_data']['create_time'] = next_line
-                            # 有时候创角时间可能在前面
-                            elif i > 0 and re.match(r'\d{4}-\d{2}-\d{2}', lines[i - 1]):
-                                player_info['player_data']['create_time'] = lines[i - 1]
-                        break
-                
-                # 提取最近登录时间
-                player_info['player_data']['last_login'] = None
-                for i, line in enumerate(lines):
-                    if "最近登录时间" in line or "最近登陆时间" in line:
-                        if "：" in line:
-                            login_time = line.split("：")[1].strip()
-                            player_info['player_data']['last_login'] = login_time if login_time else "*已屏蔽*"
-                        elif i + 1 < len(lines):
-                            login_time = lines[i + 1].strip()
-                            player_info['player_data']['last_login'] = login_time if login_time else "*已屏蔽*"
-                        break
-                
-                # 提取累计游戏时长
-                player_info['player_data']['total_playtime'] = None
-                for i, line in enumerate(lines):
-                    if "累计游戏时长" in line:
-                        if "：" in line:
-                            player_info['player_data']['total_playtime'] = line.split("：")[1].strip()
-                        else:
-                            # 查找包含时长信息的行
-                            for j in range(max(0, i - 2), min(i + 3, len(lines))):
-                                if "天" in lines[j] and ("小时" in lines[j] or "分钟" in lines[j]):
-                                    player_info['player_data']['total_playtime'] = lines[j]
-                                    break
-                        break
-                
-                # 提取游戏近况
-                player_info['player_data']['recent_activity'] = None
-                player_info['player_data']['recent_activity_time'] = None
-                
-                for i, line in enumerate(lines):
-                    if "游戏近况" in line:
-                        # 查找后续的活动信息
-                        for j in range(i + 1, min(i + 5, len(lines))):
-                            if lines[j] and not lines[j] in ["游戏近况", "TA的帖子", "TA的动态"]:
-                                # 检查是否是时间格式
-                                if re.match(r'\d{4}-\d{2}-\d{2}', lines[j]):
-                                    player_info['player_data']['recent_activity_time'] = lines[j]
-                                else:
-                                    player_info['player_data']['recent_activity'] = lines[j]
-                                
-                                # 如果找到了活动描述，继续查找时间
-                                if player_info['player_data']['recent_activity'] and not player_info['player_data']['recent_activity_time']:
-                                    for k in range(j + 1, min(j + 3, len(lines))):
-                                        if re.match(r'\d{4}-\d{2}-\d{2}', lines[k]):
-                                            player_info['player_data']['recent_activity_time'] = lines[k]
-                                            break
-                                break
-                        break
-                
-                # 如果游戏近况为空，标记为空
-                if not player_info['player_data']['recent_activity']:
-                    player_info['player_data']['recent_activity'] = "无近期活动"
-                
-                # 提取其他角色信息 - 使用更精确的匹配
-                player_info['player_data']['race_gender'] = None
-                player_info['player_data']['fc_name'] = None
-                player_info['player_data']['housing_info'] = None
-                
-                # 查找包含"敖龙族"等种族信息的行
-                for line in lines:
-                    if any(race in line for race in ["敖龙族", "猫魅族", "拉拉菲尔", "鲁加丁", "精灵族", "人族"]):
-                        if "种族性别：" in line:
-                            player_info['player_data']['race_gender'] = line.split("：")[1].strip()
-                        else:
-                            player_info['player_data']['race_gender'] = line.strip()
-                        break
-                
-                # 查找部队信息 - 寻找包含<>的行
-                for line in lines:
-                    if "<" in line and ">" in line and "無我夢中" in line:
-                        if "部队名称：" in line:
-                            player_info['player_data']['fc_name'] = line.split("：")[1].strip()
-                        else:
-                            player_info['player_data']['fc_name'] = line.strip()
-                        break
-                
-                # 查找房屋信息
-                for line in lines:
-                    if "高脚孤丘" in line or "薰衣草苗圃" in line or any(area in line for area in ["M", "S", "L"]):
-                        if "房屋信息：" in line:
-                            player_info['player_data']['housing_info'] = line.split("：")[1].strip()
-                        elif line.strip() and len(line.strip()) < 20:  # 避免过长的文本
-                            player_info['player_data']['housing_info'] = line.strip()
-                        break
-                
-                # 提取等级信息（如果有的话）
-                level_info = []
-                for line in lines:
-                    if "LV" in line and "冒险者" in line:
-                        level_info.append(line)
-                
-                if level_info:
-                    player_info['player_data']['level_info'] = level_info
+        if captured_data is not None:
+            player_info['player_data'] = captured_data
+            player_info['source'] = 'xhr'
+            if not captured_data['user_exists']:
+                print(f"✗ 检测到用户不存在: {captured_data['error_message']}")
+        else:
+            # 等待动态内容加载
+            if wait_dynamic:
+                self.wait(self.timeouts.get('dynamic_content', 15))
             
-        except Exception as e:
-            print(f"提取玩家信息时出错: {e}")
+            self.extract_from_text(player_info)
         
         # 保存页面源码
         try:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             html_path = f"output/page_source_{timestamp}.html"
             with open(html_path, 'w', encoding='utf-8') as f:
+                f.write(saved_url_comment(player_info['url']))
                 f.write(self.driver.page_source)
             player_info['html_file'] = f"page_source_{timestamp}.html"
             print(f"✓ 页面源码已保存: {html_path}")
@@ -337,72 +447,350 @@ class FF14RisingStonesSpider:
         
         return player_info
     
-    def scrape_url(self, url):
-        """爬取单个URL"""
-        print(f"\n正在爬取: {url}")
+    def extract_from_capture(self, url):
+        """从捕获的接口响应中提取玩家信息
+        
+        Returns:
+            dict: player_data；没有捕获到接口响应时返回None
+        """
+        url_match = re.search(r'uuid=(\d+)', url)
+        if not url_match:
+            return None
+        
+        uid = url_match.group(1)
+        responses = self.capture.wait_for_responses(self.driver, uid)
+        player_data = self.capture.build_player_data(responses, uid)
+        
+        if player_data is None:
+            print("未捕获到个人信息接口响应，回退到页面文本解析")
+        return player_data
+    
+    def extract_from_text(self, player_info):
+        """从页面渲染文本中提取玩家信息，结果写入player_info['player_data']"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import TimeoutException
+        
+        try:
+            # 等待body出现（页面加载策略为eager/none时可能还没有body）
+            element_wait = self.timeouts.get('element_wait', 10)
+            if self.deadline:
+                element_wait = self.deadline.clip(element_wait)
+            WebDriverWait(self.driver, element_wait).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+            
+            # 获取页面所有文本内容
+            body_text = self.driver.find_element(By.TAG_NAME, "body").text
+            lines = body_text_to_lines(body_text)
+            
+            if self.parse_cache:
+                player_info['player_data'] = self.parse_cache.parse_lines(lines, player_info['url'])
+            else:
+                player_info['player_data'] = parse_profile_lines(lines, player_info['url'])
+            
+            if not player_info['player_data']['user_exists']:
+                print(f"✗ 检测到用户不存在: {player_info['player_data']['error_message']}")
+            elif self.selector_engine:
+                player_info['player_data']['selector_fields'] = self.extract_selector_fields()
+            
+            if self.fc_id_pattern and player_info['player_data'].get('fc_name'):
+                fc_id = self.extract_fc_id(player_info['player_data'])
+                if fc_id is not None:
+                    player_info['player_data']['fc_id'] = fc_id
+            
+        except TimeoutException:
+            # 没有得出用户是否存在，调用方按超时处理，不能当作存在的用户计数
+            print("✗ 等待页面内容超时")
+            self.last_failure = 'timeout'
+        except Exception as e:
+            print(f"提取玩家信息时出错: {e}")
+            self.last_failure = 'error'
+    
+    def extraction_failed(self, player_info):
+        """提取是否失败（player_data中没有user_exists，无法判断用户是否存在）"""
+        return 'user_exists' not in player_info.get('player_data', {})
+    
+    def extract_fc_id(self, player_data):
+        """从页面中的部队链接读取部队ID
         
+        页面中可能还有其他部队的链接：优先取链接文本包含本人部队简称或名称的，
+        否则只有全部部队链接指向同一个ID时才使用。
+        
+        Returns:
+            str: 部队ID，无法确定时返回None
+        """
         try:
-            # 尝试加载已保存的登录态
+            links = self.driver.execute_script(LINKS_SCRIPT) or []
+        except Exception as e:
+            print(f"✗ 读取部队链接失败: {e}")
+            return None
+        
+        candidates = []
+        for href, text in links:
+            match = self.fc_id_pattern.search(href or '')
+            if match:
+                candidates.append((match.group(1), text.strip()))
+        
+        fc_tag = player_data.get('fc_tag')
+        fc = parse_fc(player_data['fc_name'])
+        names = [name for name in (fc[0] if fc else player_data['fc_name'], fc_tag) if name]
+        for fc_id, text in candidates:
+            if text and any(name in text for name in names):
+                return fc_id
+        ids = {fc_id for fc_id, _ in candidates}
+        return ids.pop() if len(ids) == 1 else None
+    
+    def extract_selector_fields(self):
+        """用选择器引擎提取页面上的字段（玩家名、服务器、等级、职业等）
+        
+        Returns:
+            dict: 字段 -> 文本；提取失败时返回空字典
+        """
+        try:
+            return self.selector_engine.extract_driver(self.driver)
+        except Exception as e:
+            print(f"✗ 选择器提取失败: {e}")
+            return {}
+    
+    def open_profile(self, url):
+        """导航到个人信息页
+        
+        Returns:
+            str: rendered 已在SPA内等待渲染完成；loaded 完整加载，仍需等待动态内容；
+                需要登录但登录失败时返回None
+        """
+        # 离开上一个文档前写入录制的交互
+        self.record_traffic()
+        url = self.site_url(url)
+        
+        # 丢弃上一个UID遗留的网络事件
+        if self.capture:
+            self.capture.reset(self.driver)
+        
+        # hash模式下SPA已加载时，只切换路由，不重新加载整个应用
+        if self.navigation_mode == 'hash' and self.spa_loaded:
+            if self.navigate_in_spa(url):
+                return 'rendered'
+            
+            print("检测到页面内容未更新，回退到完整加载")
+            self.spa_loaded = False
+            # 仅hash不同的URL不会触发重新加载，先离开当前文档
+            self.driver.get("about:blank")
+        
+        # 尝试加载已保存的登录态（hash模式下每个会话只加载一次）
+        if self.navigation_mode != 'hash' or not self.cookies_loaded:
             if self.load_cookies():
                 print("使用已保存的登录态")
+                self.cookies_loaded = True
+        
+        # 直接访问目标URL
+        self.navigate(url)
+        self.wait(3)
+        
+        current_url = self.driver.current_url
+        print(f"当前页面: {current_url}")
+        
+        # 检查是否需要登录
+        if "login" in current_url.lower():
+            if not self.wait_for_login():
+                self.last_failure = 'login'
+                return None
             
-            # 直接访问目标URL
-            self.driver.get(url)
-            time.sleep(3)
+            # 手动登录的时间不计入截止时间
+            if self.deadline:
+                self.deadline = Deadline(self.deadline.budget)
             
+            # 登录成功后重新访问目标URL
+            print(f"重新访问目标页面: {url}")
+            self.navigate(url)
+            self.wait(5)
+            
+            # 再次检查URL
             current_url = self.driver.current_url
-            print(f"当前页面: {current_url}")
+            print(f"登录后访问页面: {current_url}")
             
-            # 检查是否需要登录
-            if "login" in current_url.lower():
-                if not self.wait_for_login():
-                    return None
-                
-                # 登录成功后重新访问目标URL
-                print(f"重新访问目标页面: {url}")
-                self.driver.get(url)
-                time.sleep(5)
-                
-                # 再次检查URL
-                current_url = self.driver.current_url
-                print(f"登录后访问页面: {current_url}")
-                
-                # 如果还是首页，尝试通过导航访问目标页面
-                if current_url != url and "#/me/info" not in current_url:
+            # 如果还是首页，尝试通过导航访问目标页面
+            if current_url != url and "#/me/info" not in current_url:
+                if self.navigation_mode == 'hash':
+                    print("尝试通过SPA路由导航到目标页面...")
+                    self.navigate_in_spa(url)
+                else:
                     print("尝试通过JavaScript导航到目标页面...")
                     self.driver.execute_script(f"window.location.href = '{url}';")
-                    time.sleep(5)
-                    current_url = self.driver.current_url
-                    print(f"JavaScript导航后页面: {current_url}")
+                    self.wait(5)
+                current_url = self.driver.current_url
+                print(f"JavaScript导航后页面: {current_url}")
+        
+        # 完整加载成功后，后续UID可以在SPA内切换
+        if self.navigation_mode == 'hash' and "#/me/info" in self.driver.current_url:
+            self.spa_loaded = True
+        
+        return 'loaded'
+    
+    def probe_uid(self, uid):
+        """预检UID是否存在
+        
+        Returns:
+            bool: 存在返回True，不存在返回False；未启用预检或无法判断时返回None
+        """
+        if not self.probe or not self.driver:
+            return None
+        return self.probe.check(self.driver, uid, self.site_url)
+    
+    def missing_result(self, uid):
+        """预检判定不存在的UID的结果，结构与文本解析得到的不存在用户一致"""
+        from records import PROFILE_URL_TEMPLATE
+        
+        return {
+            'url': PROFILE_URL_TEMPLATE.format(uid=uid),
+            'title': None,
+            'timestamp': datetime.now().isoformat(),
+            'player_data': {
+                'player_id': None,
+                'user_exists': False,
+                'uid': str(uid),
+                'error_message': f"UID {uid} 对应的用户不存在"
+            },
+            'source': 'probe'
+        }
+    
+    def crawl_feeds(self, uid):
+        """增量采集UID的帖子和动态（需要当前页面在站点内）
+        
+        Returns:
+            dict: FeedCrawler.crawl的统计；未启用动态采集时返回None
+        """
+        if not self.feeds or not self.driver:
+            return None
+        summary = self.feeds.crawl(self.driver, uid, self.serializer, self.site_url)
+        if any(summary['items'].values()):
+            counts = '，'.join(f"{self.feeds.sections[name].get('title', name)} {count}"
+                              for name, count in summary['items'].items())
+            print(f"✓ 新动态: {counts}（请求 {summary['pages']} 页）")
+        return summary
+    
+    def collect_feeds(self, result):
+        """存在的用户在爬取个人信息后采集动态"""
+        if not self.feeds or not result or not result.get('player_data', {}).get('user_exists', True):
+            return None
+        uid = uid_from_url(result.get('url', ''))
+        return self.crawl_feeds(uid) if uid is not None else None
+    
+    def scrape_url(self, url):
+        """爬取单个URL"""
+        print(f"\n正在爬取: {url}")
+        self.begin_deadline()
+        
+        try:
+            stage_start = time.time()
+            state = self.open_profile(url)
+            self.last_timings['navigate'] = time.time() - stage_start
+            if state is None:
+                return None
             
             # 提取玩家信息
-            player_info = self.extract_player_info()
+            stage_start = time.time()
+            player_info = self.extract_player_info(wait_dynamic=(state == 'loaded'))
+            self.record_traffic()
+            self.last_timings['extract'] = time.time() - stage_start
+            
+            if self.extraction_failed(player_info):
+                if self.last_failure == 'timeout':
+                    self.handle_timeout("等待页面内容超时")
+                else:
+                    print("✗ 未能提取玩家信息")
+                    self.last_failure = 'error'
+                return None
             
             print("✓ 爬取完成")
             return player_info
             
+        except DeadlineExceeded as e:
+            self.handle_timeout(e)
+            return None
         except Exception as e:
             print(f"✗ 爬取失败: {e}")
+            self.last_failure = 'error'
             return None
+        finally:
+            self.deadline = None
+    
+    def fetch_payload(self, url):
+        """只抓取页面原始内容，不做解析，供流水线的解析阶段处理
+        
+        Returns:
+            dict: 包含url、title、timestamp以及body_text/html或已映射的接口数据player_data；失败返回None
+        """
+        from selenium.webdriver.common.by import By
+        
+        self.begin_deadline()
+        try:
+            state = self.open_profile(url)
+            if state is None:
+                return None
+            
+            payload = {
+                'url': self.public_url(self.driver.current_url),
+                'title': self.driver.title,
+                'timestamp': datetime.now().isoformat()
+            }
+            
+            captured_data = self.extract_from_capture(payload['url']) if self.capture else None
+            if captured_data is not None:
+                payload['player_data'] = captured_data
+                payload['source'] = 'xhr'
+            else:
+                if state == 'loaded':
+                    self.wait(self.timeouts.get('dynamic_content', 15))
+                payload['body_text'] = self.driver.find_element(By.TAG_NAME, "body").text
+                if self.selector_engine:
+                    payload['selector_fields'] = self.extract_selector_fields()
+            
+            payload['html'] = self.driver.page_source
+            self.record_traffic()
+            return payload
+            
+        except DeadlineExceeded as e:
+            self.handle_timeout(e)
+            return None
+        except Exception as e:
+            print(f"✗ 抓取失败: {e}")
+            self.last_failure = 'error'
+            return None
+        finally:
+            self.deadline = None
     
     def run(self, urls=None):
-        """运行爬虫"""
+        """运行爬虫
+        
+        Args:
+            urls (iterable): 要爬取的URL或UID，可以是列表、生成器或sources模块中的流式输入；
+                逐条读取并实时去重，默认使用配置中的target_urls
+        """
         if not self.setup_driver():
             return False
         
         try:
-            target_urls = urls or self.config.get('target_urls', [])
+            deduplicator = Deduplicator()
+            target_urls = to_urls(deduplicator.filter(urls or self.config.get('target_urls', [])))
             
-            if not target_urls:
+            first_url = next(target_urls, None)
+            if first_url is None:
                 print("没有指定要爬取的URL")
                 return False
             
-            print(f"开始爬取 {len(target_urls)} 个URL...")
+            print("开始爬取URL...")
             
-            for url in target_urls:
-                result = self.scrape_url(url)
-                if result:
-                    self.results.append(result)
+            if self.tabs > 1:
+                self.run_tabs(first_url, target_urls)
+            else:
+                for url in itertools.chain([first_url], target_urls):
+                    result = self.scrape_url(url)
+                    if result:
+                        self.results.append(result)
+                        self.collect_feeds(result)
+            
+            print(f"\n输入{deduplicator.summary()}")
             
             # 保存结果
             self.save_results()
@@ -412,6 +800,31 @@ class FF14RisingStonesSpider:
         finally:
             self.close()
     
+    def run_tabs(self, first_url, other_urls):
+        """多标签模式：第一个URL在当前标签页中完成登录和登录态加载，其余URL在多个标签页中并发加载"""
+        from tab_multiplexer import TabMultiplexer
+        
+        result = self.scrape_url(first_url)
+        if result is None:
+            return
+        self.results.append(result)
+        self.collect_feeds(result)
+        
+        multiplexer = TabMultiplexer(self, tabs=self.tabs)
+        results = multiplexer.run(other_urls)
+        
+        # 加载超时的页面重试一次
+        if multiplexer.timed_out:
+            retry_urls = list(multiplexer.timed_out)
+            multiplexer.timed_out.clear()
+            print(f"\n重试 {len(retry_urls)} 个加载超时的页面...")
+            results.extend(multiplexer.run(retry_urls))
+        
+        self.results.extend(results)
+        # 动态接口在任一站点标签页中请求即可，在全部标签页收割完后依次采集
+        for result in results:
+            self.collect_feeds(result)
+    
     def save_results(self):
         """保存爬取结果"""
         if not self.results:
@@ -419,11 +832,10 @@ class FF14RisingStonesSpider:
             return
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"output/spider_results_{timestamp}.json"
+        filename = f"output/spider_results_{timestamp}{self.serializer.extension}"
         
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(self.results, f, ensure_ascii=False, indent=2)
+            self.serializer.dump(filename, self.results)
             
             print(f"\n✓ 结果已保存到: {filename}")
             print(f"✓ 共爬取 {len(self.results)} 条数据")
@@ -453,11 +865,75 @@ class FF14RisingStonesSpider:
         except Exception as e:
             print(f"✗ 保存失败: {e}")
     
+    def run_feeds(self, uids):
+        """只采集动态，不重新爬取个人信息
+        
+        第一个UID完整打开个人信息页（完成登录、加载登录态），之后每个UID只在该页面中请求动态接口。
+        
+        Args:
+            uids (iterable): UID或个人信息页URL，逐条读取并实时去重
+        """
+        if not self.feeds:
+            print("配置中没有可用的动态栏目（feeds.sections 的 api_url）")
+            return False
+        if not self.setup_driver():
+            return False
+        
+        try:
+            deduplicator = Deduplicator()
+            uids = to_uids(deduplicator.filter(uids))
+            first_uid = next(uids, None)
+            if first_uid is None:
+                print("没有指定要采集的UID")
+                return False
+            
+            from records import PROFILE_URL_TEMPLATE
+            self.begin_deadline()
+            try:
+                if self.open_profile(PROFILE_URL_TEMPLATE.format(uid=first_uid)) is None:
+                    return False
+            finally:
+                self.deadline = None
+            
+            for uid in itertools.chain([first_uid], uids):
+                print(f"\n正在采集动态: UID {uid}")
+                self.crawl_feeds(uid)
+            
+            print(f"\n输入{deduplicator.summary()}")
+            return True
+        
+        finally:
+            self.close()
+    
     def close(self):
         """关闭浏览器"""
+        if self.feeds:
+            summary = self.feeds.summary()
+            if summary['uids']:
+                items = '，'.join(f"{self.feeds.sections[name].get('title', name)} {count}"
+                                  for name, count in summary['items'].items())
+                print(f"\n动态采集: {summary['uids']} 个UID，请求 {summary['pages']} 页，新条目 {items}，失败 {summary['failed']}")
+            self.feeds.close()
+        if self.selector_engine:
+            report = self.selector_engine.report()
+            if report:
+                print("\n选择器命中率:")
+                print('\n'.join(report))
+            self.selector_engine.save()
+        if self.parse_cache:
+            report = self.parse_cache.report()
+            if report:
+                print(report)
+            self.parse_cache.save()
+        if self.recorder:
+            self.recorder.close(self.driver)
+            self.recorder = None
         if self.driver:
             print("正在关闭浏览器...")
             self.driver.quit()
+        if self.replay:
+            self.replay.stop()
+            self.replay = None
 
 def main():
     """主函数"""
@@ -0,0 +1,344 @@
+"""
+部队发现模块
+发现模式不再从起始UID盲目递增，而是沿部队成员列表找到有关联的玩家：
+- 每个存在的用户爬取后记录其部队（有接口ID时用ID，否则用"部队名称 <简称>"识别）
+- 尚未展开或展开已过期的部队，在当前站点页面中并发请求成员列表接口，成员UID加入待爬取集合
+- 待爬取集合保存在SQLite中（跨运行持久去重），从未爬取过的UID优先，其次按上次爬取时间由旧到新
+种子UID来自命令行输入（UID文件、以前的爬取结果），发现范围是种子所在部队及其成员不断扩展出的部队
+"""
+
+import re
+import time
+import sqlite3
+import threading
+from collections import deque
+from urllib.parse import quote
+
+from feeds import fetch_all, response_list
+
+DAY = 86400
+
+
+def fc_identity(player_data):
+    """部队标识：(键, 接口ID, 部队名称, 部队简称)，没有部队时返回None"""
+    fc_name = player_data.get('fc_name')
+    fc_id = player_data.get('fc_id')
+    if not fc_name and fc_id is None:
+        return None
+    key = f"id:{fc_id}" if fc_id is not None else f"name:{fc_name}"
+    return key, None if fc_id is None else str(fc_id), fc_name, player_data.get('fc_tag')
+
+
+class Frontier:
+    """持久化的待爬取集合和部队展开记录"""
+
+    def __init__(self, frontier_config):
+        """初始化发现集合
+
+        Args:
+            frontier_config (dict): 配置文件中的frontier配置段
+        """
+        self.db_file = frontier_config.get('db_file', 'output/frontier.db')
+        # 上次爬取超过该天数的UID重新进入待爬取
+        self.recrawl_after = frontier_config.get('recrawl_after_days', 7) * DAY
+        # 上次展开超过该天数的部队重新请求成员列表
+        self.fc_refresh_after = frontier_config.get('fc_refresh_days', 3) * DAY
+        # 派发后未报告结果（爬取失败）的UID在该秒数内不再派发
+        self.lease = frontier_config.get('lease_seconds', 3600)
+        self.members_api_url = frontier_config.get('members_api_url')
+        self.members_path = frontier_config.get('members_path', 'data.rows')
+        self.member_uid_field = frontier_config.get('member_uid_field', 'uuid')
+        self.limit = frontier_config.get('limit', 50)
+        self.max_pages = frontier_config.get('max_pages', 10)
+        self.concurrency = max(1, frontier_config.get('concurrency', 4))
+        self.timeout = frontier_config.get('timeout', 10)
+        self.claim_size = frontier_config.get('claim_size', 100)
+        # 页面文本中只有部队名称，成员列表接口需要部队ID时从页面中的部队链接读取
+        fc_id_pattern = frontier_config.get('fc_id_pattern')
+        self.fc_id_pattern = re.compile(fc_id_pattern) if fc_id_pattern else None
+
+        # 多个worker线程共用一个连接；cond同时用于等待在途UID的结果
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS players (
+                uid INTEGER PRIMARY KEY,
+                discovered_at REAL NOT NULL,
+                source TEXT,
+                last_crawled REAL NOT NULL DEFAULT 0,
+                claimed_at REAL NOT NULL DEFAULT 0,
+                user_exists INTEGER,
+                fc_key TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_players_staleness ON players (last_crawled, discovered_at);
+            CREATE TABLE IF NOT EXISTS fcs (
+                fc_key TEXT PRIMARY KEY,
+                fc_id TEXT,
+                fc_name TEXT,
+                fc_tag TEXT,
+                discovered_at REAL NOT NULL,
+                last_expanded REAL NOT NULL DEFAULT 0,
+                member_count INTEGER
+            );
+            -- 本次运行已派发过的UID，同一次运行中不重复派发（临时表，连接关闭后消失）
+            CREATE TEMP TABLE handed (uid INTEGER PRIMARY KEY);
+        """)
+        self.cond = threading.Condition()
+        self.claimed = deque()
+        self.in_flight = set()
+        self.expanding = set()
+
+        self.discovered = 0
+        self.expanded = 0
+        # 本次运行中没有部队ID、无法展开的部队
+        self.unresolved = set()
+        self.member_pages = 0
+
+    def add_uids(self, uids, source='seed'):
+        """加入UID，已知的UID忽略
+
+        Returns:
+            int: 新加入的UID数
+        """
+        now = time.time()
+        with self.cond:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO players (uid, discovered_at, source) VALUES (?, ?, ?)",
+                ((uid, now, source) for uid in uids)
+            )
+            added = self.conn.total_changes - before
+            self.conn.commit()
+            self.discovered += added
+            if added:
+                self.cond.notify_all()
+        return added
+
+    def claim(self):
+        """按陈旧程度取下一个待爬取的UID，没有时返回None（调用方持有cond）"""
+        if not self.claimed:
+            now = time.time()
+            # 已派发过的UID在SQL中排除，否则本次失败的UID租约到期后会占满最陈旧的一批，后面到期的UID取不到
+            rows = self.conn.execute(
+                "SELECT uid FROM players WHERE last_crawled < ? AND claimed_at < ? "
+                "AND uid NOT IN (SELECT uid FROM handed) "
+                "ORDER BY last_crawled, discovered_at LIMIT ?",
+                (now - self.recrawl_after, now - self.lease, self.claim_size)
+            ).fetchall()
+            if not rows:
+                return None
+            uids = [uid for uid, in rows]
+            self.conn.executemany("UPDATE players SET claimed_at = ? WHERE uid = ?", ((now, uid) for uid in uids))
+            self.conn.executemany("INSERT INTO handed (uid) VALUES (?)", ((uid,) for uid in uids))
+            self.conn.commit()
+            self.claimed.extend(uids)
+        uid = self.claimed.popleft()
+        self.in_flight.add(uid)
+        return uid
+
+    def iter_uids(self):
+        """逐个产出待爬取的UID
+
+        集合暂时为空但还有在途UID时等待其结果（结果中的部队展开后可能加入新的UID），
+        全部在途UID都已报告且集合为空时结束。
+        """
+        while True:
+            with self.cond:
+                uid = self.claim()
+                while uid is None and self.in_flight:
+                    self.cond.wait(timeout=1)
+                    uid = self.claim()
+            if uid is None:
+                return
+            yield uid
+
+    def report(self, uid, result, driver=None, site_url=None):
+        """报告UID的爬取结果，存在的用户所在部队到期时展开成员列表
+
+        Args:
+            uid (int): UID
+            result (dict): player_info，爬取失败时为None（租约到期前不再派发）
+            driver: 执行爬取的WebDriver，用于请求成员列表接口
+            site_url (callable): 回放模式下把站点URL转换为本地URL
+
+        Returns:
+            int: 请求成员列表的页数
+        """
+        fc = None
+        with self.cond:
+            if result is not None:
+                player_data = result.get('player_data', {})
+                exists = player_data.get('user_exists', True)
+                fc = fc_identity(player_data) if exists else None
+                now = time.time()
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO players (uid, discovered_at, source) VALUES (?, ?, 'crawl')", (uid, now)
+                )
+                self.conn.execute(
+                    "UPDATE players SET last_crawled = ?, claimed_at = 0, user_exists = ?, fc_key = ? WHERE uid = ?",
+                    (now, int(bool(exists)), fc[0] if fc else None, uid)
+                )
+                if fc:
+                    self.conn.execute(
+                        "INSERT INTO fcs (fc_key, fc_id, fc_name, fc_tag, discovered_at) VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT (fc_key) DO UPDATE SET fc_name = excluded.fc_name, "
+                        "fc_tag = COALESCE(excluded.fc_tag, fc_tag)",
+                        (*fc, now)
+                    )
+                    if not self.fc_due(fc[0]):
+                        fc = None
+                    else:
+                        self.expanding.add(fc[0])
+                self.conn.commit()
+
+        pages = 0
+        if fc is not None:
+            try:
+                pages = self.expand(fc, driver, site_url)
+            finally:
+                with self.cond:
+                    self.expanding.discard(fc[0])
+
+        with self.cond:
+            self.in_flight.discard(uid)
+            self.cond.notify_all()
+        return pages
+
+    @property
+    def needs_fc_id(self):
+        """成员列表接口是否需要部队ID"""
+        return '{fc_id}' in (self.members_api_url or '')
+
+    def fc_due(self, fc_key):
+        """部队是否需要展开（从未展开或已过期，且没有其他worker正在展开）"""
+        if fc_key in self.expanding:
+            return False
+        row = self.conn.execute("SELECT last_expanded FROM fcs WHERE fc_key = ?", (fc_key,)).fetchone()
+        return row is not None and row[0] < time.time() - self.fc_refresh_after
+
+    def members_url(self, fc, page):
+        """成员列表接口URL，接口需要部队ID而部队只有名称时返回None"""
+        _, fc_id, fc_name, _ = fc
+        if '{fc_id}' in self.members_api_url and fc_id is None:
+            return None
+        return self.members_api_url.format(
+            fc_id=fc_id, fc_name=quote(fc_name or ''), page=page, limit=self.limit
+        )
+
+    def expand(self, fc, driver, site_url=None):
+        """请求部队成员列表，成员UID加入待爬取集合
+
+        先只请求第1页，多数部队的成员不满一页；需要继续翻页时每次并发请求concurrency页。
+
+        Returns:
+            int: 请求的页数
+        """
+        if not self.members_api_url or driver is None:
+            return 0
+        if self.members_url(fc, 1) is None:
+            # 没有展开，不记录展开时间：之后取得部队ID时（同一部队的其他成员）照常展开
+            with self.cond:
+                first = fc[0] not in self.unresolved
+                self.unresolved.add(fc[0])
+            if first:
+                print(f"✗ 部队 {fc[2]} 没有部队ID，无法请求成员列表"
+                      f"（开启capture从接口取得fc_id，或检查frontier.fc_id_pattern能否匹配页面中的部队链接）")
+            return 0
+
+        members = []
+        requested = 0
+        page = 1
+        while page <= self.max_pages:
+            window = 1 if page == 1 else self.concurrency
+            pages = list(range(page, min(page + window, self.max_pages + 1)))
+            urls = [self.members_url(fc, number) for number in pages]
+            if site_url:
+                urls = [site_url(url) for url in urls]
+            try:
+                responses = fetch_all(driver, urls, self.timeout)
+            except Exception as e:
+                print(f"✗ 部队成员列表请求失败: {e}")
+                responses = [(0, '')]
+            requested += len(pages)
+
+            finished = False
+            for status, text in responses:
+                rows = response_list(status, text, self.members_path)
+                if rows is None:
+                    # 失败时不记录展开时间，部队下次遇到时重新展开
+                    print(f"✗ 部队 {fc[2]} 成员列表获取失败")
+                    self.add_members(members, fc[0])
+                    return requested
+                for row in rows:
+                    value = row.get(self.member_uid_field) if isinstance(row, dict) else None
+                    if value is not None and str(value).isdigit():
+                        members.append(int(value))
+                if len(rows) < self.limit:
+                    finished = True
+                    break
+            if finished:
+                break
+            page = pages[-1] + 1
+
+        added = self.add_members(members, fc[0])
+        self.mark_expanded(fc[0], len(members))
+        with self.cond:
+            self.expanded += 1
+            self.member_pages += requested
+        print(f"✓ 展开部队 {fc[2]}: 成员 {len(members)} 人，新发现 {added} 个UID")
+        return requested
+
+    def add_members(self, members, fc_key):
+        return self.add_uids(members, source=f"fc:{fc_key}") if members else 0
+
+    def mark_expanded(self, fc_key, member_count):
+        with self.cond:
+            self.conn.execute(
+                "UPDATE fcs SET last_expanded = ?, member_count = ? WHERE fc_key = ?",
+                (time.time(), member_count, fc_key)
+            )
+            self.conn.commit()
+
+    def stats(self):
+        """集合状态：已知/待爬取的UID数和部队数"""
+        now = time.time()
+        with self.cond:
+            players, crawled, live = self.conn.execute(
+                "SELECT COUNT(*), SUM(last_crawled > 0), SUM(user_exists = 1) FROM players"
+            ).fetchone()
+            due = self.conn.execute(
+                "SELECT COUNT(*) FROM players WHERE last_crawled < ?", (now - self.recrawl_after,)
+            ).fetchone()[0]
+            fcs, expanded = self.conn.execute(
+                "SELECT COUNT(*), SUM(last_expanded > 0) FROM fcs"
+            ).fetchone()
+        return {
+            'players': players,
+            'crawled': crawled or 0,
+            'live': live or 0,
+            'due': due,
+            'fcs': fcs,
+            'fcs_expanded': expanded or 0
+        }
+
+    def summary(self):
+        """本次运行的发现统计"""
+        return dict(
+            self.stats(),
+            discovered=self.discovered,
+            expanded=self.expanded,
+            unresolved=len(self.unresolved),
+            member_pages=self.member_pages
+        )
+
+    def close(self):
+        """释放已领取但未派发的UID，提交并关闭数据库"""
+        with self.cond:
+            self.conn.executemany("UPDATE players SET claimed_at = 0 WHERE uid = ?", ((uid,) for uid in self.claimed))
+            self.claimed.clear()
+            self.conn.commit()
+            self.conn.close()
+
+
+def frontier_from_config(config):
+    """按配置创建发现集合"""
+    return Frontier(config.get('frontier', {}))
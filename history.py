@@ -0,0 +1,260 @@
+"""
+玩家快照历史模块
+每个UID保存第一次的完整快照，之后只保存发生变化的字段（增量），
+增量链达到一定长度时写入新的完整快照（关键帧），可以快速还原任意时间点的状态
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+
+from records import iter_player_infos, parse_timestamp
+
+FULL = 0
+DELTA = 1
+
+# 增量中记录被删除字段的键
+REMOVED_KEY = '__removed__'
+
+
+def diff_player_data(old, new):
+    """计算两个player_data之间的字段级增量，没有变化时返回None"""
+    delta = {key: value for key, value in new.items() if key not in old or old[key] != value}
+    removed = [key for key in old if key not in new]
+    if removed:
+        delta[REMOVED_KEY] = removed
+    return delta or None
+
+
+def apply_delta(state, delta):
+    """把增量应用到状态上（原地修改）"""
+    for key in delta.get(REMOVED_KEY, []):
+        state.pop(key, None)
+    for key, value in delta.items():
+        if key != REMOVED_KEY:
+            state[key] = value
+    return state
+
+
+class HistoryStore:
+    """基于SQLite的增量快照存储"""
+
+    def __init__(self, db_file='output/history.db', keyframe_interval=20):
+        """初始化历史存储
+
+        Args:
+            db_file (str): 数据库文件路径
+            keyframe_interval (int): 连续多少个增量之后写入一个完整快照
+        """
+        self.keyframe_interval = keyframe_interval
+        self.conn = sqlite3.connect(db_file)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                uid INTEGER NOT NULL,
+                crawled_at REAL NOT NULL,
+                kind INTEGER NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_snapshots_uid_time ON snapshots (uid, crawled_at);
+            CREATE TABLE IF NOT EXISTS players (
+                uid INTEGER PRIMARY KEY,
+                last_seen REAL NOT NULL,
+                last_change REAL NOT NULL,
+                chain_length INTEGER NOT NULL,
+                crawl_count INTEGER NOT NULL
+            );
+        """)
+        # 最近写入的状态缓存，避免每次写入都从数据库还原
+        self.latest = {}
+
+    def close(self):
+        """提交并关闭数据库"""
+        self.conn.commit()
+        self.conn.close()
+
+    def state_at(self, uid, at=None):
+        """还原UID在某个时间点的player_data
+
+        Args:
+            uid (int): UID
+            at (float): epoch秒，默认最新状态
+
+        Returns:
+            dict: player_data，该时间点之前没有记录时返回None
+        """
+        at = float('inf') if at is None else at
+        keyframe = self.conn.execute(
+            "SELECT crawled_at, data FROM snapshots WHERE uid = ? AND kind = ? AND crawled_at <= ? "
+            "ORDER BY crawled_at DESC LIMIT 1",
+            (uid, FULL, at)
+        ).fetchone()
+        if keyframe is None:
+            return None
+
+        state = json.loads(keyframe[1])
+        deltas = self.conn.execute(
+            "SELECT data FROM snapshots WHERE uid = ? AND kind = ? AND crawled_at > ? AND crawled_at <= ? "
+            "ORDER BY crawled_at",
+            (uid, DELTA, keyframe[0], at)
+        )
+        for (data,) in deltas:
+            apply_delta(state, json.loads(data))
+        return state
+
+    def add(self, uid, crawled_at, player_data):
+        """写入一次爬取结果，只有字段发生变化时才占用存储
+
+        Returns:
+            str: full、delta 或 unchanged
+        """
+        player = self.conn.execute(
+            "SELECT last_seen, chain_length FROM players WHERE uid = ?", (uid,)
+        ).fetchone()
+
+        if player is None:
+            self.write(uid, crawled_at, FULL, player_data)
+            self.conn.execute(
+                "INSERT INTO players (uid, last_seen, last_change, chain_length, crawl_count) VALUES (?, ?, ?, 0, 1)",
+                (uid, crawled_at, crawled_at)
+            )
+            self.latest[uid] = dict(player_data)
+            return 'full'
+
+        last_seen, chain_length = player
+        if crawled_at <= last_seen:
+            # 旧数据补录：只在时间线末尾追加，早于最新记录的快照忽略
+            return 'unchanged'
+
+        previous = self.latest.get(uid)
+        if previous is None:
+            previous = self.state_at(uid)
+
+        delta = diff_player_data(previous, player_data)
+        if delta is None:
+            self.conn.execute(
+                "UPDATE players SET last_seen = ?, crawl_count = crawl_count + 1 WHERE uid = ?",
+                (crawled_at, uid)
+            )
+            kind = 'unchanged'
+        elif chain_length + 1 >= self.keyframe_interval:
+            self.write(uid, crawled_at, FULL, player_data)
+            self.conn.execute(
+                "UPDATE players SET last_seen = ?, last_change = ?, chain_length = 0, crawl_count = crawl_count + 1 "
+                "WHERE uid = ?",
+                (crawled_at, crawled_at, uid)
+            )
+            kind = 'full'
+        else:
+            self.write(uid, crawled_at, DELTA, delta)
+            self.conn.execute(
+                "UPDATE players SET last_seen = ?, last_change = ?, chain_length = chain_length + 1, "
+                "crawl_count = crawl_count + 1 WHERE uid = ?",
+                (crawled_at, crawled_at, uid)
+            )
+            kind = 'delta'
+
+        self.latest[uid] = dict(player_data)
+        if len(self.latest) > 100000:
+            self.latest.clear()
+        return kind
+
+    def write(self, uid, crawled_at, kind, data):
+        """写入一条快照"""
+        self.conn.execute(
+            "INSERT INTO snapshots (uid, crawled_at, kind, data) VALUES (?, ?, ?, ?)",
+            (uid, crawled_at, kind, json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+        )
+
+    def import_files(self, paths):
+        """导入结果文件，按爬取时间顺序写入"""
+        entries = []
+        for path in paths:
+            for player_info in iter_player_infos(path):
+                player_data = player_info.get('player_data', {})
+                uid = player_data.get('uid')
+                crawled_at = parse_timestamp(player_info.get('timestamp'))
+                if uid is None or not str(uid).isdigit() or crawled_at is None:
+                    continue
+                entries.append((crawled_at, int(uid), player_data))
+
+        entries.sort(key=lambda entry: entry[0])
+        counts = {'full': 0, 'delta': 0, 'unchanged': 0}
+        for crawled_at, uid, player_data in entries:
+            counts[self.add(uid, crawled_at, player_data)] += 1
+        self.conn.commit()
+
+        print(f"✓ 已导入 {len(entries)} 条快照: 完整 {counts['full']}，增量 {counts['delta']}，未变化 {counts['unchanged']}")
+        return counts
+
+    def compact(self, before=None):
+        """压缩历史
+
+        Args:
+            before (float): 指定时把该时间点之前的历史合并为一个完整快照（丢弃中间状态）；
+                不指定时只为过长的增量链补写关键帧
+        """
+        merged = 0
+        if before is not None:
+            uids = [row[0] for row in self.conn.execute(
+                "SELECT DISTINCT uid FROM snapshots WHERE crawled_at < ?", (before,)
+            )]
+            for uid in uids:
+                latest_before = self.conn.execute(
+                    "SELECT MAX(crawled_at) FROM snapshots WHERE uid = ? AND crawled_at < ?", (uid, before)
+                ).fetchone()[0]
+                state = self.state_at(uid, latest_before)
+                deleted = self.conn.execute(
+                    "DELETE FROM snapshots WHERE uid = ? AND crawled_at <= ?", (uid, latest_before)
+                ).rowcount
+                self.write(uid, latest_before, FULL, state)
+                merged += deleted - 1
+
+        # 重新计算每个UID的增量链长度，过长的链在末尾补写关键帧
+        keyframes = 0
+        for (uid,) in self.conn.execute("SELECT uid FROM players").fetchall():
+            rows = self.conn.execute(
+                "SELECT crawled_at, kind FROM snapshots WHERE uid = ? ORDER BY crawled_at", (uid,)
+            ).fetchall()
+            chain_length = 0
+            for crawled_at, kind in rows:
+                chain_length = 0 if kind == FULL else chain_length + 1
+            if chain_length >= self.keyframe_interval:
+                last_time = rows[-1][0]
+                state = self.state_at(uid, last_time)
+                self.conn.execute("DELETE FROM snapshots WHERE uid = ? AND crawled_at = ? AND kind = ?",
+                                  (uid, last_time, DELTA))
+                self.write(uid, last_time, FULL, state)
+                chain_length = 0
+                keyframes += 1
+            self.conn.execute("UPDATE players SET chain_length = ? WHERE uid = ?", (chain_length, uid))
+
+        self.conn.commit()
+        self.conn.execute("VACUUM")
+        self.latest.clear()
+        print(f"✓ 历史压缩完成: 合并 {merged} 条旧快照，补写 {keyframes} 个关键帧")
+        return merged, keyframes
+
+    def stats(self):
+        """存储统计"""
+        players, crawls = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(crawl_count), 0) FROM players"
+        ).fetchone()
+        full, delta = self.conn.execute(
+            "SELECT SUM(kind = 0), SUM(kind = 1) FROM snapshots"
+        ).fetchone()
+        return {
+            'players': players,
+            'crawls': crawls,
+            'full_snapshots': full or 0,
+            'delta_snapshots': delta or 0,
+        }
+
+
+def parse_time_arg(value):
+    """命令行时间参数：ISO时间或epoch秒"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
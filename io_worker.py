@@ -0,0 +1,91 @@
+"""
+后台I/O模块
+把结果保存、临时文件清理等磁盘操作交给后台线程执行，爬取循环只负责提交任务
+"""
+
+import os
+import queue
+import threading
+
+# 队列结束标记
+SENTINEL = None
+
+
+class BackgroundWriter:
+    """有界队列的后台写出线程
+
+    队列写满时submit阻塞，避免积压无限增长；flush等待已提交的任务全部完成，
+    close在flush之后结束线程。中断或异常退出时调用flush即可保证已提交的任务落盘。
+    """
+
+    def __init__(self, max_pending=16):
+        """初始化后台写出线程
+
+        Args:
+            max_pending (int): 最多积压的任务数
+        """
+        self.tasks = queue.Queue(maxsize=max_pending)
+        self.thread = threading.Thread(target=self.worker, daemon=True)
+        self.thread.start()
+
+    def worker(self):
+        """依次执行队列中的任务"""
+        while True:
+            task = self.tasks.get()
+            try:
+                if task is SENTINEL:
+                    return
+                func, args = task
+                func(*args)
+            except Exception as e:
+                print(f"✗ 后台写出任务失败: {e}")
+            finally:
+                self.tasks.task_done()
+
+    def submit(self, func, *args):
+        """提交任务，队列满时阻塞"""
+        if not self.thread.is_alive():
+            # 线程已结束时退化为同步执行
+            func(*args)
+            return
+        self.tasks.put((func, args))
+
+    def write_results(self, serializer, filename, crawl_info, build_infos, message=None):
+        """在后台构造结果并按指定格式写出
+
+        Args:
+            serializer: serializers模块中的序列化器
+            filename (str): 文件路径
+            crawl_info (dict): 汇总信息
+            build_infos (callable): 返回player_info列表，在后台线程中调用
+            message (str): 写出成功后打印的信息
+        """
+        def task():
+            serializer.dump(filename, build_infos(), crawl_info)
+            if message:
+                print(message)
+        self.submit(task)
+
+    def remove_files(self, paths):
+        """在后台删除文件，文件不存在时忽略"""
+        def task():
+            for path in paths:
+                try:
+                    os.remove(path)
+                    print(f"✓ 已删除临时文件: {path}")
+                except FileNotFoundError:
+                    continue
+                except Exception as e:
+                    print(f"✗ 删除临时文件失败 {path}: {e}")
+        self.submit(task)
+
+    def flush(self):
+        """等待已提交的任务全部完成"""
+        if self.thread.is_alive():
+            self.tasks.join()
+
+    def close(self):
+        """完成剩余任务后结束线程"""
+        if self.thread.is_alive():
+            self.tasks.put(SENTINEL)
+            self.thread.join()
@@ -0,0 +1,159 @@
+"""
+网络请求捕获模块
+通过CDP性能日志捕获个人信息页自身发出的XHR请求，直接解析接口返回的JSON
+"""
+
+import json
+import re
+import time
+import base64
+
+
+class NetworkCapture:
+    """基于CDP Network事件的接口响应捕获器"""
+
+    def __init__(self, capture_config):
+        """初始化捕获器
+
+        Args:
+            capture_config (dict): 配置文件中的capture配置段
+        """
+        self.api_patterns = capture_config.get('api_patterns', [])
+        self.field_map = capture_config.get('field_map', {})
+        self.exists_path = capture_config.get('exists_path', 'data')
+        self.timeout = capture_config.get('timeout', 10)
+
+        # requestId -> 响应URL，等待loadingFinished后再读取响应体
+        self.pending = {}
+        self.finished = set()
+
+    @staticmethod
+    def enable_logging(options):
+        """在浏览器选项中开启性能日志（Edge使用ms:前缀的能力名）"""
+        options.set_capability('ms:loggingPrefs', {'performance': 'ALL'})
+
+    def start(self, driver):
+        """开启CDP网络事件并丢弃之前积累的日志"""
+        driver.execute_cdp_cmd('Network.enable', {})
+        self.reset(driver)
+
+    def reset(self, driver):
+        """清空积累的日志和待处理请求"""
+        try:
+            driver.get_log('performance')
+        except Exception:
+            pass
+        self.pending.clear()
+        self.finished.clear()
+
+    def match_url(self, url, uid):
+        """判断响应URL是否为目标UID的个人信息接口"""
+        for pattern in self.api_patterns:
+            if re.search(pattern.replace('{uid}', re.escape(str(uid))), url):
+                return True
+        return False
+
+    def poll_events(self, driver, uid):
+        """读取性能日志，记录匹配的响应和已完成加载的请求"""
+        for entry in driver.get_log('performance'):
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+
+            method = message.get('method')
+            params = message.get('params', {})
+
+            if method == 'Network.responseReceived':
+                url = params.get('response', {}).get('url', '')
+                if self.match_url(url, uid):
+                    self.pending[params['requestId']] = url
+            elif method == 'Network.loadingFinished':
+                self.finished.add(params.get('requestId'))
+
+    def read_body(self, driver, request_id):
+        """通过CDP读取响应体并解析为JSON"""
+        body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+        text = body.get('body', '')
+        if body.get('base64Encoded'):
+            text = base64.b64decode(text).decode('utf-8')
+        return json.loads(text)
+
+    def wait_for_responses(self, driver, uid):
+        """等待目标UID的接口响应全部返回
+
+        Returns:
+            list: 按接收顺序排列的 (url, json数据) 列表，超时且没有任何响应时为空列表
+        """
+        responses = []
+        deadline = time.time() + self.timeout
+
+        while time.time() < deadline:
+            self.poll_events(driver, uid)
+
+            for request_id in list(self.pending):
+                if request_id not in self.finished:
+                    continue
+                url = self.pending.pop(request_id)
+                try:
+                    responses.append((url, self.read_body(driver, request_id)))
+                except Exception as e:
+                    print(f"✗ 读取接口响应失败 {url}: {e}")
+
+            # 所有接口模式都已拿到响应即可返回
+            if responses and not self.pending and len(responses) >= len(self.api_patterns):
+                break
+            time.sleep(0.1)
+
+        return responses
+
+    @staticmethod
+    def lookup(data, path):
+        """按点分路径读取嵌套字段，例如 data.character.name"""
+        value = data
+        for key in path.split('.'):
+            if isinstance(value, dict):
+                value = value.get(key)
+            elif isinstance(value, list) and key.isdigit() and int(key) < len(value):
+                value = value[int(key)]
+            else:
+                return None
+            if value is None:
+                return None
+        return value
+
+    def build_player_data(self, responses, uid):
+        """把接口JSON映射为与文本解析一致的player_data
+
+        Returns:
+            dict: player_data；没有捕获到任何响应时返回None，由调用方回退到文本解析
+        """
+        if not responses:
+            return None
+
+        bodies = [body for _, body in responses]
+
+        player_data = {'uid': str(uid)}
+        for field, paths in self.field_map.items():
+            player_data[field] = None
+            for body in bodies:
+                for path in paths:
+                    value = self.lookup(body, path)
+                    if value not in (None, ''):
+                        player_data[field] = value
+                        break
+                if player_data[field] is not None:
+                    break
+
+        # 接口中没有用户数据时视为用户不存在
+        exists = any(self.lookup(body, self.exists_path) for body in bodies)
+        player_data['user_exists'] = exists
+        if not exists:
+            player_data['error_message'] = f"UID {uid} 对应的用户不存在"
+            for field in self.field_map:
+                if field != 'uid':
+                    player_data[field] = None
+        elif not player_data.get('recent_activity'):
+            player_data['recent_activity'] = "无近期活动"
+
+        return player_data
@@ -6,26 +6,195 @@
 import time
 import json
 import re
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.edge.options import Options
-from selenium.common.exceptions import NoSuchElementException
 import pickle
 import os
+import threading
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from profile_parser import body_text_to_lines, element_to_lines, html_to_lines, parse_html
+
+# Selenium在创建分析器时才导入，导入本模块本身不加载浏览器依赖
+
+# 一次execute_script取回页面快照，之后的选择器统计全部离线完成
+SNAPSHOT_SCRIPT = """
+return {
+    url: window.location.href,
+    title: document.title,
+    html: document.documentElement.outerHTML,
+    body_text: document.body ? document.body.innerText : ''
+};
+"""
+
+# 查找关键信息的关键词
+KEYWORDS = {
+    'player_id': ['玩家ID', 'ID', '角色名'],
+    'create_time': ['创角时间', '创建时间', '注册时间'],
+    'last_login': ['最近登陆', '最后登录', '上次登录'],
+    'total_playtime': ['累计游戏时长', '游戏时长', '总时长'],
+    'recent_activity': ['游戏近况', '最近活动', '达成']
+}
+
+# 尝试的CSS选择器
+SELECTORS_TO_TRY = [
+    # 常见的信息容器
+    ".info", ".profile", ".detail", ".content", ".player-info",
+    ".character-info", ".user-info", ".game-info",
+    # 表格和列表
+    "table", "tr", "td", "ul", "li", "dl", "dt", "dd",
+    # 文本容器
+    "div", "span", "p", "h1", "h2", "h3", "h4", "h5", "h6",
+    # 特定属性
+    "[class*='time']", "[class*='date']", "[class*='play']",
+    "[class*='activity']", "[class*='recent']"
+]
+
+
+def analyze_snapshot(snapshot, selectors=SELECTORS_TO_TRY, max_elements=10):
+    """离线分析页面快照（可在解析进程中执行）
+
+    元素文本由源码按块级元素换行近似得到，与WebElement.text的差别在于无法排除CSS隐藏的元素。
+
+    Args:
+        snapshot (dict): url、title、html、body_text
+        selectors (list): 要统计的CSS选择器
+        max_elements (int): 每个选择器记录的元素数
+
+    Returns:
+        dict: 与原先逐元素调用WebDriver得到的结构一致，另有每个选择器的匹配数和errors列表
+    """
+    from lxml.cssselect import CSSSelector
+
+    lines = body_text_to_lines(snapshot.get('body_text', ''))
+    analysis_result = {
+        'url': snapshot.get('url'),
+        'title': snapshot.get('title'),
+        'all_text_lines': lines,
+        'found_elements': {},
+        'selector_counts': {},
+        'errors': []
+    }
+
+    # 搜索包含关键词的文本
+    for category, keyword_list in KEYWORDS.items():
+        found_info = [line for line in lines if any(keyword in line for keyword in keyword_list)]
+        if found_info:
+            analysis_result['found_elements'][category] = found_info
+
+    element_analysis = {}
+    try:
+        root = parse_html(snapshot.get('html', ''))
+    except Exception as e:
+        analysis_result['errors'].append({'stage': 'parse', 'error': str(e)})
+        analysis_result['element_analysis'] = element_analysis
+        return analysis_result
+
+    for selector in selectors:
+        try:
+            elements = CSSSelector(selector)(root)
+        except Exception as e:
+            analysis_result['errors'].append({'stage': 'selector', 'selector': selector, 'error': str(e)})
+            continue
+
+        analysis_result['selector_counts'][selector] = len(elements)
+        element_texts = []
+        for i, element in enumerate(elements[:max_elements]):
+            text = '\n'.join(element_to_lines(element))
+            if text and len(text) < 500:  # 过滤过长文本
+                element_texts.append({
+                    'index': i,
+                    'text': text,
+                    'tag': element.tag,
+                    'class': element.get('class') or '',
+                    'id': element.get('id') or ''
+                })
+        if element_texts:
+            element_analysis[selector] = element_texts
+
+    analysis_result['element_analysis'] = element_analysis
+    return analysis_result
+
+
+def snapshot_from_html_file(path):
+    """由保存的页面源码构造快照（body_text由源码近似）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        html = f.read()
+    title_match = re.search(r'<title[^>]*>(.*?)</title>', html, re.S | re.I)
+    url_match = re.search(r'uuid=(\d+)', html)
+    return {
+        'url': url_match.group(0) if url_match else path,
+        'title': title_match.group(1).strip() if title_match else None,
+        'html': html,
+        'body_text': '\n'.join(html_to_lines(html))
+    }
+
+
+def summarize_analyses(results):
+    """汇总多个页面的分析结果：各选择器的命中页面数和平均匹配数、各关键词的命中页面数"""
+    pages = len(results)
+    selectors = {}
+    for result in results:
+        for selector, count in result.get('selector_counts', {}).items():
+            stats = selectors.setdefault(selector, {'pages_matched': 0, 'total_matches': 0})
+            stats['total_matches'] += count
+            if count:
+                stats['pages_matched'] += 1
+    for stats in selectors.values():
+        stats['avg_matches'] = round(stats.pop('total_matches') / pages, 2) if pages else 0
+
+    keywords = {category: sum(1 for result in results if category in result['found_elements'])
+                for category in KEYWORDS}
+    errors = [dict(error, url=result['url']) for result in results for error in result['errors']]
+
+    return {
+        'pages': pages,
+        'keyword_pages': keywords,
+        'selectors': selectors,
+        'errors': errors
+    }
+
+
+def analyze_snapshots(snapshots, workers=None):
+    """用进程池并行分析多个快照"""
+    snapshots = list(snapshots)
+    if len(snapshots) <= 1 or workers == 1:
+        return [analyze_snapshot(snapshot) for snapshot in snapshots]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(analyze_snapshot, snapshots, chunksize=4))
 
 class PageAnalyzer:
-    def __init__(self):
-        """初始化页面分析器"""
+    def __init__(self, config_file='config.json'):
+        """初始化页面分析器
+        
+        Args:
+            config_file (str): 爬虫配置文件，只使用其中的cassette配置段（回放模式）
+        """
+        from selenium.webdriver.edge.options import Options
+        
         self.options = Options()
         self.options.add_argument('--no-sandbox')
         self.options.add_argument('--disable-dev-shm-usage')
         self.driver = None
         self.cookies_file = 'analyzer_cookies.pkl'
+        self.replay = None
+        try:
+            with open(config_file, 'r', encoding='utf-8') as f:
+                self.cassette_config = json.load(f).get('cassette', {})
+        except FileNotFoundError:
+            self.cassette_config = {}
         
     def start_driver(self):
-        """启动浏览器"""
+        """启动浏览器（回放模式下同时启动本地回放服务器）"""
+        from selenium import webdriver
+        from cassette import replay_from_config
+        
+        self.replay = replay_from_config(self.cassette_config)
         self.driver = webdriver.Edge(options=self.options)
         return self.driver
+    
+    def site_url(self, url):
+        """回放模式下把站点URL转换为本地回放服务器上的URL"""
+        return self.replay.local_url(url) if self.replay else url
         
     def load_cookies(self):
         """加载已保存的cookies"""
@@ -34,7 +203,7 @@ class PageAnalyzer:
                 with open(self.cookies_file, 'rb') as f:
                     cookies = pickle.load(f)
                 
-                self.driver.get("https://ff14risingstones.web.sdo.com")
+                self.driver.get(self.site_url("https://ff14risingstones.web.sdo.com"))
                 time.sleep(2)
                 
                 for cookie in cookies:
@@ -83,12 +252,16 @@ class PageAnalyzer:
         print("✗ 登录超时")
         return False
     
-    def analyze_page_structure(self, url):
-        """分析页面结构"""
-        print(f"正在分析页面: {url}")
+    def open_page(self, url, load_cookies=True):
+        """访问页面，需要时完成登录
+        
+        Returns:
+            bool: 登录失败返回False
+        """
+        url = self.site_url(url)
         
         # 加载登录态
-        if self.load_cookies():
+        if load_cookies and self.load_cookies():
             print("使用已保存的分析器登录态")
         
         # 访问页面
@@ -101,7 +274,7 @@ class PageAnalyzer:
         # 检查是否需要登录
         if "login" in current_url.lower():
             if not self.wait_for_login():
-                return None
+                return False
             
             # 登录成功后重新访问目标URL
             print(f"重新访问目标页面: {url}")
@@ -110,85 +283,34 @@ class PageAnalyzer:
             current_url = self.driver.current_url
             print(f"登录后访问页面: {current_url}")
         
+        return True
+    
+    def capture_snapshot(self):
+        """一次WebDriver调用取回当前页面的快照（URL、标题、源码、渲染文本）"""
+        snapshot = self.driver.execute_script(SNAPSHOT_SCRIPT)
+        if self.replay:
+            snapshot['url'] = self.replay.public_url(snapshot['url'])
+        return snapshot
+    
+    def analyze_page_structure(self, url):
+        """分析页面结构"""
+        print(f"正在分析页面: {url}")
+        
+        if not self.open_page(url):
+            return None
+        
         print(f"页面标题: {self.driver.title}")
         time.sleep(5)  # 等待页面完全加载
         
-        # 获取页面源码
-        page_source = self.driver.page_source
+        snapshot = self.capture_snapshot()
         
         # 保存完整页面源码
         with open('output/page_analysis.html', 'w', encoding='utf-8') as f:
-            f.write(page_source)
+            f.write(snapshot['html'])
         print("✓ 完整页面源码已保存到 output/page_analysis.html")
         
-        # 分析页面文本内容
-        body_text = self.driver.find_element(By.TAG_NAME, "body").text
-        lines = body_text.split('\n')
-        
-        analysis_result = {
-            'url': self.driver.current_url,
-            'title': self.driver.title,
-            'all_text_lines': [line.strip() for line in lines if line.strip()],
-            'found_elements': {}
-        }
-        
-        # 查找关键信息
-        keywords = {
-            'player_id': ['玩家ID', 'ID', '角色名'],
-            'create_time': ['创角时间', '创建时间', '注册时间'],
-            'last_login': ['最近登陆', '最后登录', '上次登录'],
-            'total_playtime': ['累计游戏时长', '游戏时长', '总时长'],
-            'recent_activity': ['游戏近况', '最近活动', '达成']
-        }
-        
-        # 搜索包含关键词的文本
-        for category, keyword_list in keywords.items():
-            found_info = []
-            for line in lines:
-                line = line.strip()
-                if any(keyword in line for keyword in keyword_list):
-                    found_info.append(line)
-            if found_info:
-                analysis_result['found_elements'][category] = found_info
-        
-        # 尝试通过不同的选择器查找元素
-        selectors_to_try = [
-            # 常见的信息容器
-            ".info", ".profile", ".detail", ".content", ".player-info",
-            ".character-info", ".user-info", ".game-info",
-            # 表格和列表
-            "table", "tr", "td", "ul", "li", "dl", "dt", "dd",
-            # 文本容器
-            "div", "span", "p", "h1", "h2", "h3", "h4", "h5", "h6",
-            # 特定属性
-            "[class*='time']", "[class*='date']", "[class*='play']",
-            "[class*='activity']", "[class*='recent']"
-        ]
-        
-        element_analysis = {}
-        for selector in selectors_to_try:
-            try:
-                elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                if elements:
-                    element_texts = []
-                    for i, element in enumerate(elements[:10]):  # 限制前10个元素
-                        text = element.text.strip()
-                        if text and len(text) < 500:  # 过滤过长文本
-                            element_texts.append({
-                                'index': i,
-                                'text': text,
-                                'tag': element.tag_name,
-                                'class': element.get_attribute('class') or '',
-                                'id': element.get_attribute('id') or ''
-                            })
-                    
-                    if element_texts:
-                        element_analysis[selector] = element_texts
-                        
-            except Exception as e:
-                continue
-        
-        analysis_result['element_analysis'] = element_analysis
+        # 选择器统计在快照上离线完成，不再逐个元素调用WebDriver
+        analysis_result = analyze_snapshot(snapshot)
         
         # 保存分析结果
         with open('output/page_structure_analysis.json', 'w', encoding='utf-8') as f:
@@ -203,13 +325,94 @@ class PageAnalyzer:
             for info in info_list:
                 print(f"  - {info}")
         
+        for error in analysis_result['errors']:
+            print(f"✗ 分析出错: {error}")
+        
         return analysis_result
     
+    def capture_many(self, urls, wait=5):
+        """依次访问多个页面并采集快照，登录态只加载一次
+        
+        Returns:
+            list: 快照列表，访问失败的页面记录为带error字段的快照
+        """
+        snapshots = []
+        for i, url in enumerate(urls):
+            print(f"\n[{i + 1}/{len(urls)}] 采集快照: {url}")
+            try:
+                if not self.open_page(url, load_cookies=(i == 0)):
+                    break
+                time.sleep(wait)
+                snapshots.append(self.capture_snapshot())
+            except Exception as e:
+                print(f"✗ 采集快照失败: {e}")
+                snapshots.append({'url': url, 'title': None, 'html': '', 'body_text': '', 'error': str(e)})
+        return snapshots
+    
     def close(self):
         """关闭浏览器"""
         if self.driver:
             print("正在关闭分析器浏览器...")
             self.driver.quit()
+        if self.replay:
+            self.replay.stop()
+            self.replay = None
+
+def analyze_urls(urls, browsers=1, workers=None, wait=5):
+    """采集多个页面的快照并并行分析，汇总结果保存到 output/page_structure_summary_时间戳.json
+    
+    Args:
+        urls (list): 页面URL
+        browsers (int): 同时采集快照的浏览器数
+        workers (int): 离线分析的进程数，默认CPU核数
+        wait (float): 每个页面加载后等待渲染的秒数
+    """
+    shares = [urls[i::browsers] for i in range(browsers)]
+    captured = [[] for _ in range(browsers)]
+    
+    def capture(index):
+        analyzer = PageAnalyzer()
+        try:
+            analyzer.start_driver()
+            captured[index] = analyzer.capture_many(shares[index], wait=wait)
+        except Exception as e:
+            print(f"✗ 浏览器 {index + 1} 采集失败: {e}")
+        finally:
+            analyzer.close()
+    
+    threads = [threading.Thread(target=capture, args=(i,)) for i in range(browsers) if shares[i]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    snapshots = [snapshot for share in captured for snapshot in share]
+    return analyze_and_save(snapshots, workers)
+
+
+def analyze_and_save(snapshots, workers=None):
+    """并行分析快照并保存汇总"""
+    start = time.time()
+    results = analyze_snapshots(snapshots, workers)
+    for snapshot, result in zip(snapshots, results):
+        if snapshot.get('error'):
+            result['errors'].append({'stage': 'capture', 'error': snapshot['error']})
+    summary = summarize_analyses(results)
+    print(f"✓ 已分析 {len(results)} 个页面，离线分析耗时 {time.time() - start:.2f} 秒")
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"output/page_structure_summary_{timestamp}.json"
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump({'summary': summary, 'pages': results}, f, ensure_ascii=False, indent=2)
+    print(f"✓ 汇总结果已保存到: {filename}")
+    
+    print("\n=== 关键词命中页面数 ===")
+    for category, count in summary['keyword_pages'].items():
+        print(f"  {category}: {count}/{summary['pages']}")
+    if summary['errors']:
+        print(f"✗ 共 {len(summary['errors'])} 个错误，详见汇总文件")
+    return summary
+
 
 def main():
     """主函数"""
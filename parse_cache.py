@@ -0,0 +1,187 @@
+"""
+解析结果缓存模块
+不存在的UID渲染的都是同一个"盛趣游戏"模板页面，重复爬取或重新解析存档时大量页面内容完全相同：
+- 按规范化后的页面内容计算哈希，内容相同的页面直接复用上一次的解析结果，不再解析
+- 解析结果中只有UID和错误信息来自URL，命中时按当前URL改写（见profile_parser.apply_url_fields）
+- 缓存条目数有上限，超出时淘汰最久未使用的条目（LRU）
+- 可选保存到文件，下次运行（例如重新解析同一批存档）时直接命中；解析代码变化后旧缓存自动作废
+"""
+
+import os
+import re
+import json
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+
+import profile_parser
+from profile_parser import apply_url_fields, parse_profile_lines
+
+UUID_PATTERN = re.compile(r'uuid=\d+')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def parser_version():
+    """解析代码的指纹：profile_parser.py 内容的哈希，解析规则修改后缓存文件中的旧结果不再使用"""
+    with open(profile_parser.__file__, 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+
+
+def content_key(lines):
+    """页面文本行的缓存键"""
+    return 'text:' + hashlib.blake2b('\n'.join(lines).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def html_key(html, variant=''):
+    """页面源码的缓存键：合并空白并去掉URL中的uuid参数，只有这些不同的页面视为相同内容
+
+    Args:
+        html (str): 页面源码
+        variant (str): 影响解析结果的其他设置（例如选择器配置），不同设置的结果分开缓存
+    """
+    normalized = WHITESPACE_PATTERN.sub(' ', UUID_PATTERN.sub('uuid=', html))
+    return 'html:' + hashlib.blake2b((variant + '\n' + normalized).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def patch_url_fields(player_data, url):
+    """把缓存的解析结果改写为当前URL对应的结果（只有不存在的用户的UID来自URL）"""
+    if player_data.get('user_exists', True):
+        return player_data
+    if re.search(r'uuid=(\d+)', url or ''):
+        apply_url_fields(player_data, url)
+    else:
+        player_data.pop('uid', None)
+        player_data['error_message'] = "用户不存在"
+    return player_data
+
+
+class ParseCache:
+    """按内容哈希缓存player_data，LRU淘汰，可选持久化"""
+
+    def __init__(self, max_entries=10000, cache_file=None):
+        """初始化解析缓存
+
+        Args:
+            max_entries (int): 最多缓存的条目数
+            cache_file (str): 缓存文件路径，None时只在内存中缓存
+        """
+        self.max_entries = max(1, max_entries)
+        self.cache_file = cache_file
+        self.version = parser_version()
+        # 批量爬取的多个worker线程共用一个实例
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.dirty = False
+        self.load()
+
+    def get(self, key):
+        """读取缓存的player_data（副本），未命中时返回None"""
+        with self.lock:
+            player_data = self.entries.get(key)
+            if player_data is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(player_data)
+
+    def put(self, key, player_data):
+        """写入解析结果，超出条目上限时淘汰最久未使用的条目"""
+        player_data = copy.deepcopy(player_data)
+        with self.lock:
+            self.entries[key] = player_data
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+            self.dirty = True
+
+    def parse_lines(self, lines, url):
+        """解析页面文本行，内容相同的页面复用缓存的结果
+
+        Returns:
+            dict: 与parse_profile_lines一致的player_data
+        """
+        key = content_key(lines)
+        player_data = self.get(key)
+        if player_data is not None:
+            return patch_url_fields(player_data, url)
+        player_data = parse_profile_lines(lines, url)
+        self.put(key, player_data)
+        return player_data
+
+    def load(self):
+        """读取缓存文件，不存在、损坏或解析代码已变化时从空缓存开始"""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except Exception as e:
+            print(f"✗ 读取解析缓存失败: {e}")
+            return
+        if stored.get('version') != self.version:
+            print("解析代码已变化，不使用旧的解析缓存")
+            return
+        # 文件中按最近使用顺序保存，只保留最近的max_entries条
+        for key, player_data in stored.get('entries', [])[-self.max_entries:]:
+            self.entries[key] = player_data
+
+    def save(self):
+        """把缓存写入文件（原子替换），没有新条目时不写"""
+        if not self.cache_file:
+            return
+        with self.lock:
+            if not self.dirty:
+                return
+            stored = {'version': self.version, 'entries': list(self.entries.items())}
+            try:
+                os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+                temp_file = self.cache_file + '.tmp'
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(stored, f, ensure_ascii=False)
+                os.replace(temp_file, self.cache_file)
+            except Exception as e:
+                print(f"✗ 保存解析缓存失败: {e}")
+                return
+            self.dirty = False
+
+    def summary(self):
+        """命中统计"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions
+            }
+
+    def report(self):
+        """一行命中统计，没有查找过时返回None"""
+        summary = self.summary()
+        if summary['hit_rate'] is None:
+            return None
+        return (f"解析缓存: 命中 {summary['hits']}/{summary['hits'] + summary['misses']} "
+                f"({summary['hit_rate'] * 100:.1f}%)，缓存 {summary['entries']} 条，淘汰 {summary['evictions']} 条")
+
+
+def parse_cache_from_config(config, cache_file=None):
+    """按配置创建解析缓存，未启用时返回None
+
+    Args:
+        config (dict): 爬虫配置
+        cache_file (str): 覆盖配置中的缓存文件（命令行 --cache-file）
+    """
+    cache_config = config.get('parse_cache', {})
+    if not cache_config.get('enabled', True):
+        return None
+    return ParseCache(
+        max_entries=cache_config.get('max_entries', 10000),
+        cache_file=cache_file or cache_config.get('cache_file')
+    )
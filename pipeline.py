@@ -0,0 +1,315 @@
+"""
+分阶段爬取流水线
+抓取、解析、写出三个阶段通过有界队列解耦：
+- 抓取阶段：多个浏览器worker只负责抓取页面原始内容（文本、HTML或接口JSON）
+- 解析阶段：进程池把原始内容解析为player_info
+- 写出阶段：单线程把结果逐条追加到结果文件（默认JSON Lines，也可以是二进制格式）
+队列写满时上游阶段阻塞（背压），内存占用与队列长度成正比
+"""
+
+import os
+import time
+import queue
+import threading
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from profile_parser import body_text_to_lines, parse_profile_lines, saved_url_comment
+from serializers import JsonSerializer
+from parse_cache import ParseCache
+
+# 队列结束标记
+SENTINEL = None
+
+# 解析进程内的解析缓存（每个进程一份，由init_parser创建）
+_parse_cache = None
+
+
+def init_parser(parse_cache_size):
+    """解析进程的初始化函数"""
+    global _parse_cache
+    _parse_cache = ParseCache(max_entries=parse_cache_size) if parse_cache_size else None
+
+
+def parse_payload(payload):
+    """解析抓取阶段的原始内容（在解析进程中执行）"""
+    player_info = {
+        'url': payload['url'],
+        'title': payload['title'],
+        'timestamp': payload['timestamp']
+    }
+    if 'player_data' in payload:
+        player_info['player_data'] = payload['player_data']
+        player_info['source'] = payload.get('source')
+    else:
+        lines = body_text_to_lines(payload.get('body_text', ''))
+        if _parse_cache is not None:
+            player_info['player_data'] = _parse_cache.parse_lines(lines, payload['url'])
+        else:
+            player_info['player_data'] = parse_profile_lines(lines, payload['url'])
+        if payload.get('selector_fields') is not None and player_info['player_data']['user_exists']:
+            player_info['player_data']['selector_fields'] = payload['selector_fields']
+    return player_info
+
+
+class StageStats:
+    """单个阶段的吞吐量和繁忙时间统计"""
+
+    def __init__(self, name, workers=1):
+        self.name = name
+        self.workers = workers
+        self.count = 0
+        self.busy_time = 0.0
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def record(self, elapsed, count=1):
+        """记录一次处理耗时"""
+        with self.lock:
+            self.count += count
+            self.busy_time += elapsed
+
+    def snapshot(self):
+        """当前统计：处理数量、每秒吞吐量、利用率（繁忙时间占比）"""
+        wall = max(time.time() - self.started, 1e-6)
+        with self.lock:
+            return {
+                'count': self.count,
+                'rate': round(self.count / wall, 2),
+                'utilization': round(min(self.busy_time / (wall * self.workers), 1.0), 3)
+            }
+
+
+class CrawlPipeline:
+    """抓取-解析-写出流水线"""
+
+    def __init__(self, fetchers=1, parsers=None, queue_size=32, output_file=None,
+                 keep_html=False, config_file='config.json', report_interval=10, serializer=None,
+                 parse_cache_size=10000):
+        """初始化流水线
+
+        Args:
+            fetchers (int): 抓取worker数（每个worker一个浏览器）
+            parsers (int): 解析进程数，默认CPU核数
+            queue_size (int): 阶段间队列长度，决定内存上限
+            output_file (str): 结果文件，默认 output/pipeline_results_时间戳.jsonl（二进制格式为.ffr）
+            keep_html (bool): 是否保存页面源码
+            config_file (str): 爬虫配置文件
+            report_interval (float): 打印阶段状态的间隔秒数
+            serializer: 结果文件格式（serializers模块），默认JSON Lines
+            parse_cache_size (int): 每个解析进程的解析缓存条目数，0时不缓存
+        """
+        self.fetchers = fetchers
+        self.parsers = parsers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.serializer = serializer or JsonSerializer()
+        self.output_file = output_file or f"output/pipeline_results_{timestamp}{self.serializer.stream_extension}"
+        self.keep_html = keep_html
+        self.config_file = config_file
+        self.report_interval = report_interval
+        self.parse_cache_size = parse_cache_size
+
+        self.raw_queue = queue.Queue(maxsize=queue_size)
+        self.record_queue = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+
+        self.fetch_stats = StageStats('fetch', fetchers)
+        self.parse_stats = StageStats('parse', self.parsers)
+        self.write_stats = StageStats('write')
+        self.failed_count = 0
+        self.failed_lock = threading.Lock()
+        # 写出阶段异常退出时的错误，设置后上游阶段不再等待写出
+        self.write_error = None
+
+        self.source = None
+        self.source_lock = threading.Lock()
+
+    def next_url(self):
+        """从输入中取下一个URL，多个抓取worker共享"""
+        with self.source_lock:
+            return next(self.source, None)
+
+    def mark_failed(self):
+        """失败计数（抓取线程和解析回调线程都会调用）"""
+        with self.failed_lock:
+            self.failed_count += 1
+
+    def put_record(self, item):
+        """把解析结果交给写出阶段，写出阶段已异常退出时放弃
+
+        Returns:
+            bool: 是否已放入队列
+        """
+        while self.write_error is None:
+            try:
+                self.record_queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def status(self):
+        """各阶段的队列深度和吞吐量"""
+        return {
+            'raw_queue': self.raw_queue.qsize(),
+            'record_queue': self.record_queue.qsize(),
+            'fetch': self.fetch_stats.snapshot(),
+            'parse': self.parse_stats.snapshot(),
+            'write': self.write_stats.snapshot(),
+            'failed': self.failed_count
+        }
+
+    def fetch_worker(self, worker_id):
+        """抓取阶段：每个worker独占一个浏览器"""
+        from ff14_spider import FF14RisingStonesSpider
+
+        spider = FF14RisingStonesSpider(self.config_file)
+        spider.interactive = False
+        if not spider.setup_driver():
+            print(f"✗ 抓取worker {worker_id} 浏览器启动失败")
+            return
+
+        # 超时的URL在输入耗尽后重试一次
+        retry_urls = []
+        try:
+            while not self.stop_event.is_set():
+                url = self.next_url()
+                retrying = url is None
+                if retrying:
+                    if not retry_urls:
+                        break
+                    url = retry_urls.pop(0)
+
+                start = time.time()
+                payload = spider.fetch_payload(url)
+                self.fetch_stats.record(time.time() - start)
+
+                if payload is None:
+                    if spider.last_failure == 'timeout' and not retrying:
+                        retry_urls.append(url)
+                    else:
+                        self.mark_failed()
+                    continue
+                # 队列满时阻塞，形成背压
+                self.raw_queue.put(payload)
+        finally:
+            spider.close()
+
+    def parse_stage(self, pool):
+        """解析阶段：把原始内容提交给进程池，限制同时在途的任务数"""
+        in_flight = threading.Semaphore(self.parsers * 2)
+
+        def on_done(future, html, submitted):
+            try:
+                player_info = future.result()
+                self.parse_stats.record(time.time() - submitted)
+                # 在进程池的回调线程中执行，不能无限期阻塞，否则在途任务数永远不会释放
+                if not self.put_record((player_info, html)):
+                    self.mark_failed()
+            except Exception as e:
+                print(f"✗ 解析失败: {e}")
+                self.mark_failed()
+            finally:
+                in_flight.release()
+
+        while True:
+            payload = self.raw_queue.get()
+            if payload is SENTINEL:
+                break
+            if self.write_error is not None:
+                # 写出阶段已退出，丢弃剩余页面，只是继续取出队列让抓取worker不被阻塞
+                self.mark_failed()
+                continue
+            # HTML只在写出阶段使用，不传给解析进程
+            html = payload.pop('html', None)
+            in_flight.acquire()
+            submitted = time.time()
+            future = pool.submit(parse_payload, payload)
+            future.add_done_callback(lambda f, h=html, t=submitted: on_done(f, h, t))
+
+        # 等待所有在途任务完成
+        for _ in range(self.parsers * 2):
+            in_flight.acquire()
+        self.put_record(SENTINEL)
+
+    def write_stage(self):
+        """写出阶段：逐条追加到结果文件，出错时记录错误并停止整个流水线"""
+        try:
+            stream = self.serializer.open_stream(self.output_file)
+            try:
+                while True:
+                    item = self.record_queue.get()
+                    if item is SENTINEL:
+                        break
+                    player_info, html = item
+
+                    start = time.time()
+                    if self.keep_html and html:
+                        html_name = f"page_source_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.html"
+                        with open(os.path.join('output', html_name), 'w', encoding='utf-8') as html_file:
+                            html_file.write(saved_url_comment(player_info['url']))
+                            html_file.write(html)
+                        player_info['html_file'] = html_name
+                    stream.write(player_info)
+                    self.write_stats.record(time.time() - start)
+            finally:
+                stream.close()
+        except Exception as e:
+            self.write_error = e
+            self.stop_event.set()
+            print(f"✗ 写出结果失败，停止流水线: {e}")
+
+    def print_status(self):
+        """打印一行阶段状态"""
+        status = self.status()
+        print(
+            f"[流水线] 抓取 {status['fetch']['count']} ({status['fetch']['rate']}/s, 利用率 {status['fetch']['utilization']*100:.0f}%) "
+            f"| 待解析 {status['raw_queue']} | 解析 {status['parse']['count']} ({status['parse']['rate']}/s) "
+            f"| 待写出 {status['record_queue']} | 写出 {status['write']['count']} | 失败 {status['failed']}"
+        )
+
+    def run(self, urls):
+        """运行流水线直到输入耗尽，写出阶段失败时抛出RuntimeError
+
+        Args:
+            urls (iterable): 要爬取的URL
+
+        Returns:
+            dict: 最终的阶段状态
+        """
+        self.source = iter(urls)
+        print(f"启动流水线: 抓取worker {self.fetchers} 个，解析进程 {self.parsers} 个，队列长度 {self.queue_size}")
+
+        with ProcessPoolExecutor(max_workers=self.parsers, initializer=init_parser,
+                                 initargs=(self.parse_cache_size,)) as pool:
+            fetch_threads = [
+                threading.Thread(target=self.fetch_worker, args=(i,), daemon=True)
+                for i in range(self.fetchers)
+            ]
+            parse_thread = threading.Thread(target=self.parse_stage, args=(pool,), daemon=True)
+            write_thread = threading.Thread(target=self.write_stage, daemon=True)
+
+            for thread in fetch_threads + [parse_thread, write_thread]:
+                thread.start()
+
+            try:
+                while any(thread.is_alive() for thread in fetch_threads):
+                    for thread in fetch_threads:
+                        thread.join(timeout=self.report_interval)
+                    self.print_status()
+            except KeyboardInterrupt:
+                print("\n用户中断，等待已抓取的页面处理完成...")
+                self.stop_event.set()
+                for thread in fetch_threads:
+                    thread.join()
+            finally:
+                self.raw_queue.put(SENTINEL)
+                parse_thread.join()
+                write_thread.join()
+
+        self.print_status()
+        if self.write_error is not None:
+            raise RuntimeError(f"写出结果失败: {self.write_error}")
+        print(f"✓ 结果已保存到: {self.output_file}")
+        return self.status()
@@ -0,0 +1,195 @@
+"""
+批量爬取的停止与预算策略
+每个策略根据批量爬虫当前的计数判断是否应停止派发新的UID，并尽可能估计剩余的UID数，
+多个策略组合使用时任一策略触发即停止。
+带时间预算时，按估计的剩余UID数和单UID耗时计算需要的并发数，使爬取在预算内结束
+"""
+
+import math
+import time
+
+
+class StopPolicy:
+    """停止策略基类"""
+
+    # 预算类策略触发时立即结束，不再重试超时的UID
+    hard = False
+    # 只适用于按UID顺序递增爬取（连续不存在计数在密度调度下没有意义）
+    sequential_only = False
+
+    def check(self, engine):
+        """应停止时返回停止原因，否则返回None"""
+        return None
+
+    def remaining(self, engine):
+        """估计还需派发的UID数，无法估计时返回None"""
+        return None
+
+    def describe(self):
+        """策略说明，启动时打印"""
+        return self.__class__.__name__
+
+
+class MaxUsers(StopPolicy):
+    """最多派发n个UID"""
+
+    def __init__(self, limit):
+        self.limit = limit
+
+    def check(self, engine):
+        if engine.dispatched >= self.limit:
+            return f"已达到最大爬取数量 {self.limit}"
+        return None
+
+    def remaining(self, engine):
+        return max(0, self.limit - engine.dispatched)
+
+    def describe(self):
+        return f"最大爬取数量: {self.limit}"
+
+
+class UidRange(StopPolicy):
+    """只爬取到end_uid（包含）"""
+
+    sequential_only = True
+
+    def __init__(self, end_uid):
+        self.end_uid = end_uid
+
+    def check(self, engine):
+        if engine.next_sequential_uid > self.end_uid:
+            return f"已到达结束UID {self.end_uid}"
+        return None
+
+    def remaining(self, engine):
+        return max(0, self.end_uid - engine.next_sequential_uid + 1)
+
+    def describe(self):
+        return f"结束UID: {self.end_uid}"
+
+
+class ConsecutiveMisses(StopPolicy):
+    """连续遇到n个不存在的用户后停止（按UID顺序计数）"""
+
+    sequential_only = True
+
+    def __init__(self, limit=10):
+        self.limit = limit
+
+    def check(self, engine):
+        if engine.consecutive_nonexistent >= self.limit:
+            return f"已连续遇到 {self.limit} 个不存在的用户"
+        return None
+
+    def describe(self):
+        return f"连续{self.limit}个不存在用户时停止"
+
+
+class TimeBudget(StopPolicy):
+    """墙钟时间预算：剩余时间不足以完成一个UID时停止派发"""
+
+    hard = True
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.started = None
+
+    def start(self):
+        self.started = time.time()
+
+    def time_left(self):
+        """剩余秒数"""
+        if self.started is None:
+            return self.seconds
+        return self.seconds - (time.time() - self.started)
+
+    def check(self, engine):
+        if self.time_left() <= engine.average_uid_seconds():
+            return f"时间预算 {self.seconds} 秒即将用完"
+        return None
+
+    def describe(self):
+        return f"时间预算: {self.seconds} 秒"
+
+
+class RequestBudget(StopPolicy):
+    """最多向站点发出n次请求（完整页面爬取和预检各计一次）"""
+
+    hard = True
+
+    def __init__(self, limit):
+        self.limit = limit
+
+    def check(self, engine):
+        if engine.requests >= self.limit:
+            return f"已用完请求预算 {self.limit}"
+        return None
+
+    def remaining(self, engine):
+        if not engine.completed:
+            return None
+        per_uid = max(1.0, engine.requests / engine.completed)
+        return max(0, int((self.limit - engine.requests) / per_uid))
+
+    def describe(self):
+        return f"请求预算: {self.limit}"
+
+
+class LiveTarget(StopPolicy):
+    """找到n个存在的用户后停止"""
+
+    def __init__(self, target):
+        self.target = target
+
+    def check(self, engine):
+        if engine.successful_count >= self.target:
+            return f"已找到 {self.target} 个存在的用户"
+        return None
+
+    def remaining(self, engine):
+        checked = engine.successful_count + engine.nonexistent_count
+        if not engine.successful_count:
+            return None
+        # 按目前的命中率估计还需爬取的UID数
+        return math.ceil((self.target - engine.successful_count) * checked / engine.successful_count)
+
+    def describe(self):
+        return f"目标存在用户数: {self.target}"
+
+
+def workers_needed(remaining, seconds_per_uid, time_left, max_workers):
+    """在剩余时间内爬完剩余UID需要的并发数
+
+    Args:
+        remaining (int): 剩余UID数
+        seconds_per_uid (float): 单个worker处理一个UID的平均秒数（包括请求间隔）
+        time_left (float): 剩余秒数
+        max_workers (int): 并发上限
+
+    Returns:
+        int: 需要的worker数，不超过max_workers
+    """
+    if remaining <= 0:
+        return 1
+    if time_left <= 0:
+        return max_workers
+    return max(1, min(max_workers, math.ceil(remaining * seconds_per_uid / time_left)))
+
+
+def policies_from_args(max_users=None, end_uid=None, max_misses=10, time_budget=None,
+                       request_budget=None, target_live=None):
+    """按命令行参数组合停止策略，值为None或0的策略不启用"""
+    policies = []
+    if max_users:
+        policies.append(MaxUsers(max_users))
+    if end_uid is not None:
+        policies.append(UidRange(end_uid))
+    if max_misses:
+        policies.append(ConsecutiveMisses(max_misses))
+    if time_budget:
+        policies.append(TimeBudget(time_budget))
+    if request_budget:
+        policies.append(RequestBudget(request_budget))
+    if target_live:
+        policies.append(LiveTarget(target_live))
+    return policies
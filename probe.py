@@ -0,0 +1,141 @@
+"""
+存在性预检模块
+在已打开的站点页面中用一次fetch请求个人信息接口，几十毫秒内判断UID是否存在，
+只有存在的UID才进入完整的页面渲染和提取。
+预检结果无法判断（未登录、接口报错、返回格式不符）时交给完整爬取决定；
+只有响应带有成功标记（valid_path，可限定取值valid_values）时才会判定不存在，
+未配置成功标记时预检只用于确认存在，不会跳过任何UID
+"""
+
+import json
+
+from network_capture import NetworkCapture
+
+# 在页面上下文中请求接口（带上站点cookie），返回 [HTTP状态, 响应文本]，请求失败时状态为0
+PROBE_SCRIPT = """
+var url = arguments[0], timeout = arguments[1], done = arguments[arguments.length - 1];
+var controller = window.AbortController ? new AbortController() : null;
+var timer = setTimeout(function () {
+    if (controller) { controller.abort(); }
+    done([0, 'timeout']);
+}, timeout);
+fetch(url, {credentials: 'include', signal: controller ? controller.signal : undefined})
+    .then(function (response) {
+        return response.text().then(function (text) {
+            clearTimeout(timer);
+            done([response.status, text]);
+        });
+    })
+    .catch(function (error) {
+        clearTimeout(timer);
+        done([0, String(error)]);
+    });
+"""
+
+
+class ExistenceProbe:
+    """通过个人信息接口判断UID是否存在"""
+
+    def __init__(self, probe_config):
+        """初始化预检
+
+        Args:
+            probe_config (dict): 配置文件中的probe配置段
+        """
+        self.api_url = probe_config.get('api_url')
+        self.exists_path = probe_config.get('exists_path', 'data')
+        # 成功标记：判定不存在之前响应中必须有该字段（取值在valid_values中），
+        # 用于区分"用户不存在"和"未登录/接口报错"（这些响应同样没有用户数据）
+        self.valid_path = probe_config.get('valid_path')
+        self.valid_values = probe_config.get('valid_values')
+        self.timeout = probe_config.get('timeout', 5)
+        # 每隔多少个预检判定不存在的UID做一次完整爬取核对，第一个总是核对
+        self.verify_interval = probe_config.get('verify_interval', 20)
+
+        self.checked = 0
+        self.missing = 0
+        self.inconclusive = 0
+        self.disabled = False
+
+    def check(self, driver, uid, site_url=None):
+        """预检单个UID
+
+        Args:
+            driver: 已打开站点页面的WebDriver
+            uid (int): UID
+            site_url (callable): 回放模式下把站点URL转换为本地URL
+
+        Returns:
+            bool: 存在返回True，不存在返回False，无法判断返回None
+        """
+        if self.disabled or not self.api_url:
+            return None
+
+        url = self.api_url.format(uid=uid)
+        if site_url:
+            url = site_url(url)
+
+        self.checked += 1
+        try:
+            status, text = driver.execute_async_script(PROBE_SCRIPT, url, int(self.timeout * 1000))
+            exists = self.judge(status, text)
+        except Exception as e:
+            print(f"✗ 预检失败: {e}")
+            exists = None
+
+        if exists is None:
+            self.inconclusive += 1
+        elif not exists:
+            self.missing += 1
+        return exists
+
+    def judge(self, status, text):
+        """根据接口响应判断是否存在，响应不可信时返回None"""
+        if status != 200:
+            return None
+        try:
+            body = json.loads(text)
+        except ValueError:
+            return None
+        if not isinstance(body, dict):
+            return None
+        if NetworkCapture.lookup(body, self.exists_path):
+            return True
+        return False if self.is_success(body) else None
+
+    def is_success(self, body):
+        """响应是否带有成功标记，没有配置成功标记时总是视为不可信"""
+        if not self.valid_path:
+            return False
+        marker = NetworkCapture.lookup(body, self.valid_path)
+        if marker is None:
+            return False
+        return self.valid_values is None or marker in self.valid_values
+
+    def needs_verification(self):
+        """刚判定不存在的UID是否需要完整爬取核对"""
+        return self.verify_interval > 0 and (self.missing - 1) % self.verify_interval == 0
+
+    def disable(self, reason):
+        """预检结果与完整爬取不一致时停用，之后全部走完整爬取"""
+        self.disabled = True
+        print(f"✗ 停用存在性预检: {reason}")
+
+    def summary(self):
+        """预检统计"""
+        return {
+            'checked': self.checked,
+            'missing': self.missing,
+            'inconclusive': self.inconclusive,
+            'disabled': self.disabled
+        }
+
+
+def probe_from_config(config):
+    """按配置创建预检，未启用或未配置接口时返回None"""
+    probe_config = config.get('probe', {})
+    if not probe_config.get('enabled') or not probe_config.get('api_url'):
+        return None
+    if not probe_config.get('valid_path'):
+        print("未配置probe.valid_path成功标记，预检不会判定用户不存在")
+    return ExistenceProbe(probe_config)
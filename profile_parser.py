@@ -0,0 +1,357 @@
+"""
+玩家信息页面文本解析模块
+从个人信息页的渲染文本中提取玩家信息，不依赖浏览器，可用于离线重新解析
+"""
+
+import re
+
+
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'fieldset',
+    'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header',
+    'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'td', 'th', 'tr', 'ul'
+}
+
+
+# 保存页面源码时写在开头的页面URL（与浏览器"另存为"的注释格式一致）
+SAVED_URL_PATTERN = re.compile(r'<!-- saved from url=\(\d+\)(\S+) -->')
+CANONICAL_PATTERN = re.compile(
+    r'<(?:link|meta)\b[^>]*(?:rel=["\']canonical["\']|property=["\']og:url["\'])[^>]*>', re.I
+)
+# 个人信息页路由中的UID
+ROUTE_UID_PATTERN = re.compile(r'#/me/info\?(?:[^"\'\s<>]*&(?:amp;)?)?uuid=(\d+)')
+
+
+def saved_url_comment(url):
+    """保存页面源码时写在开头的URL注释"""
+    return f"<!-- saved from url=({len(url):04d}){url} -->\n"
+
+
+def page_uid_from_html(html):
+    """页面源码对应的UID
+
+    页面中可能链接了其他玩家，不按任意位置出现的uuid参数归属，依次使用：
+    保存时写入的URL注释、canonical链接或og:url、只指向一个UID的个人信息页路由。
+
+    Returns:
+        str: UID，无法确定时返回None
+    """
+    match = SAVED_URL_PATTERN.search(html, 0, 4096)
+    if match:
+        uid_match = re.search(r'uuid=(\d+)', match.group(1))
+        return uid_match.group(1) if uid_match else None
+    for tag in CANONICAL_PATTERN.findall(html):
+        uid_match = re.search(r'uuid=(\d+)', tag)
+        if uid_match:
+            return uid_match.group(1)
+    uids = set(ROUTE_UID_PATTERN.findall(html))
+    return uids.pop() if len(uids) == 1 else None
+
+
+def parse_html(html):
+    """解析页面源码并去掉不会渲染为文本的元素"""
+    from lxml import html as lxml_html
+
+    root = lxml_html.document_fromstring(html)
+    for element in root.xpath('//script|//style|//noscript|//template'):
+        element.drop_tree()
+    return root
+
+
+def element_to_lines(element):
+    """把lxml元素转换为与WebElement.text近似的文本行（块级元素和<br>处换行）"""
+    parts = []
+
+    def walk(node):
+        tag = node.tag if isinstance(node.tag, str) else ''
+        if tag in BLOCK_TAGS:
+            parts.append('\n')
+        if node.text and isinstance(node.tag, str):
+            parts.append(node.text)
+        for child in node:
+            walk(child)
+            if child.tail:
+                parts.append(child.tail)
+        if tag in BLOCK_TAGS:
+            parts.append('\n')
+
+    walk(element)
+    text = ''.join(parts)
+    return [line.strip() for line in text.split('\n') if line.strip()]
+
+
+def html_to_lines(html):
+    """把保存的页面源码转换为与body.text近似的文本行
+
+    块级元素和<br>处换行，用于离线重新解析page_source_*.html
+    """
+    root = parse_html(html)
+    body = root.find('body')
+    if body is None:
+        body = root
+    return element_to_lines(body)
+
+
+# 部队信息行：部队名称后跟尖括号中的部队简称，例如 "無我夢中 <MUGA>"、"部队名称：光之战士«LOS»"
+FC_PATTERN = re.compile(
+    r'^(?:部队名称[：:])?\s*(?P<name>[^<>＜＞«»：:]+?)\s*[<＜«]\s*(?P<tag>[^<>＜＞«»]{1,5}?)\s*[>＞»]$'
+)
+
+
+def parse_fc(line):
+    """识别部队信息行
+
+    Args:
+        line (str): 页面文本行
+
+    Returns:
+        tuple: (部队名称, 部队简称)；没有简称的"部队名称：xxx"行简称为None；不是部队信息时返回None
+    """
+    match = FC_PATTERN.match(line.strip())
+    if match:
+        return match.group('name'), match.group('tag')
+    if line.startswith("部队名称："):
+        name = line.split("：", 1)[1].strip()
+        return (name, None) if name else None
+    return None
+
+
+def body_text_to_lines(body_text):
+    """把body.text拆分为去除空白的文本行"""
+    return [line.strip() for line in body_text.split('\n') if line.strip()]
+
+
+def apply_url_fields(player_data, url):
+    """写入来自URL的字段：用户不存在时页面上没有UID，从URL中提取
+
+    这是解析结果中唯一依赖URL的部分，解析缓存命中时用它改写为当前页面的UID。
+    """
+    url_match = re.search(r'uuid=(\d+)', url)
+    if url_match:
+        player_data['uid'] = url_match.group(1)
+        player_data['error_message'] = f"UID {url_match.group(1)} 对应的用户不存在"
+
+
+def parse_profile_lines(lines, url):
+    """从个人信息页文本行中提取玩家信息
+
+    Args:
+        lines (list): 页面文本行
+        url (str): 页面URL，用户不存在时从中提取UID
+
+    Returns:
+        dict: player_data
+    """
+    player_data = {}
+    
+    # 提取玩家ID
+    player_data['player_id'] = None
+    player_data['user_exists'] = True  # 默认用户存在
+    
+    for i, line in enumerate(lines):
+        if line == "个人信息" and i + 1 < len(lines):
+            extracted_id = lines[i + 1]
+            player_data['player_id'] = extracted_id
+    
+            # 检测用户是否存在
+            if extracted_id == "盛趣游戏":
+                player_data['user_exists'] = False
+                player_data['error_message'] = "用户不存在"
+                apply_url_fields(player_data, url)
+    
+            break
+    
+    # 如果用户不存在，跳过其他信息的提取
+    if not player_data['user_exists']:
+        # 清空其他字段
+        player_data['create_time'] = None
+        player_data['last_login'] = None
+        player_data['total_playtime'] = None
+        player_data['recent_activity'] = None
+        player_data['recent_activity_time'] = None
+        player_data['race_gender'] = None
+        player_data['fc_name'] = None
+        player_data['fc_tag'] = None
+        player_data['housing_info'] = None
+        player_data['level_info'] = None
+    else:
+        # 用户存在时才提取详细信息
+    
+        # 提取UID
+        player_data['uid'] = None
+        for line in lines:
+            if line.startswith("UID:"):
+                player_data['uid'] = line.replace("UID:", "").strip()
+                break
+    
+        # 提取创角时间
+        player_data['create_time'] = None
+        for i, line in enumerate(lines):
+            if "创角时间" in line:
+                if "：" in line:
+                    player_data['create_time'] = line.split("：")[1].strip()
+                elif i + 1 < len(lines):
+                    # 查找下一行是否是日期格式
+                    next_line = lines[i + 1]
+                    if re.match(r'\d{4}-\d{2}-\d{2}', next_line):
+                        player_data['create_time'] = next_line
+                    # 有时候创角时间可能在前面
+                    elif i > 0 and re.match(r'\d{4}-\d{2}-\d{2}', lines[i - 1]):
+                        player_data['create_time'] = lines[i - 1]
+                break
+    
+        # 提取最近登录时间
+        player_data['last_login'] = None
+        for i, line in enumerate(lines):
+            if "最近登录时间" in line or "最近登陆时间" in line:
+                if "：" in line:
+                    login_time = line.split("：")[1].strip()
+                    player_data['last_login'] = login_time if login_time else "*已屏蔽*"
+                elif i + 1 < len(lines):
+                    login_time = lines[i + 1].strip()
+                    player_data['last_login'] = login_time if login_time else "*已屏蔽*"
+                break
+    
+        # 提取累计游戏时长
+        player_data['total_playtime'] = None
+        for i, line in enumerate(lines):
+            if "累计游戏时长" in line:
+                if "：" in line:
+                    player_data['total_playtime'] = line.split("：")[1].strip()
+                else:
+                    # 查找包含时长信息的行
+                    for j in range(max(0, i - 2), min(i + 3, len(lines))):
+                        if "天" in lines[j] and ("小时" in lines[j] or "分钟" in lines[j]):
+                            player_data['total_playtime'] = lines[j]
+                            break
+                break
+    
+        # 提取游戏近况
+        player_data['recent_activity'] = None
+        player_data['recent_activity_time'] = None
+    
+        for i, line in enumerate(lines):
+            if "游戏近况" in line:
+                # 查找后续的活动信息
+                for j in range(i + 1, min(i + 5, len(lines))):
+                    if lines[j] and not lines[j] in ["游戏近况", "TA的帖子", "TA的动态"]:
+                        # 检查是否是时间格式
+                        if re.match(r'\d{4}-\d{2}-\d{2}', lines[j]):
+                            player_data['recent_activity_time'] = lines[j]
+                        else:
+                            player_data['recent_activity'] = lines[j]
+    
+                        # 如果找到了活动描述，继续查找时间
+                        if player_data['recent_activity'] and not player_data['recent_activity_time']:
+                            for k in range(j + 1, min(j + 3, len(lines))):
+                                if re.match(r'\d{4}-\d{2}-\d{2}', lines[k]):
+                                    player_data['recent_activity_time'] = lines[k]
+                                    break
+                        break
+                break
+    
+        # 如果游戏近况为空，标记为空
+        if not player_data['recent_activity']:
+            player_data['recent_activity'] = "无近期活动"
+    
+        # 提取其他角色信息 - 使用更精确的匹配
+        player_data['race_gender'] = None
+        player_data['fc_name'] = None
+        player_data['fc_tag'] = None
+        player_data['housing_info'] = None
+    
+        # 查找包含"敖龙族"等种族信息的行
+        for line in lines:
+            if any(race in line for race in ["敖龙族", "猫魅族", "拉拉菲尔", "鲁加丁", "精灵族", "人族"]):
+                if "种族性别：" in line:
+                    player_data['race_gender'] = line.split("：")[1].strip()
+                else:
+                    player_data['race_gender'] = line.strip()
+                break
+    
+        # 查找部队信息 - 部队名称后跟尖括号中的部队简称
+        for line in lines:
+            fc = parse_fc(line)
+            if fc:
+                if "部队名称：" in line:
+                    player_data['fc_name'] = line.split("：", 1)[1].strip()
+                else:
+                    player_data['fc_name'] = line.strip()
+                player_data['fc_tag'] = fc[1]
+                break
+    
+        # 查找房屋信息
+        for line in lines:
+            if "高脚孤丘" in line or "薰衣草苗圃" in line or any(area in line for area in ["M", "S", "L"]):
+                if "房屋信息：" in line:
+                    player_data['housing_info'] = line.split("：")[1].strip()
+                elif line.strip() and len(line.strip()) < 20:  # 避免过长的文本
+                    player_data['housing_info'] = line.strip()
+                break
+    
+        # 提取等级信息（如果有的话）
+        level_info = []
+        for line in lines:
+            if "LV" in line and "冒险者" in line:
+                level_info.append(line)
+    
+        if level_info:
+            player_data['level_info'] = level_info
+    
+    return player_data
+
+
+def reparse_html_file(path, selector_engine=None, cache=None):
+    """重新解析保存的页面源码文件
+
+    Args:
+        path (str): 页面源码文件
+        selector_engine: 可选的SelectorEngine，提供时同时按配置的选择器提取字段
+        cache: 可选的ParseCache，源码规范化后与以前解析过的页面相同时不再解析
+
+    Returns:
+        dict: 与extract_player_info结构一致的player_info
+    """
+    import os
+    import json
+    from datetime import datetime
+    from records import PROFILE_URL_TEMPLATE
+
+    with open(path, 'r', encoding='utf-8') as f:
+        html = f.read()
+
+    # 源码中不一定包含当前路由，存在的用户以解析出的UID为准，不存在的用户只能用源码对应页面的UID
+    page_uid = page_uid_from_html(html)
+    url = PROFILE_URL_TEMPLATE.format(uid=page_uid) if page_uid else ''
+    title_match = re.search(r'<title[^>]*>(.*?)</title>', html, re.S | re.I)
+
+    key = None
+    player_data = None
+    if cache is not None:
+        from parse_cache import html_key, patch_url_fields
+
+        # 选择器字段也缓存在player_data中，选择器配置不同时结果分开缓存
+        variant = json.dumps(selector_engine.selector_config, sort_keys=True) if selector_engine else ''
+        key = html_key(html, variant)
+        player_data = cache.get(key)
+        if player_data is not None:
+            patch_url_fields(player_data, url)
+
+    if player_data is None:
+        root = parse_html(html)
+        body = root.find('body')
+        player_data = parse_profile_lines(element_to_lines(root if body is None else body), url)
+        if selector_engine and player_data['user_exists']:
+            player_data['selector_fields'] = selector_engine.extract_tree(root)
+        if cache is not None:
+            cache.put(key, player_data)
+    if player_data['user_exists'] and player_data.get('uid'):
+        url = PROFILE_URL_TEMPLATE.format(uid=player_data['uid'])
+
+    return {
+        'url': url,
+        'title': title_match.group(1).strip() if title_match else None,
+        'timestamp': datetime.fromtimestamp(os.path.getmtime(path)).isoformat(),
+        'player_data': player_data,
+        'html_file': os.path.basename(path)
+    }
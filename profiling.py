@@ -0,0 +1,113 @@
+"""
+性能分析模块
+按需用cProfile和tracemalloc包裹一次爬取或重新解析运行，结束后把CPU耗时分布和
+内存分配最多的代码位置写入 output/，关闭时不引入任何额外开销
+"""
+
+import os
+import io
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class MemorySampler:
+    """后台线程定期采样tracemalloc的当前和峰值内存，得到运行过程中的内存曲线"""
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.samples = []
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.started = time.time()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            current, peak = tracemalloc.get_traced_memory()
+            self.samples.append((round(time.time() - self.started, 1), current, peak))
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+
+def format_report(name, profiler, snapshot, sampler, elapsed, top):
+    """生成文本报告：耗时最多的函数、分配最多的代码位置和内存曲线"""
+    out = io.StringIO()
+    out.write(f"性能分析报告: {name}\n")
+    out.write(f"总耗时: {elapsed:.2f} 秒\n")
+    current, peak = tracemalloc.get_traced_memory()
+    out.write(f"结束时内存: {current / 1024 / 1024:.1f} MB，峰值: {peak / 1024 / 1024:.1f} MB\n")
+
+    out.write(f"\n=== CPU: 累计耗时最多的 {top} 个函数（仅主线程）===\n")
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats('cumulative').print_stats(top)
+
+    out.write(f"\n=== CPU: 自身耗时最多的 {top} 个函数 ===\n")
+    stats.sort_stats('tottime').print_stats(top)
+
+    out.write(f"\n=== 内存: 分配最多的 {top} 个代码位置（结束时仍存活）===\n")
+    for stat in snapshot.statistics('lineno')[:top]:
+        frame = stat.traceback[0]
+        out.write(f"{stat.size / 1024:10.1f} KB {stat.count:8d} 块  {frame.filename}:{frame.lineno}\n")
+
+    if sampler.samples:
+        out.write("\n=== 内存曲线（秒, 当前MB, 峰值MB）===\n")
+        step = max(1, len(sampler.samples) // 50)
+        for seconds, sample_current, sample_peak in sampler.samples[::step]:
+            out.write(f"{seconds:8.1f} {sample_current / 1024 / 1024:8.1f} {sample_peak / 1024 / 1024:8.1f}\n")
+
+    return out.getvalue()
+
+
+@contextmanager
+def profile_run(name, output_dir='output', top=30, frames=5, sample_interval=1.0):
+    """用cProfile和tracemalloc包裹一次运行
+
+    结束时写出:
+        output/profile_{name}_{时间戳}.prof  cProfile原始数据，可用snakeviz、pstats等工具查看
+        output/profile_{name}_{时间戳}.txt   文本报告
+
+    Args:
+        name (str): 运行名称，用于文件名
+        output_dir (str): 输出目录
+        top (int): 报告中列出的函数和代码位置数
+        frames (int): tracemalloc记录的调用栈深度
+        sample_interval (float): 内存曲线的采样间隔（秒）
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base = os.path.join(output_dir, f"profile_{name}_{timestamp}")
+
+    tracemalloc.start(frames)
+    sampler = MemorySampler(sample_interval)
+    sampler.start()
+    profiler = cProfile.Profile()
+    start = time.time()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        elapsed = time.time() - start
+        sampler.stop()
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ])
+
+        try:
+            profiler.dump_stats(base + '.prof')
+            with open(base + '.txt', 'w', encoding='utf-8') as f:
+                f.write(format_report(name, profiler, snapshot, sampler, elapsed, top))
+            print(f"✓ 性能分析结果已保存: {base}.prof, {base}.txt")
+        except Exception as e:
+            print(f"✗ 保存性能分析结果失败: {e}")
+        finally:
+            tracemalloc.stop()
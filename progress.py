@@ -0,0 +1,206 @@
+"""
+爬取进度模块
+运行中的爬取持续更新状态：滚动窗口内的UID/秒、各阶段耗时的p50/p95、存活用户命中率、
+按类型统计的失败数以及到计划区间末尾的预计剩余时间。
+状态定期原子地写入JSON文件，也可以通过本地HTTP端口查询
+"""
+
+import os
+import json
+import time
+import threading
+from collections import deque, Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def percentile(values, fraction):
+    """已排序列表的分位数（最近秩法）"""
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+class ProgressTracker:
+    """爬取进度统计，记录由爬取线程调用，读取可以来自HTTP线程"""
+
+    def __init__(self, status_file='output/crawl_status.json', window=60, write_interval=2,
+                 port=None, samples=500):
+        """初始化进度统计
+
+        Args:
+            status_file (str): 状态文件路径，None表示不写文件
+            window (float): 计算滚动速率的时间窗口（秒）
+            write_interval (float): 状态文件的最短重写间隔（秒）
+            port (int): HTTP端口，None或0表示不启动
+            samples (int): 每个阶段保留的最近耗时样本数
+        """
+        self.status_file = status_file
+        self.window = window
+        self.write_interval = write_interval
+        self.samples = samples
+
+        self.started = time.time()
+        self.completed = deque()
+        self.latencies = {}
+        self.outcomes = Counter()
+        self.failures = Counter()
+        self.total = 0
+        self.current_uid = None
+        self.last_completed = None
+        self.last_written = 0.0
+        # 返回剩余UID数的函数，由调用方按调度方式提供；None表示没有计划终点
+        self.remaining_fn = None
+        self.state = 'running'
+        self.lock = threading.Lock()
+
+        self.server = None
+        if port:
+            self.start_server(port)
+
+    def start_server(self, port, host='127.0.0.1'):
+        """在后台线程中启动状态查询端口（GET任意路径返回状态JSON）"""
+        tracker = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(tracker.snapshot(), ensure_ascii=False, indent=2).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"✓ 爬取状态: http://{host}:{self.server.server_address[1]}/")
+
+    def start_uid(self, uid):
+        """开始爬取一个UID"""
+        self.current_uid = uid
+
+    def record(self, uid, outcome, timings=None):
+        """记录一个UID的结果
+
+        Args:
+            uid (int): UID
+            outcome (str): live 用户存在；missing 用户不存在；其他值视为失败类型（timeout、login、error等）
+            timings (dict): 阶段名 -> 耗时秒数
+        """
+        now = time.time()
+        with self.lock:
+            self.total += 1
+            self.outcomes[outcome] += 1
+            if outcome not in ('live', 'missing'):
+                self.failures[outcome] += 1
+            self.completed.append(now)
+            self.last_completed = now
+            for stage, elapsed in (timings or {}).items():
+                stage_samples = self.latencies.get(stage)
+                if stage_samples is None:
+                    stage_samples = self.latencies[stage] = deque(maxlen=self.samples)
+                stage_samples.append(elapsed)
+
+        if now - self.last_written >= self.write_interval:
+            self.write()
+
+    def rate(self, now=None):
+        """滚动窗口内的UID/秒"""
+        now = now or time.time()
+        while self.completed and now - self.completed[0] > self.window:
+            self.completed.popleft()
+        span = min(self.window, now - self.started)
+        return len(self.completed) / span if span > 0 else 0.0
+
+    def snapshot(self):
+        """当前状态"""
+        now = time.time()
+        with self.lock:
+            rate = self.rate(now)
+            live = self.outcomes['live']
+            checked = live + self.outcomes['missing']
+            stages = {}
+            for stage, stage_samples in self.latencies.items():
+                ordered = sorted(stage_samples)
+                stages[stage] = {
+                    'p50': round(percentile(ordered, 0.5), 3),
+                    'p95': round(percentile(ordered, 0.95), 3),
+                }
+            remaining = self.remaining_fn() if self.remaining_fn else None
+
+            return {
+                'state': self.state,
+                'updated_at': datetime.now().isoformat(),
+                'elapsed_seconds': round(now - self.started, 1),
+                'current_uid': self.current_uid,
+                'processed': self.total,
+                'uids_per_second': round(rate, 3),
+                'latency_seconds': stages,
+                'live_users': live,
+                'hit_rate': round(live / checked, 4) if checked else None,
+                'failures': dict(self.failures),
+                'remaining_uids': remaining,
+                'eta_seconds': round(remaining / rate) if remaining is not None and rate > 0 else None,
+                # 距离上一个UID完成的秒数，长时间没有进展说明worker卡住
+                'idle_seconds': round(now - self.last_completed, 1) if self.last_completed else None,
+            }
+
+    def summary_line(self):
+        """单行进度，用于控制台输出"""
+        status = self.snapshot()
+        total_latency = status['latency_seconds'].get('total', {})
+        parts = [
+            f"[进度] 已处理 {status['processed']}",
+            f"{status['uids_per_second']:.2f} UID/s",
+            f"耗时 p50 {total_latency.get('p50', '-')}s p95 {total_latency.get('p95', '-')}s",
+        ]
+        if status['hit_rate'] is not None:
+            parts.append(f"命中率 {status['hit_rate'] * 100:.1f}%")
+        parts.append(f"失败 {sum(status['failures'].values())}")
+        if status['eta_seconds'] is not None:
+            parts.append(f"预计剩余 {status['eta_seconds'] // 60}分{status['eta_seconds'] % 60}秒")
+        return ' | '.join(parts)
+
+    def write(self):
+        """原子地重写状态文件（先写临时文件再替换）"""
+        self.last_written = time.time()
+        if not self.status_file:
+            return
+        try:
+            temp_file = self.status_file + '.tmp'
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+            os.replace(temp_file, self.status_file)
+        except Exception as e:
+            print(f"✗ 写入状态文件失败: {e}")
+
+    def close(self, state=None):
+        """写入最终状态并关闭HTTP端口
+
+        Args:
+            state (str): 最终状态，默认在仍为running时记为finished
+        """
+        if state is not None:
+            self.state = state
+        elif self.state == 'running':
+            self.state = 'finished'
+        self.write()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def tracker_from_config(progress_config):
+    """按配置中的progress配置段创建进度统计"""
+    return ProgressTracker(
+        status_file=progress_config.get('status_file', 'output/crawl_status.json'),
+        window=progress_config.get('window', 60),
+        write_interval=progress_config.get('write_interval', 2),
+        port=progress_config.get('port')
+    )
@@ -0,0 +1,333 @@
+"""
+紧凑结果记录模块
+用__slots__记录替代完整的player_info字典，并提供有界内存窗口和磁盘溢出存储
+"""
+
+import os
+import re
+import sys
+import json
+from collections import deque
+from datetime import datetime
+
+PROFILE_URL_TEMPLATE = "https://ff14risingstones.web.sdo.com/pc/index.html#/me/info?uuid={uid}"
+
+# player_data中的文本字段
+TEXT_FIELDS = (
+    'player_id', 'create_time', 'last_login', 'total_playtime', 'recent_activity',
+    'recent_activity_time', 'race_gender', 'fc_name', 'housing_info'
+)
+
+# 大多数记录没有的附加字段，保存在extra中
+EXTRA_FIELDS = ('selector_fields', 'fc_tag', 'fc_id')
+
+# 由固定字段表示或有意不保存（临时HTML文件名）的键，其余键原样保存在extra中
+KNOWN_INFO_KEYS = {'url', 'title', 'timestamp', 'player_data', 'source', 'html_file'}
+KNOWN_DATA_KEYS = {'uid', 'user_exists', 'error_message', 'level_info'} | set(TEXT_FIELDS) | set(EXTRA_FIELDS)
+
+# 取值集合很小、大量重复的字段，驻留后所有记录共享同一个字符串对象
+INTERNED_FIELDS = ('last_login', 'recent_activity', 'race_gender', 'fc_name', 'housing_info')
+
+
+def intern_text(value):
+    """驻留字符串，非字符串原样返回"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def parse_timestamp(value):
+    """ISO时间字符串转为epoch秒"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class PlayerRecord:
+    """单个UID的紧凑爬取记录
+
+    与player_info相比不保存URL（可由UID生成）和临时HTML文件名，
+    时间戳保存为epoch秒，重复出现的枚举类字段使用驻留字符串。
+    """
+
+    __slots__ = ('uid', 'user_exists', 'timestamp', 'title', 'level_info', 'extra') + TEXT_FIELDS
+
+    def __init__(self, uid, user_exists, timestamp=None, title=None, level_info=None, extra=None, **fields):
+        self.uid = uid
+        self.user_exists = user_exists
+        self.timestamp = timestamp
+        self.title = intern_text(title)
+        self.level_info = tuple(level_info) if level_info else None
+        # 无法用固定字段表示的内容（非标准URL、接口来源等），大多数记录为None
+        self.extra = extra or None
+        for field in TEXT_FIELDS:
+            value = fields.get(field)
+            setattr(self, field, intern_text(value) if field in INTERNED_FIELDS else value)
+
+    @classmethod
+    def from_player_info(cls, player_info):
+        """由extract_player_info返回的字典构造记录"""
+        player_data = player_info.get('player_data', {})
+        url = player_info.get('url', '')
+        extra = {}
+
+        url_match = re.search(r'uuid=(\d+)', url)
+        data_uid = player_data.get('uid')
+        if url_match:
+            uid = int(url_match.group(1))
+        elif data_uid is not None and str(data_uid).isdigit():
+            uid = int(data_uid)
+        else:
+            uid = None
+
+        if url != PROFILE_URL_TEMPLATE.format(uid=uid):
+            extra['url'] = url
+        if data_uid is None or str(data_uid) != str(uid):
+            extra['data_uid'] = data_uid
+        if player_info.get('source'):
+            extra['source'] = player_info['source']
+        for field in EXTRA_FIELDS:
+            if player_data.get(field):
+                extra[field] = player_data[field]
+        # 其他来源（接口捕获的字段映射、以后新增的字段）的键原样保留，不在记录转换中丢失
+        data_fields = {key: value for key, value in player_data.items() if key not in KNOWN_DATA_KEYS}
+        if data_fields:
+            extra['data_fields'] = data_fields
+        info_fields = {key: value for key, value in player_info.items() if key not in KNOWN_INFO_KEYS}
+        if info_fields:
+            extra['info_fields'] = info_fields
+
+        user_exists = player_data.get('user_exists', True)
+        error_message = player_data.get('error_message')
+        if error_message and error_message != cls.default_error_message(uid, url_match is not None):
+            extra['error_message'] = error_message
+
+        return cls(
+            uid=uid,
+            user_exists=user_exists,
+            timestamp=parse_timestamp(player_info.get('timestamp')),
+            title=player_info.get('title'),
+            level_info=player_data.get('level_info'),
+            extra=extra,
+            **{field: player_data.get(field) for field in TEXT_FIELDS}
+        )
+
+    @staticmethod
+    def default_error_message(uid, from_url=True):
+        """用户不存在时extract_player_info生成的错误信息"""
+        return f"UID {uid} 对应的用户不存在" if from_url else "用户不存在"
+
+    def to_player_info(self):
+        """还原为player_info字典结构，用于JSON输出"""
+        extra = self.extra or {}
+        url = extra.get('url', PROFILE_URL_TEMPLATE.format(uid=self.uid))
+
+        player_data = {
+            'player_id': self.player_id,
+            'user_exists': self.user_exists,
+            'uid': extra['data_uid'] if 'data_uid' in extra else str(self.uid)
+        }
+        if not self.user_exists:
+            player_data['error_message'] = extra.get(
+                'error_message', self.default_error_message(self.uid, 'url' not in extra)
+            )
+        for field in TEXT_FIELDS[1:]:
+            player_data[field] = getattr(self, field)
+        player_data['level_info'] = list(self.level_info) if self.level_info else None
+        for field in EXTRA_FIELDS:
+            if field in extra:
+                player_data[field] = extra[field]
+        player_data.update(extra.get('data_fields', {}))
+
+        player_info = {
+            'url': url,
+            'title': self.title,
+            'timestamp': datetime.fromtimestamp(self.timestamp).isoformat() if self.timestamp is not None else None,
+            'player_data': player_data
+        }
+        if 'source' in extra:
+            player_info['source'] = extra['source']
+        player_info.update(extra.get('info_fields', {}))
+        return player_info
+
+
+class ResultStore:
+    """有界内存的结果存储
+
+    最近的记录保存在内存窗口中，窗口写满后整体追加到JSON Lines溢出文件，
+    因此内存占用只与窗口大小有关，与爬取总量无关。
+    """
+
+    def __init__(self, spill_file, window_size=1000):
+        """初始化结果存储
+
+        Args:
+            spill_file (str): 溢出文件路径
+            window_size (int): 内存窗口最多保存的记录数
+        """
+        self.spill_file = spill_file
+        self.window_size = window_size
+        self.window = deque()
+        self.spilled_count = 0
+
+    def __len__(self):
+        return self.spilled_count + len(self.window)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def append(self, record):
+        """追加一条记录，窗口写满时溢出到磁盘"""
+        self.window.append(record)
+        if len(self.window) >= self.window_size:
+            self.spill()
+
+    def spill(self):
+        """把内存窗口中的记录全部写入溢出文件"""
+        if not self.window:
+            return
+        with open(self.spill_file, 'a', encoding='utf-8') as f:
+            while self.window:
+                record = self.window.popleft()
+                f.write(json.dumps(record.to_player_info(), ensure_ascii=False))
+                f.write('\n')
+                self.spilled_count += 1
+
+    def iter_player_infos(self):
+        """按写入顺序遍历全部记录（player_info字典形式）"""
+        if self.spilled_count:
+            with open(self.spill_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        for record in list(self.window):
+            yield record.to_player_info()
+
+    def close(self):
+        """删除溢出文件并清空窗口"""
+        self.window.clear()
+        self.spilled_count = 0
+        if os.path.exists(self.spill_file):
+            os.remove(self.spill_file)
+
+
+def dump_summary(filename, crawl_info, player_infos):
+    """以 {"crawl_info": ..., "results": [...]} 结构流式写出结果文件
+
+    与json.dump(summary, indent=2)的输出格式一致，但逐条写出结果，不需要先在内存中构造完整列表。
+    """
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write('{\n  "crawl_info": ')
+        f.write(json.dumps(crawl_info, ensure_ascii=False, indent=2).replace('\n', '\n  '))
+        f.write(',\n  "results": [')
+        first = True
+        for player_info in player_infos:
+            f.write('\n    ' if first else ',\n    ')
+            f.write(json.dumps(player_info, ensure_ascii=False, indent=2).replace('\n', '\n    '))
+            first = False
+        f.write('\n  ]\n}' if not first else ']\n}')
+
+
+def iter_json_results(f, chunk_size=65536):
+    """逐条读取JSON结果文件中的结果，内存占用与单条结果大小成正比
+
+    文件可以是结果列表，也可以是含results字段的汇总（dump_summary写出的结构），
+    按块读取文件，用JSONDecoder.raw_decode逐个解析列表元素，不把整个文件读入内存。
+
+    Args:
+        f: 以文本模式打开的文件
+        chunk_size (int): 每次读取的字符数
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = '', 0, False
+
+    def read_more():
+        nonlocal buf, pos, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    def peek():
+        """跳过空白，返回下一个字符，文件结束时返回空字符串"""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n':
+                pos += 1
+            if pos < len(buf) or eof:
+                return buf[pos:pos + 1]
+            read_more()
+
+    def expect(chars):
+        nonlocal pos
+        char = peek()
+        if not char or char not in chars:
+            raise ValueError(f"JSON格式错误: 应为 {' 或 '.join(chars)}，实际为 {char or '文件结尾'}")
+        pos += 1
+        return char
+
+    def next_value():
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+                # 值正好在缓冲区末尾时可能被截断（例如数字），读入更多内容后重新解析
+                if end < len(buf) or eof:
+                    pos = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            read_more()
+
+    def iter_array():
+        expect('[')
+        if peek() == ']':
+            expect(']')
+            return
+        while True:
+            yield next_value()
+            if expect(',]') == ']':
+                return
+
+    if peek() == '[':
+        yield from iter_array()
+        return
+
+    expect('{')
+    if peek() == '}':
+        return
+    while True:
+        key = next_value()
+        expect(':')
+        if key == 'results' and peek() == '[':
+            yield from iter_array()
+        else:
+            next_value()
+        if expect(',}') == '}':
+            return
+
+
+def iter_player_infos(path):
+    """逐条读取结果文件中的player_info
+
+    支持 spider_results_*.json（列表）、batch_results_*.json（含results字段的汇总）、
+    .jsonl 溢出文件（每行一条）以及 .ffr 二进制结果文件，都不需要把整个文件读入内存。
+    """
+    if path.endswith('.ffr'):
+        from serializers import iter_binary
+        yield from iter_binary(path)
+        return
+
+    if path.endswith('.jsonl'):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from iter_json_results(f)
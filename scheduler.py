@@ -0,0 +1,223 @@
+"""
+UID空间调度模块
+先对UID空间抽样估计每个区块的存活用户密度，再按密度排序、划分分片：
+密集区块优先并分配更多worker，稀疏区块先粗粒度探测，发现存活用户后再细化
+"""
+
+import threading
+from collections import deque
+
+
+class Shard:
+    """UID分片：按固定步长遍历 [start, end] 区间"""
+
+    __slots__ = ('start', 'end', 'step', 'density', 'cursor', 'assigned', 'coarse')
+
+    def __init__(self, start, end, density, step=1, coarse=False):
+        self.start = start
+        self.end = end
+        self.step = step
+        self.density = density
+        self.cursor = start
+        self.assigned = 0
+        self.coarse = coarse
+
+    def remaining(self):
+        """剩余待调度的UID数"""
+        if self.cursor > self.end:
+            return 0
+        return (self.end - self.cursor) // self.step + 1
+
+    def weight(self):
+        """分配worker的权重：预计剩余存活用户数"""
+        return self.density * self.remaining()
+
+
+class DensityScheduler:
+    """按存活密度调度UID的调度器
+
+    使用方式：worker循环调用 next_uid(worker_id) 获取UID，爬取后调用 report(uid, exists) 反馈结果。
+    调度分两个阶段：先在每个区块内均匀抽样，抽样全部完成后生成分片计划。
+    """
+
+    def __init__(self, start_uid, end_uid, block_size=1000, samples_per_block=5,
+                 coarse_step=50, sparse_threshold=0.2, workers=1):
+        """初始化调度器
+
+        Args:
+            start_uid (int): 起始UID
+            end_uid (int): 结束UID（包含）
+            block_size (int): 估计密度的区块大小
+            samples_per_block (int): 每个区块的抽样数
+            coarse_step (int): 稀疏区块粗探测的步长
+            sparse_threshold (float): 估计密度低于该值的区块视为稀疏
+            workers (int): worker总数，用于分配每个分片的worker数
+        """
+        self.start_uid = start_uid
+        self.end_uid = end_uid
+        self.block_size = block_size
+        self.samples_per_block = samples_per_block
+        self.coarse_step = coarse_step
+        self.sparse_threshold = sparse_threshold
+        self.workers = workers
+
+        # 已调度UID的位图，每个UID占1位
+        self.visited = bytearray((end_uid - start_uid) // 8 + 1)
+        self.lock = threading.Lock()
+
+        block_count = (end_uid - start_uid) // block_size + 1
+        self.block_sampled = [0] * block_count
+        self.block_hits = [0] * block_count
+
+        self.samples = deque(self.sample_uids())
+        self.shards = None
+        self.worker_shards = {}
+        # 区块下标 -> 粗探测分片，用于在发现存活用户时定位需要细化的分片
+        self.coarse_shards = {}
+
+    def sample_uids(self):
+        """每个区块内均匀分布的抽样UID"""
+        uids = []
+        for block_start in range(self.start_uid, self.end_uid + 1, self.block_size):
+            block_end = min(block_start + self.block_size - 1, self.end_uid)
+            span = block_end - block_start + 1
+            count = min(self.samples_per_block, span)
+            for i in range(count):
+                uids.append(block_start + (2 * i + 1) * span // (2 * count))
+        return uids
+
+    def block_index(self, uid):
+        """UID所在区块的下标"""
+        return (uid - self.start_uid) // self.block_size
+
+    def mark(self, uid):
+        """标记UID已调度，之前已调度过返回False"""
+        offset = uid - self.start_uid
+        byte, bit = offset >> 3, 1 << (offset & 7)
+        if self.visited[byte] & bit:
+            return False
+        self.visited[byte] |= bit
+        return True
+
+    def block_density(self, index):
+        """区块存活密度估计（拉普拉斯平滑，未抽样的区块为0.5）"""
+        return (self.block_hits[index] + 1) / (self.block_sampled[index] + 2)
+
+    def block_plan(self, index):
+        """按当前抽样结果生成区块的分片（不修改调度状态）"""
+        start = self.start_uid + index * self.block_size
+        end = min(start + self.block_size - 1, self.end_uid)
+        density = self.block_density(index)
+        if self.block_hits[index] == 0 and density < self.sparse_threshold:
+            return Shard(start, end, density, step=self.coarse_step, coarse=True)
+        return Shard(start, end, density)
+
+    def build_plan(self):
+        """根据抽样结果生成分片，密集区块在前"""
+        shards = []
+        for index in range(len(self.block_sampled)):
+            shard = self.block_plan(index)
+            if shard.coarse:
+                self.coarse_shards[index] = shard
+            shards.append(shard)
+        shards.sort(key=lambda shard: -shard.density)
+        return shards
+
+    def remaining(self):
+        """预计还要调度的UID数；抽样阶段按当前抽样结果估计分片计划"""
+        with self.lock:
+            if self.shards is None:
+                shards = [self.block_plan(index) for index in range(len(self.block_sampled))]
+            else:
+                shards = self.shards
+            return len(self.samples) + sum(shard.remaining() for shard in shards)
+
+    def allocation(self):
+        """按权重分配worker后的计划，用于打印和状态展示"""
+        with self.lock:
+            if self.shards is not None:
+                shards = self.shards
+            else:
+                shards = sorted((self.block_plan(index) for index in range(len(self.block_sampled))),
+                                key=lambda shard: -shard.density)
+            total = sum(shard.weight() for shard in shards) or 1
+            return [
+                {
+                    'start': shard.start,
+                    'end': shard.end,
+                    'density': round(shard.density, 3),
+                    'mode': 'coarse' if shard.coarse else 'full',
+                    'workers': max(1, round(self.workers * shard.weight() / total)) if shard.remaining() else 0,
+                }
+                for shard in shards
+            ]
+
+    def assign_shard(self, worker_id):
+        """为worker分配分片：选择 权重/(已分配worker数+1) 最大的分片"""
+        previous = self.worker_shards.pop(worker_id, None)
+        if previous is not None:
+            previous.assigned -= 1
+
+        best = None
+        best_score = 0
+        for shard in self.shards:
+            if not shard.remaining():
+                continue
+            score = shard.weight() / (shard.assigned + 1)
+            if best is None or score > best_score:
+                best, best_score = shard, score
+
+        if best is not None:
+            best.assigned += 1
+            self.worker_shards[worker_id] = best
+        return best
+
+    def next_uid(self, worker_id=0):
+        """获取下一个要爬取的UID，全部调度完时返回None"""
+        with self.lock:
+            while self.samples:
+                uid = self.samples.popleft()
+                if self.mark(uid):
+                    return uid
+
+            if self.shards is None:
+                self.shards = self.build_plan()
+                # 抽样结束后所有worker重新分配
+                self.worker_shards.clear()
+
+            while True:
+                shard = self.worker_shards.get(worker_id)
+                if shard is None or not shard.remaining():
+                    shard = self.assign_shard(worker_id)
+                    if shard is None:
+                        return None
+
+                uid = shard.cursor
+                shard.cursor += shard.step
+                if self.mark(uid):
+                    return uid
+
+    def report(self, uid, exists):
+        """反馈UID是否存在；exists为None表示请求失败，不参与密度估计"""
+        if exists is None:
+            return
+
+        with self.lock:
+            index = self.block_index(uid)
+            self.block_sampled[index] += 1
+            if exists:
+                self.block_hits[index] += 1
+
+            shard = self.coarse_shards.get(index)
+            if not exists or self.shards is None or shard is None:
+                return
+
+            # 稀疏区块中发现存活用户时，细化扫描其附近的UID
+            refine_start = max(shard.start, uid - self.coarse_step + 1)
+            refine_end = min(shard.end, uid + self.coarse_step - 1)
+            self.shards.insert(0, Shard(refine_start, refine_end, self.block_density(index)))
+            print(f"✓ 稀疏区块 {shard.start}-{shard.end} 发现存活用户 {uid}，细化扫描 {refine_start}-{refine_end}")
+
+            # 正在粗探测该区块的worker重新分配，优先处理细化分片
+            for worker_id in [w for w, s in self.worker_shards.items() if s is shard]:
+                self.worker_shards.pop(worker_id).assigned -= 1
@@ -0,0 +1,214 @@
+"""
+结果压实模块
+把output/中相互重叠的结果文件合并，按UID去重（保留最近一次爬取），
+写成按UID排序的JSON Lines分段文件和稀疏偏移索引：查询单个UID时二分定位分段和偏移，
+通过mmap一次定位后只扫描索引间隔内的几行
+"""
+
+import os
+import re
+import json
+import mmap
+import bisect
+from datetime import datetime
+
+from records import PlayerRecord, iter_player_infos
+
+INDEX_FILE = 'index.json'
+SEGMENT_FILE_PATTERN = re.compile(r'^segment_\d+_\d+(?:_g\d+)?\.jsonl$')
+
+# 分段中每行以url字段开头，扫描时直接从url中取UID，只解析命中的那一行
+LINE_UID_PATTERN = re.compile(rb'^\{"url": "[^"]*uuid=(\d+)"')
+
+
+def load_index(segment_dir):
+    """读取分段索引，目录不存在或没有索引时返回空索引"""
+    path = os.path.join(segment_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return {'segments': []}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def collect_latest(paths, existing_paths=()):
+    """读取结果文件，按UID保留最近一次爬取的记录
+
+    Returns:
+        tuple: (uid -> PlayerRecord, 读取的记录数, 跳过的无UID记录数)
+    """
+    latest = {}
+    read = skipped = 0
+    # 已有分段先读，时间戳相同时新文件覆盖旧分段
+    for path in list(existing_paths) + list(paths):
+        for player_info in iter_player_infos(path):
+            read += 1
+            record = PlayerRecord.from_player_info(player_info)
+            if record.uid is None:
+                skipped += 1
+                continue
+            previous = latest.get(record.uid)
+            if previous is None or (record.timestamp or 0) >= (previous.timestamp or 0):
+                latest[record.uid] = record
+    return latest, read, skipped
+
+
+def write_segments(records, segment_dir, segment_size=100000, index_interval=64, generation=1):
+    """把按UID排序的记录写成分段文件和稀疏索引
+
+    Args:
+        records (list): 按UID排序的PlayerRecord
+        segment_dir (str): 输出目录
+        segment_size (int): 每个分段的记录数
+        index_interval (int): 每隔多少条记录写一个索引项
+        generation (int): 压实代数，写入文件名，新分段不会覆盖当前索引引用的文件
+
+    Returns:
+        dict: 索引
+    """
+    segments = []
+    for start in range(0, len(records), segment_size):
+        chunk = records[start:start + segment_size]
+        filename = f"segment_{chunk[0].uid}_{chunk[-1].uid}_g{generation}.jsonl"
+        sparse_index = []
+        with open(os.path.join(segment_dir, filename), 'wb') as f:
+            for i, record in enumerate(chunk):
+                if i % index_interval == 0:
+                    sparse_index.append([record.uid, f.tell()])
+                f.write(json.dumps(record.to_player_info(), ensure_ascii=False).encode('utf-8'))
+                f.write(b'\n')
+        segments.append({
+            'file': filename,
+            'first_uid': chunk[0].uid,
+            'last_uid': chunk[-1].uid,
+            'count': len(chunk),
+            'index': sparse_index
+        })
+
+    return {
+        'compacted_at': datetime.now().isoformat(),
+        'generation': generation,
+        'total': len(records),
+        'index_interval': index_interval,
+        'segments': segments
+    }
+
+
+def compact(paths, segment_dir='output/segments', segment_size=100000, index_interval=64, remove_sources=False):
+    """合并结果文件为按UID排序的分段
+
+    目录中已有分段时一并合并，因此可以反复对新的批次文件执行。
+
+    Args:
+        paths (list): 结果文件（.json/.jsonl/.ffr）
+        segment_dir (str): 分段目录
+        segment_size (int): 每个分段的记录数
+        index_interval (int): 稀疏索引间隔
+        remove_sources (bool): 压实成功后删除输入文件
+
+    Returns:
+        dict: 新的索引
+    """
+    os.makedirs(segment_dir, exist_ok=True)
+    old_index = load_index(segment_dir)
+    old_files = [os.path.join(segment_dir, segment['file']) for segment in old_index['segments']]
+
+    source_size = sum(os.path.getsize(path) for path in paths)
+    latest, read, skipped = collect_latest(paths, old_files)
+    records = [latest[uid] for uid in sorted(latest)]
+    del latest
+
+    # 新分段写到带新代数的文件名，旧索引引用的文件保持不变；索引原子替换后才切换到新分段，
+    # 中途失败时旧索引和旧分段仍然完整，留下的新文件在下一次压实时清理
+    index = write_segments(records, segment_dir, segment_size, index_interval, old_index.get('generation', 0) + 1)
+    temp_index = os.path.join(segment_dir, INDEX_FILE + '.tmp')
+    with open(temp_index, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(temp_index, os.path.join(segment_dir, INDEX_FILE))
+
+    new_files = {segment['file'] for segment in index['segments']}
+    for name in os.listdir(segment_dir):
+        if SEGMENT_FILE_PATTERN.match(name) and name not in new_files:
+            os.remove(os.path.join(segment_dir, name))
+
+    segment_size_total = sum(os.path.getsize(os.path.join(segment_dir, name)) for name in new_files)
+    print(f"✓ 已压实 {len(paths)} 个文件: 读取 {read} 条记录，去重后 {index['total']} 个UID，"
+          f"跳过无UID记录 {skipped} 条")
+    print(f"✓ 输入 {source_size / 1024 / 1024:.1f} MB -> 分段 {segment_size_total / 1024 / 1024:.1f} MB，"
+          f"共 {len(index['segments'])} 个分段: {segment_dir}")
+
+    if remove_sources:
+        for path in paths:
+            os.remove(path)
+        print(f"✓ 已删除 {len(paths)} 个已合并的输入文件")
+
+    return index
+
+
+class SegmentReader:
+    """按UID查询压实后的分段"""
+
+    def __init__(self, segment_dir='output/segments'):
+        self.segment_dir = segment_dir
+        self.index = load_index(segment_dir)
+        self.first_uids = [segment['first_uid'] for segment in self.index['segments']]
+        # 分段文件名 -> (文件, mmap)，按需打开
+        self.maps = {}
+        # 分段文件名 -> 稀疏索引中的UID列表
+        self.index_uids = {}
+
+    def open_segment(self, segment):
+        """打开分段并建立内存映射"""
+        mapped = self.maps.get(segment['file'])
+        if mapped is None:
+            f = open(os.path.join(self.segment_dir, segment['file']), 'rb')
+            mapped = (f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            self.maps[segment['file']] = mapped
+        return mapped[1]
+
+    def lookup(self, uid):
+        """查询UID最近一次爬取的player_info，不存在时返回None"""
+        position = bisect.bisect_right(self.first_uids, uid) - 1
+        if position < 0:
+            return None
+        segment = self.index['segments'][position]
+        if uid > segment['last_uid']:
+            return None
+
+        # 在稀疏索引中找到不大于目标UID的最后一个索引项，从其偏移开始扫描
+        index_uids = self.index_uids.get(segment['file'])
+        if index_uids is None:
+            index_uids = self.index_uids[segment['file']] = [entry[0] for entry in segment['index']]
+        entry = segment['index'][bisect.bisect_right(index_uids, uid) - 1]
+        data = self.open_segment(segment)
+
+        offset = entry[1]
+        for _ in range(self.index.get('index_interval', 64)):
+            end = data.find(b'\n', offset)
+            if end == -1:
+                end = len(data)
+            if end <= offset:
+                break
+            line = data[offset:end]
+            match = LINE_UID_PATTERN.match(line)
+            if match:
+                record_uid = int(match.group(1))
+            else:
+                record_uid = PlayerRecord.from_player_info(json.loads(line)).uid
+            if record_uid == uid:
+                return json.loads(line)
+            if record_uid > uid:
+                break
+            offset = end + 1
+        return None
+
+    def __iter__(self):
+        """按UID顺序遍历全部记录"""
+        for segment in self.index['segments']:
+            yield from iter_player_infos(os.path.join(self.segment_dir, segment['file']))
+
+    def close(self):
+        """关闭所有内存映射"""
+        for f, mapped in self.maps.values():
+            mapped.close()
+            f.close()
+        self.maps.clear()
@@ -0,0 +1,235 @@
+"""
+选择器引擎模块
+编译 config.json 中 selectors 配置的各字段备选选择器，在页面DOM或保存的页面源码中按顺序尝试，
+记住每个字段最近命中的选择器并在之后优先尝试，常见情况下每个字段只需尝试一次。
+每个选择器的尝试次数和命中次数跨运行持久化，选择器随页面改版失效时表现为命中率下降
+"""
+
+import os
+import json
+import threading
+from datetime import datetime
+
+# 单个字段文本的最大长度，避免宽泛的选择器匹配到整块容器
+MAX_TEXT_LENGTH = 200
+
+# 在页面中按顺序尝试每个字段的选择器，一次脚本调用返回所有字段的结果
+# 返回 {字段: [命中选择器的序号（未命中为-1）, 文本]}
+EXTRACT_SCRIPT = """
+var plan = arguments[0], maxLength = arguments[1], result = {};
+Object.keys(plan).forEach(function (field) {
+    var selectors = plan[field];
+    result[field] = [-1, null];
+    for (var i = 0; i < selectors.length; i++) {
+        var elements;
+        try {
+            elements = document.querySelectorAll(selectors[i]);
+        } catch (e) {
+            continue;
+        }
+        for (var j = 0; j < elements.length; j++) {
+            var text = (elements[j].innerText || '').trim();
+            if (text) {
+                result[field] = [i, text.substring(0, maxLength)];
+                return;
+            }
+        }
+    }
+});
+return result;
+"""
+
+# 多个爬虫实例（流水线的多个抓取worker）共用同一个统计文件，合并写入时加锁
+_stats_lock = threading.Lock()
+
+
+def compile_selectors(selector_config):
+    """编译各字段的选择器，用于离线匹配；无法编译的选择器被跳过
+
+    Returns:
+        dict: 字段 -> [(选择器, CSSSelector)]
+    """
+    from lxml.cssselect import CSSSelector
+
+    compiled = {}
+    for field, selectors in selector_config.items():
+        compiled[field] = []
+        for selector in selectors:
+            try:
+                compiled[field].append((selector, CSSSelector(selector)))
+            except Exception as e:
+                print(f"✗ 选择器无法编译 {field}: {selector} ({e})")
+    return compiled
+
+
+class SelectorEngine:
+    """按字段尝试备选选择器，记住命中的选择器并统计命中率"""
+
+    def __init__(self, selector_config, stats_file='output/selector_stats.json'):
+        """初始化选择器引擎
+
+        Args:
+            selector_config (dict): 字段 -> 按优先级排列的选择器列表
+            stats_file (str): 命中率统计文件，None表示不持久化
+        """
+        self.selector_config = {field: list(selectors) for field, selectors in selector_config.items()}
+        self.stats_file = stats_file
+        self.compiled = None
+
+        # 本次运行的计数: 字段 -> 选择器 -> [尝试次数, 命中次数]
+        self.session = {field: {} for field in self.selector_config}
+        # 字段 -> [页面数, 找到值的页面数]
+        self.session_pages = {field: [0, 0] for field in self.selector_config}
+
+        # 上次运行记住的命中选择器作为初始首选
+        self.winners = {}
+        stored = self.load_stats()
+        for field, selectors in self.selector_config.items():
+            winner = stored.get('fields', {}).get(field, {}).get('winner')
+            if winner in selectors:
+                self.winners[field] = winner
+
+    def load_stats(self):
+        """读取统计文件，不存在或损坏时返回空统计"""
+        if not self.stats_file or not os.path.exists(self.stats_file):
+            return {}
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"✗ 读取选择器统计失败: {e}")
+            return {}
+
+    def ordered(self, field):
+        """字段的尝试顺序：记住的命中选择器在前，其余保持配置顺序"""
+        selectors = self.selector_config[field]
+        winner = self.winners.get(field)
+        if winner is None or selectors[0] == winner:
+            return selectors
+        return [winner] + [selector for selector in selectors if selector != winner]
+
+    def record(self, field, selectors, hit_index):
+        """记录一次字段提取：命中之前的选择器计为未命中，命中的选择器成为首选
+
+        Args:
+            field (str): 字段名
+            selectors (list): 本次的尝试顺序
+            hit_index (int): 命中的选择器序号，-1表示全部未命中
+        """
+        counts = self.session[field]
+        tried = selectors if hit_index < 0 else selectors[:hit_index + 1]
+        for selector in tried:
+            counts.setdefault(selector, [0, 0])[0] += 1
+        pages = self.session_pages[field]
+        pages[0] += 1
+        if hit_index >= 0:
+            winner = selectors[hit_index]
+            counts[winner][1] += 1
+            pages[1] += 1
+            self.winners[field] = winner
+
+    def extract_driver(self, driver):
+        """在浏览器当前页面中提取各字段，所有字段只用一次脚本调用
+
+        Returns:
+            dict: 字段 -> 文本，未找到的字段不包含在内
+        """
+        plan = {field: self.ordered(field) for field in self.selector_config}
+        result = driver.execute_script(EXTRACT_SCRIPT, plan, MAX_TEXT_LENGTH) or {}
+
+        fields = {}
+        for field, selectors in plan.items():
+            hit_index, text = result.get(field, [-1, None])
+            self.record(field, selectors, hit_index)
+            if hit_index >= 0:
+                fields[field] = text
+        return fields
+
+    def extract_tree(self, root):
+        """在lxml解析的页面源码中提取各字段（离线重新解析时使用）
+
+        Args:
+            root: profile_parser.parse_html 返回的根元素
+
+        Returns:
+            dict: 字段 -> 文本，未找到的字段不包含在内
+        """
+        from profile_parser import element_to_lines
+
+        if self.compiled is None:
+            self.compiled = compile_selectors(self.selector_config)
+
+        fields = {}
+        for field in self.selector_config:
+            compiled = dict(self.compiled[field])
+            selectors = [selector for selector in self.ordered(field) if selector in compiled]
+            hit_index = -1
+            for index, selector in enumerate(selectors):
+                for element in compiled[selector](root):
+                    text = '\n'.join(element_to_lines(element))
+                    if text:
+                        fields[field] = text[:MAX_TEXT_LENGTH]
+                        hit_index = index
+                        break
+                if hit_index >= 0:
+                    break
+            self.record(field, selectors, hit_index)
+        return fields
+
+    def report(self):
+        """本次运行各字段的找到率和首选选择器的命中率"""
+        lines = []
+        for field, (pages, found) in self.session_pages.items():
+            if not pages:
+                continue
+            winner = self.winners.get(field)
+            attempts, hits = self.session[field].get(winner, [0, 0])
+            winner_rate = f"{hits / attempts * 100:.1f}%" if attempts else '-'
+            lines.append(f"  {field}: 找到 {found}/{pages}，首选 {winner or '-'} 命中率 {winner_rate}")
+        return lines
+
+    def save(self):
+        """把本次运行的计数合并到统计文件（原子替换），并清空本次计数"""
+        if not self.stats_file or not any(pages for pages, _ in self.session_pages.values()):
+            return
+
+        with _stats_lock:
+            stats = self.load_stats()
+            stored_fields = stats.setdefault('fields', {})
+            for field, counts in self.session.items():
+                stored = stored_fields.setdefault(field, {'pages': 0, 'found': 0, 'selectors': {}})
+                pages, found = self.session_pages[field]
+                stored['pages'] += pages
+                stored['found'] += found
+                for selector, (attempts, hits) in counts.items():
+                    entry = stored['selectors'].setdefault(selector, {'attempts': 0, 'hits': 0})
+                    entry['attempts'] += attempts
+                    entry['hits'] += hits
+                    entry['hit_rate'] = round(entry['hits'] / entry['attempts'], 4) if entry['attempts'] else None
+                    # 最近一次运行的命中率，与累计命中率对比可以发现选择器失效
+                    entry['last_run_hit_rate'] = round(hits / attempts, 4) if attempts else None
+                if field in self.winners:
+                    stored['winner'] = self.winners[field]
+            stats['updated_at'] = datetime.now().isoformat()
+
+            try:
+                os.makedirs(os.path.dirname(self.stats_file) or '.', exist_ok=True)
+                temp_file = self.stats_file + '.tmp'
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(stats, f, ensure_ascii=False, indent=2)
+                os.replace(temp_file, self.stats_file)
+            except Exception as e:
+                print(f"✗ 保存选择器统计失败: {e}")
+                return
+
+        self.session = {field: {} for field in self.selector_config}
+        self.session_pages = {field: [0, 0] for field in self.selector_config}
+
+
+def engine_from_config(config):
+    """按配置创建选择器引擎，未配置选择器或已禁用时返回None"""
+    selector_config = config.get('selectors')
+    engine_config = config.get('selector_engine', {})
+    if not selector_config or not engine_config.get('enabled', True):
+        return None
+    return SelectorEngine(selector_config, engine_config.get('stats_file', 'output/selector_stats.json'))
@@ -0,0 +1,277 @@
+"""
+结果序列化模块
+结果文件的写出格式可以切换：
+- json   与之前一致的格式化JSON（流式写出时为JSON Lines），便于直接查看
+- binary 紧凑的长度前缀二进制格式：记录用msgpack编码（未安装时用紧凑JSON），
+         每block_records条组成一个块，块可以整体压缩
+
+二进制文件结构:
+    MAGIC(8字节) | 头部长度(u32) | 头部JSON（编码方式、压缩方式、crawl_info）
+    块*: 标志(u8) | 块数据长度(u32) | 记录数(u32) | 块数据
+    块数据（解压后）: 记录*: 记录长度(u32) | 记录编码
+每个块独立，流式写出时可以追加，读取时逐块解码，不需要一次载入整个文件
+"""
+
+import os
+import json
+import zlib
+import struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MAGIC = b'FF14BIN1'
+BINARY_EXTENSION = '.ffr'
+HEADER_LENGTH = struct.Struct('<I')
+BLOCK_HEADER = struct.Struct('<BII')
+RECORD_LENGTH = struct.Struct('<I')
+FLAG_ZLIB = 1
+
+
+def encode_json(player_info):
+    """紧凑JSON编码（msgpack不可用时的编码方式）"""
+    return json.dumps(player_info, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def decode_json(data):
+    return json.loads(data)
+
+
+def encode_msgpack(player_info):
+    return msgpack.packb(player_info, use_bin_type=True)
+
+
+def decode_msgpack(data):
+    return msgpack.unpackb(data, raw=False)
+
+
+CODECS = {
+    'json': (encode_json, decode_json),
+    'msgpack': (encode_msgpack, decode_msgpack),
+}
+
+
+def resolve_codec(codec):
+    """auto 在安装了msgpack时使用msgpack，否则使用紧凑JSON"""
+    if codec == 'auto':
+        return 'msgpack' if msgpack is not None else 'json'
+    if codec == 'msgpack' and msgpack is None:
+        print("未安装msgpack，记录编码改用紧凑JSON")
+        return 'json'
+    if codec not in CODECS:
+        raise ValueError(f"未知的记录编码: {codec}")
+    return codec
+
+
+class JsonSerializer:
+    """格式化JSON输出（默认格式）"""
+
+    name = 'json'
+    extension = '.json'
+    stream_extension = '.jsonl'
+
+    def dump(self, filename, player_infos, crawl_info=None):
+        """写出结果文件
+
+        Args:
+            filename (str): 文件路径
+            player_infos (iterable): player_info
+            crawl_info (dict): 汇总信息；None时写出为列表（spider_results格式）
+        """
+        from records import dump_summary
+
+        if crawl_info is None:
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(list(player_infos), f, ensure_ascii=False, indent=2)
+        else:
+            dump_summary(filename, crawl_info, player_infos)
+
+    def open_stream(self, filename):
+        """打开逐条追加的写出流（JSON Lines）"""
+        return JsonLinesWriter(filename)
+
+
+class JsonLinesWriter:
+    """逐条追加的JSON Lines写出流"""
+
+    def __init__(self, filename):
+        self.f = open(filename, 'a', encoding='utf-8')
+
+    def write(self, player_info):
+        self.f.write(json.dumps(player_info, ensure_ascii=False))
+        self.f.write('\n')
+
+    def close(self):
+        self.f.close()
+
+
+class BinarySerializer:
+    """长度前缀二进制格式，可选块压缩"""
+
+    name = 'binary'
+    extension = BINARY_EXTENSION
+    stream_extension = BINARY_EXTENSION
+
+    def __init__(self, codec='auto', compression='zlib', level=6, block_records=1000):
+        """初始化二进制格式
+
+        Args:
+            codec (str): 记录编码，auto/msgpack/json
+            compression (str): 块压缩方式，zlib或None
+            level (int): zlib压缩级别
+            block_records (int): 每个块的记录数
+        """
+        self.codec = resolve_codec(codec)
+        self.compression = compression or None
+        if self.compression not in (None, 'zlib'):
+            raise ValueError(f"未知的压缩方式: {compression}")
+        self.level = level
+        self.block_records = block_records
+
+    def dump(self, filename, player_infos, crawl_info=None):
+        """写出结果文件，crawl_info保存在文件头部"""
+        writer = BinaryWriter(filename, self, crawl_info, append=False)
+        try:
+            for player_info in player_infos:
+                writer.write(player_info)
+        finally:
+            writer.close()
+
+    def open_stream(self, filename):
+        """打开逐条追加的写出流，已有文件时追加新的块"""
+        return BinaryWriter(filename, self, append=True)
+
+
+class BinaryWriter:
+    """二进制格式写出流：记录先缓冲在当前块中，块写满或关闭时写出"""
+
+    def __init__(self, filename, serializer, crawl_info=None, append=True):
+        self.serializer = serializer
+        self.encode = CODECS[serializer.codec][0]
+        self.pending = []
+
+        exists = append and os.path.exists(filename) and os.path.getsize(filename) > 0
+        if exists:
+            # 追加到已有文件时沿用其编码和压缩方式
+            with open(filename, 'rb') as f:
+                header = read_header(f)
+            self.encode = CODECS[header['codec']][0]
+            self.compression = header.get('compression')
+        else:
+            self.compression = serializer.compression
+
+        self.f = open(filename, 'ab' if exists else 'wb')
+        if not exists:
+            header = json.dumps({
+                'codec': serializer.codec,
+                'compression': self.compression,
+                'crawl_info': crawl_info
+            }, ensure_ascii=False).encode('utf-8')
+            self.f.write(MAGIC)
+            self.f.write(HEADER_LENGTH.pack(len(header)))
+            self.f.write(header)
+
+    def write(self, player_info):
+        """追加一条记录"""
+        data = self.encode(player_info)
+        self.pending.append(RECORD_LENGTH.pack(len(data)))
+        self.pending.append(data)
+        if len(self.pending) >= self.serializer.block_records * 2:
+            self.flush_block()
+
+    def flush_block(self):
+        """把当前块写入文件"""
+        if not self.pending:
+            return
+        count = len(self.pending) // 2
+        payload = b''.join(self.pending)
+        flags = 0
+        if self.compression == 'zlib':
+            payload = zlib.compress(payload, self.serializer.level)
+            flags |= FLAG_ZLIB
+        self.f.write(BLOCK_HEADER.pack(flags, len(payload), count))
+        self.f.write(payload)
+        self.pending.clear()
+
+    def close(self):
+        self.flush_block()
+        self.f.close()
+
+
+def read_header(f):
+    """读取二进制文件头部"""
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("不是二进制结果文件")
+    (length,) = HEADER_LENGTH.unpack(f.read(HEADER_LENGTH.size))
+    return json.loads(f.read(length).decode('utf-8'))
+
+
+def read_binary(path):
+    """读取二进制结果文件
+
+    Returns:
+        tuple: (头部信息, 逐条产出player_info的迭代器)
+    """
+    f = open(path, 'rb')
+    try:
+        header = read_header(f)
+    except Exception:
+        f.close()
+        raise
+    if header['codec'] == 'msgpack' and msgpack is None:
+        f.close()
+        raise ValueError(f"{path} 使用msgpack编码，需要先安装msgpack")
+    decode = CODECS[header['codec']][1]
+
+    def records():
+        with f:
+            while True:
+                block_header = f.read(BLOCK_HEADER.size)
+                if len(block_header) < BLOCK_HEADER.size:
+                    return
+                flags, length, count = BLOCK_HEADER.unpack(block_header)
+                payload = f.read(length)
+                if flags & FLAG_ZLIB:
+                    payload = zlib.decompress(payload)
+                offset = 0
+                for _ in range(count):
+                    (size,) = RECORD_LENGTH.unpack_from(payload, offset)
+                    offset += RECORD_LENGTH.size
+                    yield decode(payload[offset:offset + size])
+                    offset += size
+
+    return header, records()
+
+
+def iter_binary(path):
+    """逐条遍历二进制结果文件中的player_info"""
+    _, records = read_binary(path)
+    yield from records
+
+
+def get_serializer(output_format='json', compression='zlib', level=6, block_records=1000, codec='auto'):
+    """按格式名创建序列化器"""
+    if output_format == 'json':
+        return JsonSerializer()
+    if output_format == 'binary':
+        return BinarySerializer(codec=codec, compression=compression, level=level, block_records=block_records)
+    raise ValueError(f"未知的输出格式: {output_format}")
+
+
+def serializer_from_config(config, output_format=None):
+    """按配置中的output配置段创建序列化器
+
+    Args:
+        config (dict): 爬虫配置
+        output_format (str): 覆盖配置中的格式（命令行 --format）
+    """
+    output_config = config.get('output', {})
+    return get_serializer(
+        output_format or output_config.get('format', 'json'),
+        compression=output_config.get('compression', 'zlib'),
+        level=output_config.get('level', 6),
+        block_records=output_config.get('block_records', 1000),
+        codec=output_config.get('codec', 'auto')
+    )
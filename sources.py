@@ -0,0 +1,162 @@
+"""
+爬取输入模块
+把UID文件、UID区间、以前的爬取结果等输入作为惰性迭代器逐条读取，并用位图实时去重，
+内存占用只与UID取值范围有关，与输入长度无关
+"""
+
+import re
+import sys
+import hashlib
+
+from records import PROFILE_URL_TEMPLATE, iter_player_infos
+
+UUID_PATTERN = re.compile(r'uuid=(\d+)')
+
+# 位图按页分配，每页覆盖 2**20 个UID（128KB），只为实际出现的UID区段分配内存
+PAGE_BITS = 20
+PAGE_MASK = (1 << PAGE_BITS) - 1
+
+
+class SeenSet:
+    """UID去重集合：按页分配的位图，每个UID占1位
+
+    无法解析出UID的URL退回到8字节摘要集合，这类输入通常很少。
+    """
+
+    def __init__(self):
+        self.pages = {}
+        self.digests = set()
+        self.count = 0
+
+    def add_uid(self, uid):
+        """加入UID，已存在时返回False"""
+        page = self.pages.get(uid >> PAGE_BITS)
+        if page is None:
+            page = self.pages[uid >> PAGE_BITS] = bytearray(1 << (PAGE_BITS - 3))
+        offset = uid & PAGE_MASK
+        byte, bit = offset >> 3, 1 << (offset & 7)
+        if page[byte] & bit:
+            return False
+        page[byte] |= bit
+        self.count += 1
+        return True
+
+    def add_url(self, url):
+        """加入URL：能解析出UID的按UID去重，否则按URL摘要去重"""
+        uid = uid_from_url(url)
+        if uid is not None:
+            return self.add_uid(uid)
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest()
+        if digest in self.digests:
+            return False
+        self.digests.add(digest)
+        self.count += 1
+        return True
+
+    def memory_bytes(self):
+        """位图和摘要集合占用的大致字节数"""
+        return len(self.pages) * (1 << (PAGE_BITS - 3)) + len(self.digests) * 8
+
+
+class Deduplicator:
+    """流式去重，统计读取数和重复数"""
+
+    def __init__(self):
+        self.seen = SeenSet()
+        self.read = 0
+        self.duplicates = 0
+
+    def filter(self, items):
+        """逐条过滤重复项，items中的元素为UID（int）或URL（str）"""
+        for item in items:
+            self.read += 1
+            if isinstance(item, int):
+                added = self.seen.add_uid(item)
+            else:
+                added = self.seen.add_url(item)
+            if added:
+                yield item
+            else:
+                self.duplicates += 1
+
+    def summary(self):
+        """去重统计，用于输出"""
+        return (f"读取 {self.read} 条，去除重复 {self.duplicates} 条，"
+                f"去重位图 {self.seen.memory_bytes() / 1024:.0f} KB")
+
+
+def uid_from_url(url):
+    """从个人信息页URL中提取UID，没有uuid参数时返回None"""
+    match = UUID_PATTERN.search(url)
+    return int(match.group(1)) if match else None
+
+
+def read_targets(path):
+    """逐行读取UID或URL文件（'-'表示标准输入），空行和#开头的行被忽略
+
+    Yields:
+        int或str: 纯数字行为UID，其他行为URL
+    """
+    f = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    try:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            yield int(line) if line.isdigit() else line
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def uid_range(start, end):
+    """[start, end] 区间内的UID"""
+    return iter(range(start, end + 1))
+
+
+# 按以前的爬取结果筛选时可用的条件
+RESULT_FILTERS = {
+    'all': lambda player_info: True,
+    'live': lambda player_info: player_info.get('player_data', {}).get('user_exists', True),
+    'missing': lambda player_info: not player_info.get('player_data', {}).get('user_exists', True),
+}
+
+
+def uids_from_results(paths, predicate=None):
+    """逐条读取以前的结果文件，按条件筛选后产出UID
+
+    Args:
+        paths (list): 结果文件（.json/.jsonl/.ffr）
+        predicate: 接收player_info的函数，或RESULT_FILTERS中的名称，默认全部
+    """
+    if predicate is None or isinstance(predicate, str):
+        predicate = RESULT_FILTERS[predicate or 'all']
+    for path in paths:
+        for player_info in iter_player_infos(path):
+            if not predicate(player_info):
+                continue
+            uid = uid_from_url(player_info.get('url', ''))
+            if uid is None:
+                data_uid = str(player_info.get('player_data', {}).get('uid', ''))
+                uid = int(data_uid) if data_uid.isdigit() else None
+            if uid is not None:
+                yield uid
+
+
+def to_urls(items):
+    """UID转换为个人信息页URL，URL原样保留"""
+    for item in items:
+        yield PROFILE_URL_TEMPLATE.format(uid=item) if isinstance(item, int) else item
+
+
+def to_uids(items):
+    """URL转换为UID，无法解析UID的URL被跳过"""
+    for item in items:
+        if isinstance(item, int):
+            yield item
+            continue
+        uid = uid_from_url(item)
+        if uid is None:
+            print(f"✗ 无法从URL中解析UID，跳过: {item}")
+            continue
+        yield uid
@@ -0,0 +1,167 @@
+"""
+多标签复用模块
+在同一个浏览器进程中打开多个标签页，同时发起导航，哪个标签页先渲染完成就先收割哪个，
+让页面加载等待在一个浏览器内重叠，减少每个worker的浏览器进程数和内存占用
+"""
+
+import re
+import time
+
+from ff14_spider import SPA_NAVIGATE_SCRIPT
+from deadlines import stop_loading
+
+
+class TabMultiplexer:
+    """在一个浏览器驱动中轮询多个标签页的爬取器
+
+    依赖浏览器以 page_load_strategy='none' 启动，否则导航命令会阻塞到页面加载完成。
+    """
+
+    def __init__(self, spider, tabs=3, timeout=None):
+        """初始化多标签爬取器
+
+        Args:
+            spider (FF14RisingStonesSpider): 已启动浏览器的爬虫实例，复用其登录、渲染判断和提取逻辑
+            tabs (int): 标签页数量
+            timeout (float): 单个页面等待渲染的最长秒数，默认使用 timeouts.per_uid
+        """
+        self.spider = spider
+        self.driver = spider.driver
+        self.tab_count = max(1, tabs)
+        self.timeout = timeout or spider.timeouts.get('per_uid', 60)
+        self.tabs = []
+        # 超时被取消加载的URL，由调用方决定是否重试
+        self.timed_out = []
+
+    def open_tabs(self):
+        """打开标签页，第一个标签页使用当前窗口"""
+        self.tabs = [{'handle': self.driver.current_window_handle, 'url': None}]
+        for _ in range(self.tab_count - 1):
+            self.driver.switch_to.new_window('tab')
+            self.tabs.append({'handle': self.driver.current_window_handle, 'url': None})
+        print(f"✓ 已打开 {len(self.tabs)} 个标签页")
+
+    def start(self, tab, url):
+        """在标签页中发起导航，不等待加载完成"""
+        self.driver.switch_to.window(tab['handle'])
+
+        route = self.spider.get_route(url)
+        if route and "#/me/info" in self.driver.current_url:
+            # 标签页中已加载SPA，只切换路由
+            self.driver.execute_script(SPA_NAVIGATE_SCRIPT, route)
+        else:
+            self.driver.execute_script("window.location.href = arguments[0];", self.spider.site_url(url))
+
+        url_match = re.search(r'uuid=(\d+)', url)
+        tab['url'] = url
+        tab['uid'] = url_match.group(1) if url_match else None
+        tab['started'] = time.time()
+        tab['state'] = {}
+
+    def is_ready(self, tab):
+        """切换到标签页并检查是否可以收割
+
+        Returns:
+            str: ready 已渲染；timeout 等待超时；login 需要登录；None 仍在加载
+        """
+        self.driver.switch_to.window(tab['handle'])
+
+        if "login" in self.driver.current_url.lower():
+            return 'login'
+
+        try:
+            if tab['uid'] and self.spider.is_profile_rendered(tab['uid'], tab['state']):
+                return 'ready'
+        except Exception:
+            # 页面仍在加载时可能还没有body
+            pass
+
+        if time.time() - tab['started'] >= self.timeout:
+            return 'timeout'
+        return None
+
+    def harvest(self, tab):
+        """提取当前标签页的玩家信息并释放标签页，提取失败时返回None（超时的URL稍后重试）"""
+        url = tab['url']
+        self.spider.last_failure = None
+        player_info = self.spider.extract_player_info(wait_dynamic=False)
+        self.spider.record_traffic()
+        tab['url'] = None
+        if self.spider.extraction_failed(player_info):
+            if self.spider.last_failure == 'timeout':
+                self.timed_out.append(url)
+            print(f"✗ 未能提取玩家信息: {url}")
+            return None
+        return player_info
+
+    def iter_results(self, urls):
+        """依次爬取URL，按完成顺序返回结果（与输入顺序可能不同）
+
+        Args:
+            urls (iterable): 要爬取的URL
+
+        Yields:
+            dict: player_info
+        """
+        if not self.tabs:
+            self.open_tabs()
+
+        source = iter(urls)
+        exhausted = False
+
+        while True:
+            # 空闲标签页领取新的URL
+            for tab in self.tabs:
+                if tab['url'] is None and not exhausted:
+                    url = next(source, None)
+                    if url is None:
+                        exhausted = True
+                        break
+                    print(f"\n[标签页 {self.tabs.index(tab) + 1}] 正在爬取: {url}")
+                    self.start(tab, url)
+
+            busy = [tab for tab in self.tabs if tab['url'] is not None]
+            if not busy:
+                return
+
+            # 轮询所有在途标签页，收割已完成的
+            harvested = False
+            for tab in busy:
+                try:
+                    state = self.is_ready(tab)
+                    if state is None:
+                        continue
+
+                    if state == 'login':
+                        url = tab['url']
+                        if not self.spider.wait_for_login():
+                            print("✗ 登录失败，停止多标签爬取")
+                            return
+                        self.start(tab, url)
+                        continue
+
+                    if state == 'timeout':
+                        # 取消加载，释放标签页给下一个URL
+                        print(f"✗ 等待渲染超过 {self.timeout} 秒，稍后重试: {tab['url']}")
+                        stop_loading(self.driver)
+                        self.timed_out.append(tab['url'])
+                        tab['url'] = None
+                        continue
+
+                    harvested = True
+                    yield self.harvest(tab)
+
+                except Exception as e:
+                    print(f"✗ 爬取失败 {tab['url']}: {e}")
+                    tab['url'] = None
+
+            if not harvested:
+                time.sleep(0.1)
+
+    def run(self, urls):
+        """爬取全部URL
+
+        Returns:
+            list: 成功的player_info列表
+        """
+        return [player_info for player_info in self.iter_results(urls) if player_info]